@@ -0,0 +1,384 @@
+"""
+Accuracy-vs-speed regression harness for the background-removal pipeline.
+
+Keeps golden masks for a fixture set (synthetic product photos plus any local
+images passed with --images), produced by the full-quality reference mode. Every
+processing mode is then run on the same fixtures and compared against the
+goldens:
+
+  - IoU of the binarized masks
+  - edge error: mean absolute alpha difference (0-1) in a band around the
+    golden boundary, where speed shortcuts show up first
+  - confidence drift against the golden confidence
+  - latency (median seconds per image)
+  - the method that produced each mask, which must match the golden's
+
+The alpha and solid-background fast paths are turned off, so every mode runs
+the model; goldens must come from the model (method ai_model).
+
+A golden directory also holds the encoded synthetic fixtures (fixtures/) and,
+without --model, the stand-in model (stand_in.onnx). Inputs are read from there
+rather than re-encoded, so the hashes the goldens are keyed on do not depend on
+the installed Pillow or onnx. The set for the default scenarios is committed
+under golden/<GOLDEN_VERSION>/, so a plain run needs no --update-golden. Keep
+goldens for other models (--model) in their own --golden-dir.
+
+Modes:
+  full            full decode, lanczos preprocess (the reference)
+  fast_resize     full decode, bilinear preprocess
+  reduced_decode  JPEG DCT-scaled decode, lanczos preprocess (the API path)
+  fast            reduced decode and bilinear preprocess
+  quantized       the service's INT8 "fast" profile, when <model>.int8.onnx exists
+  <name>          --variant NAME=MODEL.onnx, e.g. another quantization, run like full
+
+Usage:
+    python benchmarks/accuracy_harness.py
+    python benchmarks/accuracy_harness.py --model models/rmbg-1.4.onnx --golden-dir golden-rmbg --update-golden
+    python benchmarks/accuracy_harness.py --variant candidate=models/rmbg-1.4.static-int8.onnx
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from stand_in_model import build_stand_in_model  # noqa: E402
+from synthetic_images import DEFAULT_SCENARIOS, build_dataset  # noqa: E402
+
+# Committed goldens for the stand-in model and DEFAULT_SCENARIOS. Bump the version
+# when the stand-in, the fixtures or the reference mode change.
+GOLDEN_VERSION = "v2"
+DEFAULT_GOLDEN_DIR = os.path.join(BENCH_DIR, "golden", GOLDEN_VERSION)
+GOLDEN_MANIFEST = "golden.json"
+FIXTURE_DIR = "fixtures"
+STAND_IN_MODEL = "stand_in.onnx"
+REFERENCE_MODE = "full"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def mask_iou(mask: np.ndarray, golden: np.ndarray) -> float:
+    """Intersection over union of the masks binarized at 50%"""
+    pred, ref = mask > 127, golden > 127
+    union = np.logical_or(pred, ref).sum()
+    if union == 0:
+        return 1.0
+    return float(np.logical_and(pred, ref).sum() / union)
+
+
+def edge_error(mask: np.ndarray, golden: np.ndarray, band_fraction: float = 0.01) -> float:
+    """Mean absolute alpha error (0-1) within a band around the golden boundary.
+
+    The band is band_fraction of the longer side on each side of the edge, so the
+    metric is comparable across resolutions.
+    """
+    radius = max(1, int(round(max(golden.shape[:2]) * band_fraction)))
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+    binary = (golden > 127).astype(np.uint8)
+    band = cv2.dilate(binary, kernel) != cv2.erode(binary, kernel)
+    diff = np.abs(mask.astype(np.int16) - golden.astype(np.int16))
+    if not band.any():
+        return float(diff.mean() / 255.0)
+    return float(diff[band].mean() / 255.0)
+
+
+def synthetic_fixtures(scenarios, golden_dir: str, update: bool) -> Dict[str, bytes]:
+    """Encoded synthetic scenarios, read from golden_dir/fixtures.
+
+    Missing ones are generated, and saved when update is set, so a committed
+    set keeps the exact bytes its goldens were made from.
+    """
+    fixture_dir = os.path.join(golden_dir, FIXTURE_DIR)
+    fixtures = {}
+    missing = []
+    for name, size in scenarios:
+        path = os.path.join(fixture_dir, f"{name}.jpg")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                fixtures[name] = f.read()
+        else:
+            missing.append((name, size))
+    if missing:
+        # build_dataset seeds each scenario by its position, so a subset is cut from the full list
+        generated = build_dataset(DEFAULT_SCENARIOS)
+        for name, _ in missing:
+            fixtures[name] = generated[name]["bytes"]
+            if update:
+                os.makedirs(fixture_dir, exist_ok=True)
+                with open(os.path.join(fixture_dir, f"{name}.jpg"), "wb") as f:
+                    f.write(fixtures[name])
+    return {name: fixtures[name] for name, _ in scenarios}
+
+
+def stand_in_model(golden_dir: str, update: bool) -> str:
+    """Copy of the stand-in model kept with the goldens, in a temporary directory.
+
+    The copy keeps the ORT cache out of golden_dir. Without a stored model one is
+    built, and stored when update is set.
+    """
+    work_dir = tempfile.mkdtemp(prefix="rmbg-acc-")
+    stored = os.path.join(golden_dir, STAND_IN_MODEL)
+    if not os.path.exists(stored):
+        built = build_stand_in_model(os.path.join(work_dir, STAND_IN_MODEL))
+        if not update:
+            return built
+        os.makedirs(golden_dir, exist_ok=True)
+        shutil.copyfile(built, stored)
+        return built
+    return shutil.copyfile(stored, os.path.join(work_dir, STAND_IN_MODEL))
+
+
+def load_fixtures(scenarios, image_dir: Optional[str], golden_dir: str, update: bool = False) -> Dict[str, bytes]:
+    """Synthetic scenarios plus every image file under image_dir, as encoded bytes"""
+    fixtures = synthetic_fixtures(scenarios, golden_dir, update)
+    if image_dir:
+        from utils.archive import is_image_name
+        for root, dirs, files in os.walk(image_dir):
+            dirs.sort()
+            for name in sorted(files):
+                if is_image_name(name):
+                    path = os.path.join(root, name)
+                    key = os.path.splitext(os.path.relpath(path, image_dir))[0].replace(os.sep, "__")
+                    with open(path, "rb") as f:
+                        fixtures[f"local__{key}"] = f.read()
+    return fixtures
+
+
+def load_service(model_path: str):
+    from services.background_removal import BackgroundRemovalService
+
+    service = BackgroundRemovalService()
+    service.model_path = model_path
+    # The synthetic fixtures have plain backdrops; without this they would bypass the model
+    service.alpha_fast_path = False
+    service.solid_fast_path = False
+    service.load_model()
+    if not service.is_model_loaded():
+        raise RuntimeError(f"Could not load model {model_path}")
+    return service
+
+
+def build_modes(reference_service, variants: Dict[str, object]) -> Dict[str, Callable[[bytes], Dict]]:
+    """Map mode name -> function(image_bytes) -> service result"""
+    from utils.image_processing import decode_image
+
+    def configured(service, resample: str, reduced_decode: bool, profile: str = "quality"):
+        def run(image_bytes: bytes) -> Dict:
+            service.preprocess_resample = resample
+            if reduced_decode:
+                return service.remove_background_from_bytes(image_bytes, include_image=False, profile=profile)
+            return service.remove_background(decode_image(image_bytes), include_image=False, profile=profile)
+        return run
+
+    modes = {
+        REFERENCE_MODE: configured(reference_service, "lanczos", False),
+        "fast_resize": configured(reference_service, "bilinear", False),
+        "reduced_decode": configured(reference_service, "lanczos", True),
+        "fast": configured(reference_service, "bilinear", True),
+    }
+    if "fast" in reference_service.available_profiles():
+        modes["quantized"] = configured(reference_service, "lanczos", False, profile="fast")
+    for name, service in variants.items():
+        modes[name] = configured(service, "lanczos", False, profile=service.active_profile)
+    return modes
+
+
+def run_mode(run: Callable[[bytes], Dict], image_bytes: bytes, repeat: int) -> Tuple[Dict, float]:
+    """Return the last result and the median latency over repeat runs"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run(image_bytes)
+        durations.append(time.perf_counter() - start)
+    return result, float(np.median(durations))
+
+
+def write_goldens(golden_dir: str, model_path: str, fixtures: Dict[str, bytes], run, repeat: int) -> Dict:
+    os.makedirs(golden_dir, exist_ok=True)
+    from PIL import __version__ as pillow_version
+    import onnxruntime as ort
+
+    manifest = {
+        "model": os.path.basename(model_path),
+        "model_sha256": file_sha256(model_path),
+        # For the record only: inputs are keyed on the stored bytes, not on these versions
+        "generated_with": {"onnxruntime": ort.__version__, "pillow": pillow_version},
+        "fixtures": {},
+    }
+    for name, image_bytes in fixtures.items():
+        result, _ = run_mode(run, image_bytes, 1)
+        if result["method"] != "ai_model":
+            raise RuntimeError(f"Golden for {name} came from {result['method']}, not the model")
+        Image.fromarray(result["mask"]).save(os.path.join(golden_dir, f"{name}.png"))
+        manifest["fixtures"][name] = {
+            "confidence": result["confidence"],
+            "method": result["method"],
+            "input_sha256": hashlib.sha256(image_bytes).hexdigest(),
+        }
+        print(f"  golden {name}: confidence {result['confidence']:.3f} ({result['method']})")
+    with open(os.path.join(golden_dir, GOLDEN_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_goldens(golden_dir: str, model_path: str, fixtures: Dict[str, bytes]) -> Dict:
+    """Read the golden manifest and check it matches the reference model and fixtures"""
+    manifest_path = os.path.join(golden_dir, GOLDEN_MANIFEST)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"No goldens in {golden_dir}; run with --update-golden first")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("model_sha256") != file_sha256(model_path):
+        raise ValueError(
+            f"Goldens in {golden_dir} were made with {manifest.get('model')}, not {model_path}; "
+            "rerun with --update-golden"
+        )
+    for name, image_bytes in fixtures.items():
+        entry = manifest["fixtures"].get(name)
+        if entry is None or entry["input_sha256"] != hashlib.sha256(image_bytes).hexdigest():
+            raise ValueError(f"Fixture {name} has no matching golden; rerun with --update-golden")
+    return manifest
+
+
+def evaluate(modes, fixtures: Dict[str, bytes], golden_dir: str, manifest: Dict, repeat: int) -> Dict:
+    report = {}
+    for mode, run in modes.items():
+        per_fixture = {}
+        for name, image_bytes in fixtures.items():
+            golden = np.array(Image.open(os.path.join(golden_dir, f"{name}.png")))
+            result, latency = run_mode(run, image_bytes, repeat)
+            per_fixture[name] = {
+                "iou": mask_iou(result["mask"], golden),
+                "edge_error": edge_error(result["mask"], golden),
+                "confidence_drift": result["confidence"] - manifest["fixtures"][name]["confidence"],
+                "latency_s": latency,
+                "method": result["method"],
+                "golden_method": manifest["fixtures"][name]["method"],
+            }
+        report[mode] = {
+            "fixtures": per_fixture,
+            "min_iou": min(f["iou"] for f in per_fixture.values()),
+            "max_edge_error": max(f["edge_error"] for f in per_fixture.values()),
+            "max_abs_confidence_drift": max(abs(f["confidence_drift"]) for f in per_fixture.values()),
+            "mean_latency_s": float(np.mean([f["latency_s"] for f in per_fixture.values()])),
+        }
+    reference_latency = report[REFERENCE_MODE]["mean_latency_s"]
+    for summary in report.values():
+        summary["speedup"] = reference_latency / summary["mean_latency_s"]
+    return report
+
+
+def check_thresholds(report: Dict, min_iou: float, max_edge_error: float, max_drift: float) -> List[str]:
+    failures = []
+    for mode, summary in report.items():
+        for name, fixture in summary["fixtures"].items():
+            if fixture["method"] != fixture["golden_method"]:
+                failures.append(f"{mode}: {name} produced by {fixture['method']}, golden by {fixture['golden_method']}")
+        if summary["min_iou"] < min_iou:
+            failures.append(f"{mode}: min IoU {summary['min_iou']:.4f} < {min_iou}")
+        if summary["max_edge_error"] > max_edge_error:
+            failures.append(f"{mode}: edge error {summary['max_edge_error']:.4f} > {max_edge_error}")
+        if summary["max_abs_confidence_drift"] > max_drift:
+            failures.append(f"{mode}: confidence drift {summary['max_abs_confidence_drift']:.4f} > {max_drift}")
+    return failures
+
+
+def print_report(report: Dict):
+    print(f"{'mode':16s} {'min IoU':>8s} {'edge err':>9s} {'conf drift':>11s} {'latency':>9s} {'speedup':>8s}")
+    for mode, summary in report.items():
+        print(
+            f"{mode:16s} {summary['min_iou']:8.4f} {summary['max_edge_error']:9.4f} "
+            f"{summary['max_abs_confidence_drift']:11.4f} {summary['mean_latency_s'] * 1000:7.1f}ms "
+            f"{summary['speedup']:7.2f}x"
+        )
+
+
+def parse_variants(values: List[str]) -> Dict[str, str]:
+    variants = {}
+    for value in values:
+        name, sep, path = value.partition("=")
+        if not sep or not name or not path:
+            raise argparse.ArgumentTypeError(f"--variant expects NAME=PATH, got {value!r}")
+        variants[name] = path
+    return variants
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare processing modes against golden masks")
+    parser.add_argument("--model", default=None, help="Reference ONNX model (default: build the stand-in)")
+    parser.add_argument("--golden-dir", default=DEFAULT_GOLDEN_DIR, help="Where golden masks are kept")
+    parser.add_argument("--update-golden", action="store_true", help="Regenerate goldens with the full mode")
+    parser.add_argument("--images", default=None, help="Directory of local images to add to the fixtures")
+    parser.add_argument("--scenarios", default=None,
+                        help=f"Comma-separated subset of {','.join(n for n, _ in DEFAULT_SCENARIOS)}")
+    parser.add_argument("--variant", action="append", default=[],
+                        help="Extra model to evaluate as NAME=PATH (repeatable)")
+    parser.add_argument("--modes", default=None, help="Comma-separated subset of modes to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per fixture and mode")
+    parser.add_argument("--min-iou", type=float, default=0.95)
+    parser.add_argument("--max-edge-error", type=float, default=0.08)
+    parser.add_argument("--max-confidence-drift", type=float, default=0.05)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    model_path = args.model
+    if model_path is None:
+        model_path = stand_in_model(args.golden_dir, args.update_golden)
+
+    scenarios = DEFAULT_SCENARIOS
+    if args.scenarios:
+        wanted = set(args.scenarios.split(","))
+        scenarios = [s for s in DEFAULT_SCENARIOS if s[0] in wanted]
+    fixtures = load_fixtures(scenarios, args.images, args.golden_dir, args.update_golden)
+
+    reference_service = load_service(model_path)
+    variants = {name: load_service(path) for name, path in parse_variants(args.variant).items()}
+    modes = build_modes(reference_service, variants)
+
+    if args.update_golden:
+        print(f"Writing goldens to {args.golden_dir}")
+        write_goldens(args.golden_dir, model_path, fixtures, modes[REFERENCE_MODE], args.repeat)
+    manifest = load_goldens(args.golden_dir, model_path, fixtures)
+
+    if args.modes:
+        wanted = set(args.modes.split(",")) | {REFERENCE_MODE}
+        modes = {name: run for name, run in modes.items() if name in wanted}
+
+    report = evaluate(modes, fixtures, args.golden_dir, manifest, args.repeat)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"model": os.path.basename(model_path), "modes": report}, f, indent=2)
+
+    failures = check_thresholds(report, args.min_iou, args.max_edge_error, args.max_confidence_drift)
+    if failures:
+        print("Modes outside tolerance:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
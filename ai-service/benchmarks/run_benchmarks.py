@@ -0,0 +1,301 @@
+"""
+Reproducible benchmark suite for the background-removal pipeline.
+
+Measures, on synthetic product photos at several resolutions and aspect ratios:
+  - per-stage latency (p50/p95/mean) of BackgroundRemovalService
+  - throughput (images/s) at several concurrency levels for the service and
+    for the HTTP endpoint (in-process ASGI client, or a live server via --url)
+  - peak RSS per scenario
+
+Results are written as JSON; --compare checks them against a previous run and
+exits non-zero on regressions beyond --tolerance.
+
+The alpha and solid-background fast paths are off unless --fast-paths is given:
+the synthetic photos have plain backdrops and would otherwise never reach the
+model. Runs with different settings are not comparable.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --output new.json --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from stand_in_model import build_stand_in_model  # noqa: E402
+from synthetic_images import DEFAULT_SCENARIOS, build_dataset  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+
+class RssSampler:
+    """Sample resident set size in a background thread and keep the peak"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _current_rss(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except (OSError, ValueError, IndexError):
+            # Not Linux: fall back to the process-wide high-water mark
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return usage if sys.platform == "darwin" else usage * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_bytes = self._current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._current_rss())
+
+
+def percentile_summary(values: List[float]) -> Dict[str, float]:
+    """Summarize durations in milliseconds"""
+    array = np.array(values, dtype=np.float64) * 1000
+    return {
+        "p50_ms": float(np.percentile(array, 50)),
+        "p95_ms": float(np.percentile(array, 95)),
+        "mean_ms": float(array.mean()),
+        "n": int(array.size),
+    }
+
+
+def measure_throughput(call: Callable[[bytes], None], payloads: List[bytes], concurrency: int,
+                       requests: int) -> Dict[str, float]:
+    """Run `requests` calls with `concurrency` threads, cycling through payloads"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, (payloads[i % len(payloads)] for i in range(requests))))
+    elapsed = time.perf_counter() - start
+    return {"images_per_sec": requests / elapsed, "elapsed_s": elapsed, "requests": requests}
+
+
+def benchmark_stages(service, dataset: Dict[str, Dict], iterations: int) -> Dict:
+    """Per-stage latency and peak RSS for each scenario"""
+    results = {}
+    for name, item in dataset.items():
+        # One untimed run so lazy allocations do not skew the first sample
+        service.remove_background_from_bytes(item["bytes"], include_image=False)
+        stage_samples: Dict[str, List[float]] = {}
+        totals = []
+        with RssSampler() as sampler:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                result = service.remove_background_from_bytes(item["bytes"], include_image=False)
+                totals.append(time.perf_counter() - start)
+                for stage, seconds in result.get("timings", {}).items():
+                    stage_samples.setdefault(stage, []).append(seconds)
+        results[name] = {
+            "size": list(item["size"]),
+            "method": result["method"],
+            "total": percentile_summary(totals),
+            "stages": {stage: percentile_summary(values) for stage, values in stage_samples.items()},
+            "peak_rss_mb": sampler.peak_bytes / (1024 * 1024),
+        }
+        print(f"  {name:14s} {item['size'][0]}x{item['size'][1]:<5d} "
+              f"p50 {results[name]['total']['p50_ms']:8.1f} ms  "
+              f"peak RSS {results[name]['peak_rss_mb']:7.1f} MB")
+    return results
+
+
+def benchmark_service_throughput(service, payloads: List[bytes], levels: List[int], requests: int) -> Dict:
+    results = {}
+    for level in levels:
+        results[str(level)] = measure_throughput(
+            lambda data: service.remove_background_from_bytes(data, include_image=False),
+            payloads, level, requests,
+        )
+        print(f"  service  concurrency {level:3d}: {results[str(level)]['images_per_sec']:7.2f} img/s")
+    return results
+
+
+def benchmark_http_throughput(payloads: List[bytes], levels: List[int], requests: int,
+                              url: Optional[str]) -> Dict:
+    """Throughput of POST /api/remove-background, in-process unless url is given"""
+    if url:
+        import httpx
+        client = httpx.Client(base_url=url, timeout=120)
+        context = client
+    else:
+        from fastapi.testclient import TestClient
+        import main
+        context = client = TestClient(main.app)
+
+    def call(data: bytes):
+        response = client.post(
+            "/api/remove-background",
+            files={"file": ("bench.jpg", data, "image/jpeg")},
+        )
+        response.raise_for_status()
+
+    results = {}
+    with context:
+        # The model loads in the background after startup
+        deadline = time.time() + 300
+        while client.get("/health").json().get("status") == "loading" and time.time() < deadline:
+            time.sleep(0.1)
+        call(payloads[0])
+        for level in levels:
+            results[str(level)] = measure_throughput(call, payloads, level, requests)
+            print(f"  http     concurrency {level:3d}: {results[str(level)]['images_per_sec']:7.2f} img/s")
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """List metrics that regressed by more than tolerance (fraction)"""
+    regressions = []
+    for name, scenario in current.get("stages", {}).items():
+        old = baseline.get("stages", {}).get(name)
+        if not old:
+            continue
+        if scenario["method"] != old["method"]:
+            regressions.append(f"{name} method {old['method']} -> {scenario['method']}")
+            continue
+        new_p50, old_p50 = scenario["total"]["p50_ms"], old["total"]["p50_ms"]
+        if new_p50 > old_p50 * (1 + tolerance):
+            regressions.append(f"{name} p50 latency {old_p50:.1f} -> {new_p50:.1f} ms")
+        new_rss, old_rss = scenario["peak_rss_mb"], old["peak_rss_mb"]
+        if new_rss > old_rss * (1 + tolerance):
+            regressions.append(f"{name} peak RSS {old_rss:.1f} -> {new_rss:.1f} MB")
+    for target in ("service", "http"):
+        for level, result in current.get("throughput", {}).get(target, {}).items():
+            old = baseline.get("throughput", {}).get(target, {}).get(level)
+            if old and result["images_per_sec"] < old["images_per_sec"] * (1 - tolerance):
+                regressions.append(
+                    f"{target} throughput @{level} {old['images_per_sec']:.2f} -> "
+                    f"{result['images_per_sec']:.2f} img/s"
+                )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the background-removal pipeline")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write JSON results")
+    parser.add_argument("--model", default=None, help="ONNX model to benchmark (default: build the stand-in)")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed runs per scenario")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=16, help="Requests per throughput measurement")
+    parser.add_argument("--scenarios", default=None,
+                        help=f"Comma-separated subset of {','.join(n for n, _ in DEFAULT_SCENARIOS)}")
+    parser.add_argument("--skip-http", action="store_true", help="Skip the HTTP endpoint benchmark")
+    parser.add_argument("--url", default=None, help="Benchmark a running server instead of in-process")
+    parser.add_argument("--fast-paths", action="store_true",
+                        help="Keep the alpha and solid-background fast paths on (they skip the model)")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed regression fraction")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="rmbg-bench-")
+    model_path = args.model or build_stand_in_model(os.path.join(work_dir, "stand_in.onnx"))
+    # Configure the app before it is imported: real model path, scratch output
+    # directory, and no result cache (repeated payloads would all be cache hits)
+    os.environ["MODEL_PATH"] = model_path
+    os.environ["PROCESSED_DIR"] = os.path.join(work_dir, "processed")
+    os.environ["RESULT_CACHE_ENABLED"] = "false"
+    fast_paths = "true" if args.fast_paths else "false"
+    os.environ["ALPHA_FAST_PATH"] = fast_paths
+    os.environ["SOLID_FAST_PATH"] = fast_paths
+
+    import onnxruntime as ort
+    from services.background_removal import BackgroundRemovalService
+
+    scenarios = DEFAULT_SCENARIOS
+    if args.scenarios:
+        wanted = set(args.scenarios.split(","))
+        scenarios = [s for s in DEFAULT_SCENARIOS if s[0] in wanted]
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+
+    print("Generating synthetic images...")
+    dataset = build_dataset(scenarios)
+
+    service = BackgroundRemovalService()
+    service.model_path = model_path
+    service.load_model()
+    if not service.is_model_loaded():
+        print(f"Could not load model {model_path}", file=sys.stderr)
+        return 2
+
+    print("Per-stage latency:")
+    stages = benchmark_stages(service, dataset, args.iterations)
+
+    payloads = [item["bytes"] for item in dataset.values()]
+    print("Throughput:")
+    throughput = {"service": benchmark_service_throughput(service, payloads, levels, args.requests)}
+    if not args.skip_http:
+        throughput["http"] = benchmark_http_throughput(payloads, levels, args.requests, args.url)
+
+    results = {
+        "schema_version": SCHEMA_VERSION,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": git_commit(),
+            "model": os.path.basename(model_path),
+            "stand_in_model": args.model is None,
+            "python": platform.python_version(),
+            "onnxruntime": ort.__version__,
+            "cpu_count": os.cpu_count(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "fast_paths": args.fast_paths,
+        },
+        "stages": stages,
+        "throughput": throughput,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
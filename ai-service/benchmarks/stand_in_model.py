@@ -0,0 +1,75 @@
+"""
+Build a small stand-in ONNX model with the same interface as RMBG-1.4
+(input (N, 3, 1024, 1024) float32 in [0, 1] -> output (N, 1, 1024, 1024) in [0, 1])
+so benchmarks and harnesses run without the real weights.
+
+The graph downsamples, runs a few convolutions and upsamples, so inference has
+a realistic shape (convs, resize, sigmoid) at a fraction of RMBG's cost.
+"""
+import argparse
+import os
+
+import numpy as np
+
+
+def build_stand_in_model(path: str, input_size: int = 1024, channels: int = 16, seed: int = 0) -> str:
+    """Write the stand-in model to path and return the path"""
+    try:
+        import onnx
+        from onnx import TensorProto, helper, numpy_helper
+    except ImportError as e:
+        raise RuntimeError(f"Building the stand-in model needs onnx (pip install -r benchmarks/requirements.txt): {e}")
+
+    rng = np.random.default_rng(seed)
+    w1 = rng.normal(0, 0.3, (channels, 3, 3, 3)).astype(np.float32)
+    b1 = np.zeros(channels, dtype=np.float32)
+    w2 = rng.normal(0, 0.3, (channels, channels, 3, 3)).astype(np.float32)
+    b2 = np.zeros(channels, dtype=np.float32)
+    # Final 1x1 conv: foreground where pixels are darker than a light backdrop
+    w3 = rng.normal(0, 0.05, (1, channels, 1, 1)).astype(np.float32)
+    b3 = np.array([0.0], dtype=np.float32)
+    # Darkness prior so masks are not random: sigmoid(8 * (0.7 - mean(rgb)))
+    gray_w = np.full((1, 3, 1, 1), -8.0 / 3.0, dtype=np.float32)
+    gray_b = np.array([5.6], dtype=np.float32)
+    scales = np.array([1.0, 1.0, 4.0, 4.0], dtype=np.float32)
+
+    initializers = [
+        numpy_helper.from_array(w1, "w1"), numpy_helper.from_array(b1, "b1"),
+        numpy_helper.from_array(w2, "w2"), numpy_helper.from_array(b2, "b2"),
+        numpy_helper.from_array(w3, "w3"), numpy_helper.from_array(b3, "b3"),
+        numpy_helper.from_array(gray_w, "gray_w"), numpy_helper.from_array(gray_b, "gray_b"),
+        numpy_helper.from_array(scales, "scales"),
+    ]
+    nodes = [
+        helper.make_node("AveragePool", ["input"], ["pooled"], kernel_shape=[4, 4], strides=[4, 4]),
+        helper.make_node("Conv", ["pooled", "w1", "b1"], ["c1"], pads=[1, 1, 1, 1]),
+        helper.make_node("Relu", ["c1"], ["r1"]),
+        helper.make_node("Conv", ["r1", "w2", "b2"], ["c2"], pads=[1, 1, 1, 1]),
+        helper.make_node("Relu", ["c2"], ["r2"]),
+        helper.make_node("Conv", ["r2", "w3", "b3"], ["detail"]),
+        helper.make_node("Conv", ["pooled", "gray_w", "gray_b"], ["prior"]),
+        helper.make_node("Add", ["prior", "detail"], ["logits"]),
+        helper.make_node("Resize", ["logits", "", "scales"], ["upsampled"], mode="linear"),
+        helper.make_node("Sigmoid", ["upsampled"], ["output"]),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "rmbg_stand_in",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["batch", 3, input_size, input_size])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, ["batch", 1, input_size, input_size])],
+        initializer=initializers,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    onnx.save(model, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the RMBG stand-in ONNX model")
+    parser.add_argument("output", help="Destination .onnx path")
+    args = parser.parse_args()
+    print(build_stand_in_model(args.output))
@@ -0,0 +1,82 @@
+"""
+Deterministic synthetic product photos for benchmarks and regression harnesses.
+"""
+import io
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+# (name, (width, height)) covering common camera, square and extreme aspect ratios
+DEFAULT_SCENARIOS: List[Tuple[str, Tuple[int, int]]] = [
+    ("small_4x3", (640, 480)),
+    ("square_1k", (1024, 1024)),
+    ("hd_16x9", (1920, 1080)),
+    ("camera_4x3", (4000, 3000)),
+    ("portrait_3x4", (3000, 4000)),
+    ("panorama_3x1", (6000, 2000)),
+]
+
+
+def make_product_image(size: Tuple[int, int], seed: int = 0) -> Tuple[Image.Image, np.ndarray]:
+    """Return a product shot on a near-uniform backdrop and its ground-truth mask"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+
+    # Light studio backdrop with a gentle vertical gradient and sensor noise
+    backdrop = np.linspace(235, 215, height, dtype=np.float32)[:, None, None]
+    backdrop = np.repeat(np.repeat(backdrop, width, axis=1), 3, axis=2)
+    backdrop += rng.normal(0, 2.0, backdrop.shape).astype(np.float32)
+    image = Image.fromarray(np.clip(backdrop, 0, 255).astype(np.uint8), "RGB")
+
+    mask = Image.new("L", size, 0)
+    draw = ImageDraw.Draw(image)
+    mask_draw = ImageDraw.Draw(mask)
+
+    # Product body: rounded box plus an ellipse "cap", sized relative to the frame
+    cx, cy = width // 2, height // 2
+    bw, bh = int(width * rng.uniform(0.25, 0.4)), int(height * rng.uniform(0.35, 0.55))
+    body = [cx - bw // 2, cy - bh // 3, cx + bw // 2, cy + bh // 2]
+    cap = [cx - bw // 3, cy - bh // 2, cx + bw // 3, cy - bh // 4]
+    color = tuple(int(c) for c in rng.integers(20, 160, 3))
+
+    # Soft shadow under the product (background, not mask)
+    shadow = Image.new("L", size, 0)
+    ImageDraw.Draw(shadow).ellipse(
+        [body[0], body[3] - bh // 20, body[2], body[3] + bh // 12], fill=90
+    )
+    shadow = shadow.filter(ImageFilter.GaussianBlur(max(2, width // 200)))
+    image.paste((120, 120, 120), mask=shadow)
+
+    draw.rounded_rectangle(body, radius=max(4, bw // 10), fill=color)
+    draw.ellipse(cap, fill=tuple(min(255, c + 40) for c in color))
+    mask_draw.rounded_rectangle(body, radius=max(4, bw // 10), fill=255)
+    mask_draw.ellipse(cap, fill=255)
+
+    # Label with texture so the subject is not flat
+    label = [cx - bw // 3, cy, cx + bw // 3, cy + bh // 4]
+    draw.rectangle(label, fill=(240, 240, 230))
+    for i in range(6):
+        y = label[1] + (i + 1) * (label[3] - label[1]) // 8
+        draw.line([label[0] + 4, y, label[2] - 4, y], fill=(60, 60, 60), width=max(1, height // 600))
+
+    return image, np.array(mask)
+
+
+def encode(image: Image.Image, fmt: str = "JPEG") -> bytes:
+    """Encode an image the way uploads arrive"""
+    buffer = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(buffer, format="JPEG", quality=90)
+    else:
+        image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def build_dataset(scenarios=DEFAULT_SCENARIOS, fmt: str = "JPEG") -> Dict[str, Dict]:
+    """Build {scenario: {"bytes", "size", "mask"}} for each scenario"""
+    dataset = {}
+    for index, (name, size) in enumerate(scenarios):
+        image, mask = make_product_image(size, seed=index)
+        dataset[name] = {"bytes": encode(image, fmt), "size": size, "mask": mask}
+    return dataset
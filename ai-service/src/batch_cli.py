@@ -0,0 +1,227 @@
+"""
+离线批量背景移除命令行工具
+
+遍历输入目录中的图片，使用多进程（每个进程一个 ORT 会话）生成蒙版/抠图，
+并把每张图片的结果追加到 manifest.jsonl，中断后重新运行会跳过已完成的文件。
+
+用法:
+    python src/batch_cli.py INPUT_DIR OUTPUT_DIR [--workers N] [--threads-per-worker N]
+                                                [--output mask|cutout|both]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, Optional, Tuple
+
+from PIL import Image
+
+from services.autotune import available_cpus
+from services.background_removal import BackgroundRemovalService
+from utils.archive import is_image_name
+
+MANIFEST_NAME = "manifest.jsonl"
+
+# 每个工作进程独立的服务实例
+_worker_service: Optional[BackgroundRemovalService] = None
+
+
+def _init_worker(intra_op_threads: int):
+    """在工作进程中创建服务并加载模型"""
+    global _worker_service
+    _worker_service = BackgroundRemovalService(intra_op_threads=intra_op_threads)
+    _worker_service.load_model()
+
+
+def output_paths(output_dir: str, rel_path: str) -> Tuple[str, str]:
+    """返回 (蒙版路径, 抠图路径)，保持输入目录结构
+
+    文件名保留原扩展名（a.jpg -> a.jpg_mask.png），a.jpg 和 a.png 不会写到同一个文件
+    """
+    return (
+        os.path.join(output_dir, f"{rel_path}_mask.png"),
+        os.path.join(output_dir, f"{rel_path}_cutout.png"),
+    )
+
+
+def _process_file(input_dir: str, output_dir: str, rel_path: str, output: str) -> Dict:
+    """在工作进程中处理单张图片并写出结果"""
+    source = os.path.join(input_dir, rel_path)
+    record = {"path": rel_path}
+    try:
+        # 文件可能在遍历之后被删除或变得不可读，记为失败而不中断整个任务
+        stat = os.stat(source)
+        record.update(size=stat.st_size, mtime=stat.st_mtime)
+        with open(source, "rb") as f:
+            image_bytes = f.read()
+
+        want_cutout = output in ("cutout", "both")
+        result = _worker_service.remove_background_from_bytes(image_bytes, include_image=want_cutout)
+
+        mask_path, cutout_path = output_paths(output_dir, rel_path)
+        os.makedirs(os.path.dirname(mask_path), exist_ok=True)
+        if output in ("mask", "both"):
+            Image.fromarray(result["mask"]).save(mask_path)
+            record["mask"] = os.path.relpath(mask_path, output_dir)
+        if want_cutout:
+            result["image"].save(cutout_path)
+            record["cutout"] = os.path.relpath(cutout_path, output_dir)
+
+        record.update(
+            status="ok",
+            confidence=result["confidence"],
+            method=result["method"],
+            processing_time=result["processing_time"],
+        )
+    except Exception as e:
+        record.update(status="error", error=str(e))
+    return record
+
+
+def iter_images(input_dir: str) -> Iterator[str]:
+    """按目录顺序惰性遍历图片，返回相对路径"""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if is_image_name(name):
+                yield os.path.relpath(os.path.join(root, name), input_dir)
+
+
+def load_manifest(manifest_path: str) -> Dict[str, Dict]:
+    """读取已完成的记录；同一路径以最后一条为准"""
+    done: Dict[str, Dict] = {}
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中断时可能留下半行
+                continue
+            if isinstance(record, dict) and "path" in record:
+                done[record["path"]] = record
+    return done
+
+
+def _end_partial_line(manifest_path: str):
+    """上次中断留下半行时先补换行，新记录从新的一行开始"""
+    if not os.path.exists(manifest_path) or os.path.getsize(manifest_path) == 0:
+        return
+    with open(manifest_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def output_kinds(output: str) -> Tuple[str, ...]:
+    """--output 对应的输出种类（也是 manifest 记录中的字段名）"""
+    return ("mask", "cutout") if output == "both" else (output,)
+
+
+def merge_outputs(record: Dict, previous: Optional[Dict]) -> Dict:
+    """同一文件未变化时保留上次成功生成的其他输出，例如先跑 mask 再跑 cutout"""
+    if previous is None or record.get("status") != "ok" or previous.get("status") != "ok":
+        return record
+    if (record.get("size"), record.get("mtime")) != (previous.get("size"), previous.get("mtime")):
+        return record
+    for kind in output_kinds("both"):
+        if kind in previous:
+            record.setdefault(kind, previous[kind])
+    return record
+
+
+def is_done(record: Optional[Dict], input_dir: str, rel_path: str, output: str = "mask") -> bool:
+    """文件未变化、上次处理成功且已有本次要求的全部输出时跳过"""
+    if record is None or record.get("status") != "ok":
+        return False
+    if not all(kind in record for kind in output_kinds(output)):
+        return False
+    try:
+        stat = os.stat(os.path.join(input_dir, rel_path))
+    except OSError:
+        return False
+    return record.get("size") == stat.st_size and record.get("mtime") == stat.st_mtime
+
+
+def run(
+    input_dir: str,
+    output_dir: str,
+    workers: int,
+    threads_per_worker: int,
+    output: str = "mask",
+    manifest_path: Optional[str] = None,
+) -> Dict:
+    """处理整个目录并返回汇总统计"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+    done = load_manifest(manifest_path)
+    _end_partial_line(manifest_path)
+
+    summary = {"processed": 0, "skipped": 0, "failed": 0}
+    start_time = time.time()
+    window = workers * 2
+
+    with open(manifest_path, "a", encoding="utf-8") as manifest, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(threads_per_worker,)
+    ) as executor:
+        pending = set()
+
+        def drain(return_when):
+            finished, still_pending = wait(pending, return_when=return_when)
+            for future in finished:
+                record = future.result()
+                record = merge_outputs(record, done.get(record["path"]))
+                manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+                manifest.flush()
+                if record["status"] == "ok":
+                    summary["processed"] += 1
+                else:
+                    summary["failed"] += 1
+                    print(f"失败: {record['path']}: {record.get('error')}", file=sys.stderr)
+            return still_pending
+
+        for rel_path in iter_images(input_dir):
+            if is_done(done.get(rel_path), input_dir, rel_path, output):
+                summary["skipped"] += 1
+                continue
+            pending.add(executor.submit(_process_file, input_dir, output_dir, rel_path, output))
+            # 限制在途任务数量，避免一次性提交数百万个任务
+            if len(pending) >= window:
+                pending = drain(FIRST_COMPLETED)
+
+        while pending:
+            pending = drain(FIRST_COMPLETED)
+
+    summary["elapsed"] = time.time() - start_time
+    return summary
+
+
+def main(argv=None) -> int:
+    cpu_count = available_cpus()
+    parser = argparse.ArgumentParser(description="离线批量背景移除")
+    parser.add_argument("input_dir", help="输入图片目录（递归遍历）")
+    parser.add_argument("output_dir", help="输出目录，保持输入目录结构")
+    parser.add_argument("--workers", type=int, default=max(1, cpu_count // 2), help="工作进程数")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="每个进程的 ORT 线程数（默认 CPU 核数 / 进程数）")
+    parser.add_argument("--output", choices=["mask", "cutout", "both"], default="mask", help="输出内容")
+    parser.add_argument("--manifest", default=None, help="manifest 路径（默认 OUTPUT_DIR/manifest.jsonl）")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"输入目录不存在: {args.input_dir}")
+
+    threads = args.threads_per_worker or max(1, cpu_count // args.workers)
+    summary = run(args.input_dir, args.output_dir, args.workers, threads, args.output, args.manifest)
+    print(
+        f"完成: 处理 {summary['processed']}，跳过 {summary['skipped']}，"
+        f"失败 {summary['failed']}，耗时 {summary['elapsed']:.1f}s"
+    )
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+把预处理（和可选的阈值化）融合进 RMBG ONNX 模型
+
+包装后的模型输入为解码后的原始像素（uint8，NHWC，任意高宽），图内依次执行
+Resize（uint8 上带抗锯齿缩放）→ Transpose → Cast → Mul(1/255)，再接原模型。
+先在 uint8 上缩放，大图不会被展开成全分辨率的 float 张量；结果和 PIL 一样取整到 0-255。
+缩放和归一化由 ORT 的多线程算子完成，不再占用单线程的 PIL / NumPy。
+服务在送入前会按 max_image_size 和两步缩放先缩小图片，与 Python 预处理一致。
+
+--resample 默认取服务的 PREPROCESS_RESAMPLE（lanczos）。ONNX Resize 没有 lanczos，
+用 cubic 近似：与 PIL 的 lanczos 相比平均差约 0.002，最大差约 2/255（见测试）。
+
+可选的输出端融合：
+- --threshold T: 蒙版按阈值二值化（输出仍为 0/1 的 float，模型分辨率）
+
+蒙版不在图内放大：送入的图片已被服务缩小，图内拿不到原图尺寸，放大仍由服务完成。
+
+服务加载模型时根据输入类型（uint8）自动识别，直接送入原始像素。
+量化请在融合之前进行（静态量化的校准依赖 Python 预处理）。
+
+用法:
+    python src/fuse_preprocess.py --model models/rmbg-1.4.onnx --output models/rmbg-1.4.fused.onnx
+    MODEL_PATH=models/rmbg-1.4.fused.onnx python src/main.py
+"""
+import argparse
+import os
+import sys
+from typing import Optional
+
+import numpy as np
+
+# Resize 的 antialias 属性从 opset 18 开始提供
+MIN_OPSET = 18
+RESIZE_MODES = {
+    "bilinear": "linear",
+    "bicubic": "cubic",
+    # ONNX Resize 没有 lanczos，用 cubic 近似
+    "lanczos": "cubic",
+}
+# 与服务的预处理默认值一致
+DEFAULT_RESAMPLE = os.getenv("PREPROCESS_RESAMPLE", "lanczos")
+
+
+def fused_model_path(model_path: str) -> str:
+    """默认输出路径: <model>.fused.onnx"""
+    stem, ext = os.path.splitext(model_path)
+    return f"{stem}.fused{ext or '.onnx'}"
+
+
+def _load_onnx():
+    """融合依赖 onnx 包，只在实际生成模型时导入"""
+    try:
+        import onnx
+    except ImportError as e:
+        raise RuntimeError(f"融合预处理需要安装 onnx 包（pip install -r requirements-tools.txt）: {e}")
+    return onnx
+
+
+def fuse_preprocess(
+    model_path: str,
+    output_path: str,
+    resample: str = DEFAULT_RESAMPLE,
+    threshold: Optional[float] = None,
+) -> str:
+    """生成输入为 uint8 NHWC 的包装模型并返回输出路径"""
+    onnx = _load_onnx()
+    from onnx import TensorProto, helper, numpy_helper
+
+    if resample not in RESIZE_MODES:
+        raise ValueError(f"未知的缩放方式: {resample}，可选 {list(RESIZE_MODES)}")
+    if resample == "lanczos":
+        print("ONNX Resize 没有 lanczos，图内用 cubic 近似")
+
+    model = onnx.load(model_path)
+    opset = next((o.version for o in model.opset_import if o.domain in ("", "ai.onnx")), 0)
+    if opset < MIN_OPSET:
+        from onnx import version_converter
+        model = version_converter.convert_version(model, MIN_OPSET)
+
+    graph = model.graph
+    initializers = {init.name for init in graph.initializer}
+    model_input = next(i for i in graph.input if i.name not in initializers)
+    if model_input.type.tensor_type.elem_type == TensorProto.UINT8:
+        raise ValueError(f"模型已经是 uint8 输入，可能已融合过: {model_path}")
+    dims = model_input.type.tensor_type.shape.dim
+    height, width = dims[2].dim_value, dims[3].dim_value
+    if not height or not width:
+        raise ValueError("模型输入的高宽必须是固定值")
+    model_output = graph.output[0]
+
+    prefix = "fused_preprocess/"
+    image_name = "image"
+    raw_input = helper.make_tensor_value_info(image_name, TensorProto.UINT8, ["batch", "height", "width", 3])
+    constants = [
+        numpy_helper.from_array(np.array([height, width], dtype=np.int64), prefix + "sizes"),
+        numpy_helper.from_array(np.array(1.0 / 255.0, dtype=np.float32), prefix + "scale"),
+    ]
+    resize_attrs = {"mode": RESIZE_MODES[resample], "antialias": 1, "axes": [1, 2]}
+    if resize_attrs["mode"] == "cubic":
+        # 与 PIL 的双三次核一致
+        resize_attrs["cubic_coeff_a"] = -0.5
+    pre_nodes = [
+        # 在 uint8 的 NHWC 上缩放：三次插值的过冲和 PIL 一样截断到 0-255
+        helper.make_node("Resize", [image_name, "", "", prefix + "sizes"], [prefix + "resized"], **resize_attrs),
+        helper.make_node("Transpose", [prefix + "resized"], [prefix + "nchw"], perm=[0, 3, 1, 2]),
+        helper.make_node("Cast", [prefix + "nchw"], [prefix + "float"], to=TensorProto.FLOAT),
+        helper.make_node("Mul", [prefix + "float", prefix + "scale"], [model_input.name]),
+    ]
+
+    post_nodes = []
+    if threshold is not None:
+        prefix = "fused_postprocess/"
+        mask_name = model_output.name + "/model"
+        for node in graph.node:
+            node.output[:] = [mask_name if name == model_output.name else name for name in node.output]
+        constants.append(numpy_helper.from_array(np.array(threshold, dtype=np.float32), prefix + "threshold"))
+        post_nodes += [
+            helper.make_node("Greater", [mask_name, prefix + "threshold"], [prefix + "binary"]),
+            helper.make_node("Cast", [prefix + "binary"], [model_output.name], to=TensorProto.FLOAT),
+        ]
+
+    graph.input.remove(model_input)
+    graph.input.insert(0, raw_input)
+    graph.initializer.extend(constants)
+    nodes = pre_nodes + list(graph.node) + post_nodes
+    del graph.node[:]
+    graph.node.extend(nodes)
+
+    onnx.checker.check_model(model)
+    onnx.save(model, output_path)
+    return output_path
+
+
+def main(argv=None) -> int:
+    default_model = os.getenv("MODEL_PATH", "models/rmbg-1.4.onnx")
+    parser = argparse.ArgumentParser(description="把预处理融合进 ONNX 模型")
+    parser.add_argument("--model", default=default_model, help="原模型路径（FP32 或已量化的 INT8）")
+    parser.add_argument("--output", default=None, help="输出路径（默认 <model>.fused.onnx）")
+    parser.add_argument("--resample", choices=list(RESIZE_MODES), default=DEFAULT_RESAMPLE,
+                        help="图内缩放方式（默认取 PREPROCESS_RESAMPLE）")
+    parser.add_argument("--threshold", type=float, default=None, help="蒙版二值化阈值（0-1）")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.model):
+        parser.error(f"模型不存在: {args.model}")
+
+    output_path = args.output or fused_model_path(args.model)
+    fuse_preprocess(args.model, output_path, args.resample, args.threshold)
+    print(f"融合完成: {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
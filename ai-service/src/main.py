@@ -1,24 +1,67 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, JSONResponse
+from fastapi.responses import Response, JSONResponse, StreamingResponse, PlainTextResponse
 import uvicorn
 from services.background_removal import BackgroundRemovalService
+from services.inference_pool import InferencePool
+from services.result_cache import ResultCache
+from services.janitor import ProcessedJanitor
+from services.metrics import MetricsRegistry, StageTimer, process_start_time, server_timing_header
+from utils.archive import is_archive, iter_archive_images
+from utils.image_processing import map_image_file
+from utils.mask_encoding import MASK_FORMATS, encode_mask
+from models.request import RemovalPathRequest
 from models.response import RemovalResponse, HealthResponse # 确保 models/response.py 已创建
 from models.exceptions import (
     BackgroundRemovalError,
     ModelNotLoadedError,
     ImageProcessingError,
     InferenceError,
-    LowConfidenceError
+    LowConfidenceError,
+    ServiceOverloadedError
 )
-import io
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Tuple, Union
+import asyncio
+import base64
+import json
 import os
+import time
 import uuid
-from PIL import Image
 import traceback
 
 # --- 配置 ---
-PROCESSED_DIR = "/app/uploads/processed"
+PROCESSED_DIR = os.getenv("PROCESSED_DIR", "/app/uploads/processed")
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MEMORY_MB = int(os.getenv("RESULT_CACHE_MEMORY_MB", 64))
+# 只缓存由模型或快速路径得到的结果；回退结果可能源于临时故障（推理异常、模型未加载、超时），不应长期复用
+CACHEABLE_METHODS = ("ai_model", "alpha", "solid_background")
+# PROCESSED_DIR 清理：蒙版和缓存文件的最长保留时间与总大小上限（0 表示不限制）
+JANITOR_ENABLED = os.getenv("JANITOR_ENABLED", "true").lower() == "true"
+PROCESSED_MAX_AGE_HOURS = float(os.getenv("PROCESSED_MAX_AGE_HOURS", 24))
+PROCESSED_MAX_MB = int(os.getenv("PROCESSED_MAX_MB", 2048))
+JANITOR_INTERVAL = float(os.getenv("JANITOR_INTERVAL", 300))
+JANITOR_MIN_AGE = float(os.getenv("JANITOR_MIN_AGE", 300))
+JANITOR_MAX_DELETES = int(os.getenv("JANITOR_MAX_DELETES", 10000))
+
+# 蒙版默认编码格式和返回方式，可按请求覆盖（mask_format / delivery 参数）
+MASK_FORMAT = os.getenv("MASK_FORMAT", "png")
+MASK_DELIVERY = os.getenv("MASK_DELIVERY", "path")
+MASK_DELIVERIES = ("path", "inline", "stream")
+if MASK_FORMAT not in MASK_FORMATS:
+    raise ValueError(f"MASK_FORMAT 必须是 {list(MASK_FORMATS)} 之一: {MASK_FORMAT}")
+if MASK_DELIVERY not in MASK_DELIVERIES:
+    raise ValueError(f"MASK_DELIVERY 必须是 {list(MASK_DELIVERIES)} 之一: {MASK_DELIVERY}")
+# /api/remove-background/raw 请求体上限，超过返回 413
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", 50))
+# 与后端共享的上传目录；/api/remove-background/path 只接受该目录内的文件
+SHARED_INPUT_DIR = os.getenv("SHARED_INPUT_DIR", os.getenv("UPLOAD_DIR", "/app/uploads"))
+
+# 进程启动时间，用于统计启动各阶段耗时和首个请求时间
+PROCESS_START = process_start_time()
+# 启动阶段耗时（秒）以及就绪/首个请求相对进程启动的时间
+startup_timings = StageTimer()
+startup_state = {"ready_after": None, "first_request_after": None}
 
 # --- FastAPI 应用实例 ---
 app = FastAPI(title="AI Background Removal Service")
@@ -32,56 +75,526 @@ app.add_middleware(
 )
 
 bg_removal_service = BackgroundRemovalService()
+# 推理在有界线程池/进程池中执行，避免阻塞事件循环
+inference_pool = InferencePool(bg_removal_service)
+# 以上传内容哈希为键的结果缓存（内存 LRU + PROCESSED_DIR/cache 磁盘层）
+result_cache = ResultCache(
+    os.path.join(PROCESSED_DIR, "cache"),
+    max_memory_bytes=RESULT_CACHE_MEMORY_MB * 1024 * 1024,
+    enabled=RESULT_CACHE_ENABLED
+)
 
-@app.on_event("startup")
-async def startup_event():
-    """应用启动时加载模型并创建目录"""
-    os.makedirs(PROCESSED_DIR, exist_ok=True)
+# 后台定期清理 PROCESSED_DIR 中过期或超出配额的蒙版和缓存文件
+janitor = ProcessedJanitor(
+    PROCESSED_DIR,
+    max_age_seconds=PROCESSED_MAX_AGE_HOURS * 3600 if PROCESSED_MAX_AGE_HOURS > 0 else None,
+    max_bytes=PROCESSED_MAX_MB * 1024 * 1024 if PROCESSED_MAX_MB > 0 else None,
+    interval=JANITOR_INTERVAL,
+    min_age_seconds=JANITOR_MIN_AGE,
+    max_deletes=JANITOR_MAX_DELETES
+)
+
+# --- Prometheus 指标 ---
+metrics = MetricsRegistry()
+stage_duration = metrics.histogram(
+    "ai_stage_duration_seconds", "Time spent in each processing stage", ["stage"]
+)
+request_duration = metrics.histogram(
+    "ai_request_duration_seconds", "End-to-end processing time per image", ["method"]
+)
+requests_total = metrics.counter(
+    "ai_requests_total", "Processed images by outcome", ["outcome"]
+)
+metrics.collector("ai_inflight_requests", "gauge", "Requests running or queued in the inference pool",
+                  lambda: [({}, inference_pool.stats()["in_flight"])])
+metrics.collector("ai_queue_capacity", "gauge", "Maximum running plus queued requests",
+                  lambda: [({}, inference_pool.capacity)])
+metrics.collector("ai_rejected_requests_total", "counter", "Requests rejected because the queue was full",
+                  lambda: [({}, inference_pool.stats()["rejected"])])
+metrics.collector("ai_model_loaded", "gauge", "Whether the ONNX model is loaded",
+                  lambda: [({}, 1 if inference_pool.is_model_loaded() else 0)])
+metrics.collector("ai_model_load_seconds", "gauge", "Model load and warmup time",
+                  lambda: [({}, inference_pool.model_load_time())] if inference_pool.model_load_time() is not None else [])
+metrics.collector("ai_model_profile_info", "gauge", "Loaded precision profiles (1 = default profile)",
+                  lambda: [({"profile": p}, 1 if p == inference_pool.active_profile() else 0)
+                           for p in inference_pool.available_profiles()])
+metrics.collector("ai_startup_phase_seconds", "gauge", "Seconds spent in each startup phase",
+                  lambda: [({"phase": phase}, seconds) for phase, seconds in startup_phases().items()])
+metrics.collector("ai_time_to_ready_seconds", "gauge", "Seconds from process start until the model was ready",
+                  lambda: [({}, startup_state["ready_after"])] if startup_state["ready_after"] is not None else [])
+metrics.collector("ai_time_to_first_request_seconds", "gauge", "Seconds from process start until the first processed request",
+                  lambda: [({}, startup_state["first_request_after"])] if startup_state["first_request_after"] is not None else [])
+metrics.collector("ai_cache_hits_total", "counter", "Result cache hits by tier",
+                  lambda: [({"tier": "memory"}, result_cache.stats()["memory_hits"]),
+                           ({"tier": "disk"}, result_cache.stats()["disk_hits"])])
+metrics.collector("ai_cache_misses_total", "counter", "Result cache misses",
+                  lambda: [({}, result_cache.stats()["misses"])])
+metrics.collector("ai_cache_evictions_total", "counter", "Result cache memory-tier evictions",
+                  lambda: [({}, result_cache.stats()["evictions"])])
+metrics.collector("ai_cache_memory_bytes", "gauge", "Bytes held by the result cache memory tier",
+                  lambda: [({}, result_cache.stats()["memory_bytes"])])
+metrics.collector("ai_janitor_reclaimed_files_total", "counter", "Files deleted from PROCESSED_DIR by reason",
+                  lambda: [({"reason": reason}, r["files"]) for reason, r in janitor.stats()["reclaimed"].items()])
+metrics.collector("ai_janitor_reclaimed_bytes_total", "counter", "Bytes reclaimed from PROCESSED_DIR by reason",
+                  lambda: [({"reason": reason}, r["bytes"]) for reason, r in janitor.stats()["reclaimed"].items()])
+metrics.collector("ai_janitor_sweeps_total", "counter", "Completed janitor sweeps",
+                  lambda: [({}, janitor.stats()["sweeps"])])
+metrics.collector("ai_janitor_sweep_seconds", "gauge", "Duration of the last janitor sweep",
+                  lambda: [({}, janitor.stats()["last_sweep"]["duration"])] if janitor.stats()["last_sweep"] else [])
+metrics.collector("ai_processed_dir_files", "gauge", "Managed files in PROCESSED_DIR after the last sweep",
+                  lambda: [({}, janitor.stats()["last_sweep"]["files"])] if janitor.stats()["last_sweep"] else [])
+metrics.collector("ai_processed_dir_bytes", "gauge", "Bytes of managed files in PROCESSED_DIR after the last sweep",
+                  lambda: [({}, janitor.stats()["last_sweep"]["bytes"])] if janitor.stats()["last_sweep"] else [])
+metrics.collector("ai_batch_runs_total", "counter", "Batched session.run calls",
+                  lambda: [({}, inference_pool.batch_stats()["batches"])] if inference_pool.batch_stats() else [])
+metrics.collector("ai_batch_items_total", "counter", "Images processed through batched inference",
+                  lambda: [({}, inference_pool.batch_stats()["items"])] if inference_pool.batch_stats() else [])
+
+def startup_phases() -> dict:
+    """应用启动阶段与模型加载各阶段的耗时（秒）"""
+    return {**startup_timings.timings, **inference_pool.load_status()["timings"]}
+
+async def load_model_in_background():
+    """后台加载模型；加载期间推理请求返回 503，/health 报告加载阶段"""
     try:
-        bg_removal_service.load_model()
-        print("AI 服务启动成功，模型已加载")
+        with startup_timings.stage("model_load"):
+            # 进程池模式下由每个工作进程各自加载模型
+            await inference_pool.start()
+        startup_state["ready_after"] = time.time() - PROCESS_START
+        print(f"AI 服务启动成功（{startup_state['ready_after']:.2f}s），推理池: {inference_pool.stats()}")
     except Exception as e:
         print(f"警告: 启动时加载模型失败: {e}")
 
+@app.on_event("startup")
+async def startup_event():
+    """应用启动时创建目录并在后台加载模型，不阻塞端口监听；启动 PROCESSED_DIR 定期清理"""
+    startup_timings.add("app_init", time.time() - PROCESS_START)
+    os.makedirs(PROCESSED_DIR, exist_ok=True)
+    app.state.model_loader = asyncio.create_task(load_model_in_background())
+    if JANITOR_ENABLED:
+        app.state.janitor = asyncio.create_task(janitor.run())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时停止清理任务并释放推理池"""
+    if JANITOR_ENABLED:
+        app.state.janitor.cancel()
+    inference_pool.shutdown()
+    if bg_removal_service.batch_scheduler is not None:
+        bg_removal_service.batch_scheduler.shutdown()
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """健康检查端点"""
+    await inference_pool.refresh_status()
+    pool_stats = inference_pool.stats()
     return HealthResponse(
-        status="healthy",
-        model_loaded=bg_removal_service.is_model_loaded()
+        status="loading" if inference_pool.state == "loading" else "healthy",
+        model_loaded=inference_pool.is_model_loaded(),
+        model_profile=inference_pool.active_profile(),
+        profiles=inference_pool.available_profiles(),
+        in_flight=pool_stats["in_flight"],
+        queue_capacity=pool_stats["capacity"],
+        batching=inference_pool.batch_stats(),
+        cache=result_cache.stats(),
+        storage=janitor.stats(),
+        startup={
+            **inference_pool.load_status(),
+            "timings": startup_phases(),
+            **startup_state
+        }
     )
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus 指标端点"""
+    await inference_pool.refresh_status()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def save_mask(
+    result: dict,
+    cache_key: str = None,
+    timer: Optional[StageTimer] = None,
+    mask_format: str = "png",
+    delivery: str = "path"
+) -> Tuple[bytes, Optional[str]]:
+    """按指定格式编码蒙版（在线程池中调用），返回 (编码后的蒙版, 路径)。
+    delivery 为 path 时写入磁盘，inline/stream 时不写盘、路径为空；提供缓存键时写入缓存"""
+    timer = timer or StageTimer()
+    with timer.stage("mask_encode"):
+        data = encode_mask(result["mask"], mask_format)
+    extension = MASK_FORMATS[mask_format][1]
+    persist = delivery == "path"
+    
+    with timer.stage("disk_write"):
+        if cache_key is not None:
+            height, width = result["mask"].shape
+            return data, result_cache.put(
+                cache_key,
+                data,
+                {
+                    "confidence": result["confidence"],
+                    "method": result.get("method"),
+                    "profile": result.get("profile"),
+                    "mask_format": mask_format,
+                    "mask_size": [width, height]
+                },
+                extension=extension,
+                persist=persist
+            )
+        if not persist:
+            return data, None
+        
+        # 按 uuid 前两位分目录，避免单个目录中文件过多
+        mask_id = uuid.uuid4().hex
+        mask_dir = os.path.join(PROCESSED_DIR, "masks", mask_id[:2])
+        os.makedirs(mask_dir, exist_ok=True)
+        mask_path = os.path.join(mask_dir, f"mask-{mask_id}{extension}")
+        with open(mask_path, "wb") as f:
+            f.write(data)
+        return data, mask_path
+
+def is_cacheable(result: dict) -> bool:
+    """结果是否可以写入缓存：方法可缓存，且不是因超出回退时限而保留的低置信度模型结果"""
+    return result.get("method") in CACHEABLE_METHODS and not result.get("low_confidence")
+
+def record_metrics(timer: StageTimer, method: str, elapsed: float):
+    """记录各阶段耗时和请求总耗时，以及进程启动到首个请求完成的时间"""
+    for stage, seconds in timer.timings.items():
+        stage_duration.observe(seconds, stage=stage)
+    request_duration.observe(elapsed, method=method)
+    requests_total.inc(outcome="cache_hit" if method == "cache" else "success")
+    if startup_state["first_request_after"] is None:
+        startup_state["first_request_after"] = time.time() - PROCESS_START
+
+def check_profile(profile: Optional[str]):
+    """请求指定的精度档位必须已加载，否则返回 400"""
+    if profile is not None and profile not in inference_pool.available_profiles():
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的精度档位: {profile}，可用: {inference_pool.available_profiles()}"
+        )
+
+def resolve_shared_path(path: str) -> str:
+    """把请求中的路径解析为共享上传目录内的真实路径；目录外（包括经符号链接逃逸）返回 403"""
+    root = os.path.realpath(SHARED_INPUT_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise HTTPException(status_code=403, detail="路径不在共享上传目录内")
+    if not os.path.isfile(resolved):
+        raise HTTPException(status_code=404, detail=f"文件不存在: {path}")
+    return resolved
+
+async def read_body_limited(request: Request, limit: int) -> bytearray:
+    """把请求体流式读入缓冲区（按 Content-Length 预分配），超过 limit 字节立即返回 413，不会先整体读入内存"""
+    declared = request.headers.get("content-length")
+    try:
+        expected = int(declared) if declared else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Content-Length 无效")
+    if expected > limit:
+        raise HTTPException(status_code=413, detail=f"请求体超过 {limit} 字节")
+    
+    buffer = bytearray(expected)
+    size = 0
+    async for chunk in request.stream():
+        end = size + len(chunk)
+        if end > limit:
+            raise HTTPException(status_code=413, detail=f"请求体超过 {limit} 字节")
+        if end <= len(buffer):
+            buffer[size:end] = chunk
+        else:
+            # 未声明长度（分块传输）或实际长于声明
+            del buffer[size:]
+            buffer += chunk
+        size = end
+    # 实际短于声明的长度时截掉多余部分
+    del buffer[size:]
+    return buffer
+
+def check_output(mask_format: str, delivery: str):
+    """蒙版格式和返回方式必须是支持的取值，否则返回 400"""
+    if mask_format not in MASK_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的蒙版格式: {mask_format}，可用: {list(MASK_FORMATS)}")
+    if delivery not in MASK_DELIVERIES:
+        raise HTTPException(status_code=400, detail=f"不支持的返回方式: {delivery}，可用: {list(MASK_DELIVERIES)}")
+
+def make_cache_key(image: Union[bytes, str], profile: Optional[str] = None, mask_format: str = "png") -> str:
+    """计算结果缓存键（在线程池中调用）；共享卷文件通过 mmap 直接哈希，不读入内存"""
+    model_id = inference_pool.model_id(profile)
+    params = {**bg_removal_service.cache_params(), "mask_format": mask_format}
+    if isinstance(image, str):
+        with map_image_file(image) as data:
+            return ResultCache.make_key(data, model_id, params)
+    return ResultCache.make_key(image, model_id, params)
+
+async def process_image_bytes(
+    image: Union[bytes, str],
+    wait: bool = False,
+    timer: Optional[StageTimer] = None,
+    profile: Optional[str] = None,
+    mask_format: str = MASK_FORMAT,
+    delivery: str = MASK_DELIVERY
+) -> Tuple[RemovalResponse, bytes]:
+    """处理单张图片：查询缓存、推理并编码蒙版，返回响应和编码后的蒙版。
+    image 为图片字节或共享卷上的文件路径（路径只传给推理进程，由其 mmap 解码）。
+    wait=True 时队列满则等待而不是抛出异常；profile 为 None 时使用默认精度档位；
+    delivery 为 inline 时蒙版以 base64 放在响应的 mask 字段中"""
+    start_time = time.time()
+    timer = timer or StageTimer()
+    
+    # 重复上传直接返回缓存的蒙版和置信度
+    cache_key = None
+    if result_cache.enabled:
+        cache_start = time.perf_counter()
+        cache_key = await run_in_threadpool(make_cache_key, image, profile, mask_format)
+        cached = await run_in_threadpool(result_cache.get_entry, cache_key)
+        timer.add("cache_lookup", time.perf_counter() - cache_start)
+        if cached is not None:
+            data, metadata = cached
+            # 之前以 inline/stream 返回的结果只在内存中，按路径返回时补写磁盘
+            if delivery == "path" and metadata["mask_path"] is None:
+                metadata["mask_path"] = await run_in_threadpool(
+                    result_cache.put, cache_key, data, metadata, MASK_FORMATS[mask_format][1]
+                )
+            record_metrics(timer, "cache", time.time() - start_time)
+            return RemovalResponse(
+                success=True,
+                confidence=metadata["confidence"],
+                processing_time=time.time() - start_time,
+                message="背景移除成功（缓存命中）",
+                mask_path=metadata["mask_path"] if delivery == "path" else None,
+                cached=True,
+                profile=metadata.get("profile"),
+                method=metadata.get("method"),
+                mask_format=mask_format,
+                mask_size=metadata.get("mask_size"),
+                mask=await run_in_threadpool(encode_inline, data) if delivery == "inline" else None
+            ), data
+    
+    # 解码、推理均在推理池中执行；队列满时抛出 ServiceOverloadedError
+    if isinstance(image, str):
+        result = await inference_pool.remove_background_from_file(image, wait=wait, profile=profile)
+    else:
+        result = await inference_pool.remove_background(image, wait=wait, profile=profile)
+    for stage, seconds in result.get("timings", {}).items():
+        timer.add(stage, seconds)
+    
+    if cache_key is not None and not is_cacheable(result):
+        cache_key = None
+    
+    # 蒙版编码和写盘在线程池中执行，不占用事件循环
+    data, mask_path = await run_in_threadpool(save_mask, result, cache_key, timer, mask_format, delivery)
+    
+    record_metrics(timer, result.get("method", "unknown"), time.time() - start_time)
+    
+    message = "背景移除成功"
+    height, width = result["mask"].shape
+    
+    return RemovalResponse(
+        success=True,
+        confidence=result["confidence"],
+        processing_time=result["processing_time"],
+        message=message,
+        mask_path=mask_path,  # 在响应中返回路径
+        profile=result.get("profile"),
+        method=result.get("method"),
+        mask_format=mask_format,
+        mask_size=[width, height],
+        mask=await run_in_threadpool(encode_inline, data) if delivery == "inline" else None
+    ), data
+
+def encode_inline(data: bytes) -> str:
+    """inline 返回时蒙版的 base64 编码"""
+    return base64.b64encode(data).decode("ascii")
+
+def mask_stream_response(result: RemovalResponse, data: bytes) -> Response:
+    """stream 返回：响应体直接是编码后的蒙版，其余结果放在响应头中"""
+    headers = {
+        "X-Confidence": str(result.confidence),
+        "X-Processing-Time": str(result.processing_time),
+        "X-Cached": "true" if result.cached else "false",
+        "X-Mask-Format": result.mask_format,
+        "X-Mask-Width": str(result.mask_size[0]),
+        "X-Mask-Height": str(result.mask_size[1]),
+    }
+    if result.profile is not None:
+        headers["X-Profile"] = result.profile
+    return Response(content=data, media_type=MASK_FORMATS[result.mask_format][0], headers=headers)
+
 @app.post("/api/remove-background", response_model=RemovalResponse)
-async def remove_background(file: UploadFile = File(...)):
-    """移除图片背景，并返回包含蒙版路径的JSON。"""
+async def remove_background(
+    response: Response,
+    file: UploadFile = File(...),
+    profile: Optional[str] = Query(None, description="精度档位: quality（FP32）或 fast（INT8），默认使用部署配置"),
+    mask_format: str = Query(MASK_FORMAT, description="蒙版格式: png、png_fast、webp、raw 或 rle"),
+    delivery: str = Query(MASK_DELIVERY, description="返回方式: path（写盘返回路径）、inline（base64）或 stream（响应体）")
+):
+    """移除图片背景，并返回包含蒙版路径（或内联蒙版）的JSON；delivery=stream 时直接返回蒙版。"""
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="文件必须是图片格式")
+    check_profile(profile)
+    check_output(mask_format, delivery)
     
-    try:
+    timer = StageTimer()
+    with timer.stage("upload_read"):
         image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        result = bg_removal_service.remove_background(image)
-        
-        # --- 关键修改：保存蒙版文件 ---
-        mask_image = Image.fromarray(result["mask"])
-        mask_filename = f"mask-{uuid.uuid4()}.png"
-        mask_path = os.path.join(PROCESSED_DIR, mask_filename)
-        mask_image.save(mask_path)
-        # -----------------------------
-        
-        message = "背景移除成功"
-        
-        return RemovalResponse(
-            success=True,
-            confidence=result["confidence"],
-            processing_time=result["processing_time"],
-            message=message,
-            mask_path=mask_path  # 在响应中返回路径
+    return await run_removal(response, image_bytes, timer, profile, mask_format, delivery)
+
+@app.post("/api/remove-background/raw", response_model=RemovalResponse)
+async def remove_background_raw(
+    request: Request,
+    response: Response,
+    profile: Optional[str] = Query(None, description="精度档位: quality（FP32）或 fast（INT8），默认使用部署配置"),
+    mask_format: str = Query(MASK_FORMAT, description="蒙版格式: png、png_fast、webp、raw 或 rle"),
+    delivery: str = Query(MASK_DELIVERY, description="返回方式: path（写盘返回路径）、inline（base64）或 stream（响应体）")
+):
+    """移除图片背景：请求体直接是图片内容（application/octet-stream 或 image/*），不经过 multipart 解析。"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type != "application/octet-stream" and not content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="请求体必须是图片内容（application/octet-stream 或 image/*）")
+    check_profile(profile)
+    check_output(mask_format, delivery)
+    
+    timer = StageTimer()
+    with timer.stage("upload_read"):
+        image_bytes = await read_body_limited(request, int(MAX_UPLOAD_MB * 1024 * 1024))
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="请求体为空")
+    return await run_removal(response, image_bytes, timer, profile, mask_format, delivery)
+
+@app.post("/api/remove-background/path", response_model=RemovalResponse)
+async def remove_background_path(
+    body: RemovalPathRequest,
+    response: Response,
+    profile: Optional[str] = Query(None, description="精度档位: quality（FP32）或 fast（INT8），默认使用部署配置"),
+    mask_format: str = Query(MASK_FORMAT, description="蒙版格式: png、png_fast、webp、raw 或 rle"),
+    delivery: str = Query(MASK_DELIVERY, description="返回方式: path（写盘返回路径）、inline（base64）或 stream（响应体）")
+):
+    """移除共享上传目录中图片的背景：只传文件路径，推理进程 mmap 读取，图片不经过 HTTP 传输。"""
+    check_profile(profile)
+    check_output(mask_format, delivery)
+    path = resolve_shared_path(body.path)
+    return await run_removal(response, path, StageTimer(), profile, mask_format, delivery)
+
+async def run_removal(
+    response: Response,
+    image: Union[bytes, str],
+    timer: StageTimer,
+    profile: Optional[str],
+    mask_format: str = MASK_FORMAT,
+    delivery: str = MASK_DELIVERY
+) -> Union[RemovalResponse, Response]:
+    """单张图片接口的公共部分：处理图片、写入 Server-Timing，并把异常映射为 HTTP 状态码"""
+    try:
+        result, data = await process_image_bytes(
+            image, timer=timer, profile=profile, mask_format=mask_format, delivery=delivery
+        )
+        if delivery == "stream":
+            response = mask_stream_response(result, data)
+        # 各阶段耗时写入 Server-Timing 响应头
+        response.headers["Server-Timing"] = server_timing_header(timer.timings)
+        return response if delivery == "stream" else result
+    except ServiceOverloadedError as e:
+        requests_total.inc(outcome="rejected")
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
     except Exception as e:
+        requests_total.inc(outcome="error")
         print(f"未知错误: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"处理失败: {e}")
 
+def iter_batch_sources(files: List[UploadFile]):
+    """按顺序产出 (文件名, 读取函数)；压缩包逐个展开其中的图片"""
+    for upload in files:
+        if is_archive(upload.filename, upload.content_type):
+            for name, data in iter_archive_images(upload.file, upload.filename):
+                yield name, data
+        else:
+            upload.file.seek(0)
+            yield upload.filename, upload.file.read()
+
+async def stream_batch_results(
+    files: List[UploadFile],
+    profile: Optional[str] = None,
+    mask_format: str = MASK_FORMAT,
+    delivery: str = MASK_DELIVERY
+):
+    """逐张处理并在每张完成时输出一行 NDJSON，最后输出汇总行"""
+    # 单个批次最多同时占用与推理工作线程数相同的槽位，既能跑满模型又不会挤占其他请求
+    window = max(1, inference_pool.max_workers)
+    sources = iter_batch_sources(files)
+    pending = {}
+    index = 0
+    succeeded = 0
+    failed = 0
+    exhausted = False
+    
+    async def run_one(item_index: int, filename: str, image_bytes: bytes) -> dict:
+        try:
+            response, _ = await process_image_bytes(
+                image_bytes, wait=True, profile=profile, mask_format=mask_format, delivery=delivery
+            )
+            return {"index": item_index, "filename": filename, **response.model_dump()}
+        except Exception as e:
+            return {"index": item_index, "filename": filename, "success": False, "message": f"处理失败: {e}"}
+    
+    while pending or not exhausted:
+        while not exhausted and len(pending) < window:
+            try:
+                source = await run_in_threadpool(next, sources, None)
+            except Exception as e:
+                source = None
+                failed += 1
+                yield json.dumps({"index": index, "success": False, "message": f"读取失败: {e}"}, ensure_ascii=False) + "\n"
+            if source is None:
+                exhausted = True
+                break
+            filename, image_bytes = source
+            task = asyncio.ensure_future(run_one(index, filename, image_bytes))
+            pending[task] = index
+            index += 1
+        
+        if not pending:
+            break
+        done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            pending.pop(task)
+            item = task.result()
+            if item["success"]:
+                succeeded += 1
+            else:
+                failed += 1
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+    
+    yield json.dumps({"done": True, "total": succeeded + failed, "succeeded": succeeded, "failed": failed}) + "\n"
+
+@app.post("/api/remove-background/batch")
+async def remove_background_batch(
+    files: List[UploadFile] = File(...),
+    profile: Optional[str] = Query(None, description="精度档位: quality 或 fast"),
+    mask_format: str = Query(MASK_FORMAT, description="蒙版格式: png、png_fast、webp、raw 或 rle"),
+    delivery: Optional[str] = Query(None, description="返回方式: path 或 inline（每行带 base64 蒙版）")
+):
+    """批量移除背景：接受多张图片或 zip/tar 压缩包，以 NDJSON 流式返回每张图片的结果。"""
+    check_profile(profile)
+    # NDJSON 每行是一个 JSON 结果，不支持 stream；部署默认为 stream 时按 path 返回
+    delivery = delivery or ("inline" if MASK_DELIVERY == "inline" else "path")
+    check_output(mask_format, delivery)
+    if delivery == "stream":
+        raise HTTPException(status_code=400, detail="批量接口不支持 stream 返回方式")
+    for upload in files:
+        is_image = upload.content_type and upload.content_type.startswith("image/")
+        if not is_image and not is_archive(upload.filename, upload.content_type):
+            raise HTTPException(status_code=400, detail=f"文件必须是图片或压缩包: {upload.filename}")
+    
+    return StreamingResponse(
+        stream_batch_results(files, profile, mask_format, delivery),
+        media_type="application/x-ndjson"
+    )
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
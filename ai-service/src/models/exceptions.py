@@ -0,0 +1,38 @@
+class BackgroundRemovalError(Exception):
+    """
+    背景移除服务的基础异常。
+    """
+
+
+class ModelNotLoadedError(BackgroundRemovalError):
+    """
+    模型尚未加载。
+    """
+
+
+class ImageProcessingError(BackgroundRemovalError):
+    """
+    图片解码或预处理失败。
+    """
+
+
+class InferenceError(BackgroundRemovalError):
+    """
+    模型推理失败。
+    """
+
+
+class LowConfidenceError(BackgroundRemovalError):
+    """
+    分割结果置信度过低。
+    """
+
+
+class ServiceOverloadedError(BackgroundRemovalError):
+    """
+    推理队列已满，客户端应在 retry_after 秒后重试。
+    """
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
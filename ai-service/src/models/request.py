@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+class RemovalPathRequest(BaseModel):
+    """
+    共享卷输入：图片已在与后端共享的上传目录中，只传路径。
+    """
+    path: str  # 绝对路径，或相对于共享上传目录（SHARED_INPUT_DIR）的路径
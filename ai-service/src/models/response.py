@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 class RemovalResponse(BaseModel):
     """
@@ -10,6 +10,12 @@ class RemovalResponse(BaseModel):
     processing_time: float
     message: str
     mask_path: Optional[str] = None  # 添加蒙版文件路径字段
+    cached: bool = False  # 结果是否来自缓存
+    profile: Optional[str] = None  # 使用的精度档位（quality/fast），回退算法时为空
+    method: Optional[str] = None  # 生成蒙版的方式：ai_model、fallback 或 alpha（直接使用输入的透明通道）
+    mask_format: Optional[str] = None  # 蒙版编码格式（png/png_fast/webp/raw/rle）
+    mask_size: Optional[List[int]] = None  # 蒙版尺寸 [宽, 高]，解码 raw 格式时需要
+    mask: Optional[str] = None  # delivery=inline 时的 base64 蒙版，此时不写盘、mask_path 为空
 
 class HealthResponse(BaseModel):
     """
@@ -17,3 +23,11 @@ class HealthResponse(BaseModel):
     """
     status: str
     model_loaded: bool
+    model_profile: Optional[str] = None  # 默认精度档位（quality 为 FP32，fast 为 INT8）
+    profiles: Optional[List[str]] = None  # 已加载的精度档位
+    in_flight: Optional[int] = None  # 正在处理或排队的请求数
+    queue_capacity: Optional[int] = None  # 推理池可容纳的最大请求数
+    batching: Optional[Dict[str, Any]] = None  # 微批处理统计（未启用时为空）
+    cache: Optional[Dict[str, Any]] = None  # 结果缓存命中/未命中/淘汰计数
+    storage: Optional[Dict[str, Any]] = None  # PROCESSED_DIR 清理配额、回收文件数/字节数和上次清理结果
+    startup: Optional[Dict[str, Any]] = None  # 模型加载状态、启动各阶段耗时、就绪及首个请求时间
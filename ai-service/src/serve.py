@@ -0,0 +1,84 @@
+"""
+多 worker 部署启动器
+
+启动一个独立的推理进程（持有唯一一份模型、微批处理器和 ORT 线程预算），
+再以 INFERENCE_EXECUTOR=remote 启动 N 个 uvicorn HTTP worker。HTTP worker
+只负责收发请求、缓存和蒙版编码，推理通过本地 Unix socket 转发给推理进程，
+因此内存不随 worker 数增长，CPU 也不会被重复的 ORT 线程池超额占用。
+
+用法:
+    python src/serve.py --workers 4 [--host 0.0.0.0] [--port 8001]
+    python src/serve.py --inference-only    # 只运行推理进程（配合 gunicorn 等外部进程管理器）
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_inference_server(socket_path: str):
+    """在当前进程运行推理服务，直到收到 SIGTERM/SIGINT"""
+    from services.background_removal import BackgroundRemovalService
+    from services.inference_pool import InferencePool
+    from services.inference_server import InferenceServer
+
+    # 推理进程内部使用线程池共享同一个模型
+    pool = InferencePool(BackgroundRemovalService(), mode="thread")
+    server = InferenceServer(pool, socket_path)
+
+    async def serve():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        await server.start()
+        print(f"推理进程已启动: {pool.stats()}")
+        await stop.wait()
+        await server.close()
+
+    asyncio.run(serve())
+
+
+def main(argv=None) -> int:
+    from services.inference_server import DEFAULT_SOCKET_PATH
+
+    parser = argparse.ArgumentParser(description="多 worker 部署：共享推理进程 + uvicorn HTTP worker")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("HTTP_WORKERS", 2)), help="HTTP worker 数")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8001)))
+    parser.add_argument("--socket", default=os.getenv("INFERENCE_SOCKET", DEFAULT_SOCKET_PATH),
+                        help="推理进程的 Unix socket 路径")
+    parser.add_argument("--inference-only", action="store_true", help="只运行推理进程")
+    args = parser.parse_args(argv)
+
+    if args.inference_only:
+        run_inference_server(args.socket)
+        return 0
+
+    import uvicorn
+
+    # 推理进程使用全新的解释器，避免 fork 带走已初始化的线程池
+    inference_process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--inference-only", "--socket", args.socket]
+    )
+    # HTTP worker 继承环境变量，转发推理到推理进程，启动时等待其加载完成
+    os.environ["INFERENCE_EXECUTOR"] = "remote"
+    os.environ["INFERENCE_SOCKET"] = args.socket
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, app_dir=SRC_DIR)
+    finally:
+        inference_process.terminate()
+        try:
+            inference_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            inference_process.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, SRC_DIR)
+    sys.exit(main())
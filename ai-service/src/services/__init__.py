@@ -1,3 +1,4 @@
 from .background_removal import BackgroundRemovalService
+from .inference_pool import InferencePool
 
-__all__ = ["BackgroundRemovalService"]
+__all__ = ["BackgroundRemovalService", "InferencePool"]
@@ -0,0 +1,197 @@
+import json
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .batch_scheduler import accepts_raw_pixels
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """CPU limit from the container's cgroup (v2 cpu.max or v1 CFS quota), None if unlimited"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    """Cores this process may actually use: affinity mask capped by the cgroup quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 4
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+
+def candidate_configs(
+    cpus: int,
+    allow_batching: bool,
+    threads: Optional[int] = None,
+    workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> List[Dict]:
+    """Configurations to benchmark; explicitly configured values are held fixed.
+
+    Unbatched configs split the cores into workers x threads. Batched configs run
+    one batch at a time on every core, as BatchScheduler does.
+    """
+    configs = []
+    if batch_size in (None, 1):
+        thread_options = [threads] if threads else sorted({2 ** i for i in range(int(math.log2(cpus)) + 1)} | {cpus})
+        for t in thread_options:
+            w = workers or max(1, cpus // t)
+            configs.append({"threads": t, "workers": w, "batch_size": 1})
+    if allow_batching and batch_size != 1:
+        for b in [batch_size] if batch_size else [2, 4]:
+            configs.append({"threads": threads or cpus, "workers": workers or b, "batch_size": b})
+    return configs
+
+
+def benchmark_config(
+    session_factory: Callable[[int], object],
+    config: Dict,
+    input_size: Tuple[int, int],
+    seconds: float,
+    separate_sessions: bool = False,
+) -> Dict:
+    """Measure throughput and per-call latency of one configuration on synthetic input.
+
+    Workers share one session (thread pool mode) or each get their own
+    (separate_sessions, matching process pool mode).
+    """
+    # Batched configs run one session.run at a time; unbatched ones run `workers` concurrently
+    parallel = 1 if config["batch_size"] > 1 else config["workers"]
+    sessions = [session_factory(config["threads"])]
+    if separate_sessions:
+        sessions += [session_factory(config["threads"]) for _ in range(parallel - 1)]
+    input_name = sessions[0].get_inputs()[0].name
+    output_name = sessions[0].get_outputs()[0].name
+    if accepts_raw_pixels(sessions[0]):
+        # Preprocessing fused into the graph: raw NHWC pixels
+        batch = np.random.randint(0, 256, (config["batch_size"], input_size[1], input_size[0], 3), dtype=np.uint8)
+    else:
+        batch = np.random.rand(config["batch_size"], 3, input_size[1], input_size[0]).astype(np.float32)
+
+    for session in sessions:
+        session.run([output_name], {input_name: batch})
+    latencies: List[float] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(session):
+        runs = 0
+        # At least two timed runs per worker so slow configs still get measured
+        while runs < 2 or time.perf_counter() < deadline:
+            start = time.perf_counter()
+            session.run([output_name], {input_name: batch})
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            runs += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(sessions[i % len(sessions)],)) for i in range(parallel)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        **config,
+        "images_per_sec": len(latencies) * config["batch_size"] / elapsed,
+        "p95_latency_ms": float(np.percentile(latencies, 95) * 1000),
+    }
+
+
+def select_config(results: List[Dict], latency_target_ms: float) -> Dict:
+    """Best throughput within the latency target, or the lowest-latency config if none fit"""
+    within = [r for r in results if r["p95_latency_ms"] <= latency_target_ms]
+    if within:
+        return max(within, key=lambda r: r["images_per_sec"])
+    return min(results, key=lambda r: r["p95_latency_ms"])
+
+
+def load_cached_choice(cache_path: str, key: str) -> Optional[Dict]:
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+
+
+def save_choice(cache_path: str, key: str, entry: Dict):
+    """Merge entry into the JSON cache file, writing atomically"""
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    data[key] = entry
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not persist autotune result: {e}")
+
+
+def autotune(
+    session_factory: Callable[[int], object],
+    candidates: List[Dict],
+    input_size: Tuple[int, int],
+    cache_path: str,
+    key: str,
+    seconds: float = 1.0,
+    latency_target_ms: float = 2000.0,
+    separate_sessions: bool = False,
+) -> Dict:
+    """Return the chosen config, reusing a persisted choice for the same key.
+
+    The result holds the chosen threads/workers/batch_size, whether it came from
+    the cache, and the per-candidate measurements.
+    """
+    cached = load_cached_choice(cache_path, key)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    results = []
+    for config in candidates:
+        result = benchmark_config(session_factory, config, input_size, seconds, separate_sessions)
+        print(
+            f"Autotune threads={config['threads']} workers={config['workers']} batch={config['batch_size']}: "
+            f"{result['images_per_sec']:.2f} img/s, p95 {result['p95_latency_ms']:.0f}ms"
+        )
+        results.append(result)
+
+    chosen = select_config(results, latency_target_ms)
+    entry = {
+        "config": {k: chosen[k] for k in ("threads", "workers", "batch_size")},
+        "latency_target_ms": latency_target_ms,
+        "results": results,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    save_choice(cache_path, key, entry)
+    return {**entry, "cached": False}
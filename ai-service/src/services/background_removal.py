@@ -1,117 +1,485 @@
 import numpy as np
 from PIL import Image
 import onnxruntime as ort
+import hashlib
+import platform
 import time
 import os
-from typing import Dict, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 import cv2
+from .autotune import available_cpus
+from .batch_scheduler import BatchScheduler, accepts_raw_pixels, supports_dynamic_batch
+from .edge_refinement import refine_edges
+from .input_analysis import alpha_cutout, has_alpha, solid_background_mask
+from .metrics import StageTimer
+from .tensor_pool import TensorPool
+from utils.image_processing import apply_alpha_matting, decode_image, decode_image_reduced, map_image_file
+
+# Resampling filters selectable for the preprocess resize (PREPROCESS_RESAMPLE)
+RESAMPLE_FILTERS = {
+    "lanczos": Image.LANCZOS,
+    "bicubic": Image.BICUBIC,
+    "bilinear": Image.BILINEAR,
+}
+
+# numpy dtypes of ONNX output element types that can be bound to a preallocated buffer
+ORT_OUTPUT_DTYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+}
+
+# Precision profiles: "quality" runs the FP32 model, "fast" the INT8 quantized variant
+PRECISION_PROFILES = ("quality", "fast")
+
+
+def quantized_model_path(model_path: str) -> str:
+    """Default location of the INT8 variant next to the FP32 model"""
+    stem, ext = os.path.splitext(model_path)
+    return f"{stem}.int8{ext or '.onnx'}"
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hardware_id() -> str:
+    """CPU identity; fully optimized ORT graphs may use CPU-specific kernels"""
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{platform.machine()}-{cpu}"
 
 class BackgroundRemovalService:
-    def __init__(self):
+    def __init__(self, intra_op_threads: Optional[int] = None):
         self.session = None
         self.model_path = os.getenv("MODEL_PATH", "models/rmbg-1.4.onnx")
+        # INT8 variant for the "fast" profile; defaults to <model>.int8.onnx
+        self.quantized_model_path = os.getenv("QUANTIZED_MODEL_PATH")
+        # Profile used when a request does not ask for one
+        self.model_profile = os.getenv("MODEL_PROFILE", "quality").lower()
+        if self.model_profile not in PRECISION_PROFILES:
+            raise ValueError(f"Unknown MODEL_PROFILE: {self.model_profile}")
+        self.sessions: Dict[str, ort.InferenceSession] = {}  # Loaded sessions by profile
+        self.model_ids: Dict[str, str] = {}  # "<file>:<fingerprint>" by profile, set at load
+        self.active_profile: Optional[str] = None  # Default profile actually serving requests
+        # ORT intra-op thread budget; None means use every core
+        env_threads = os.getenv("ORT_INTRA_OP_THREADS")
+        self.intra_op_threads = intra_op_threads or (int(env_threads) if env_threads else None)
+        # Budget for sessions that are not micro-batched and so run on several pool workers at
+        # once (set by the inference pool when batching keeps every core); None means intra_op_threads
+        self.unbatched_intra_op_threads: Optional[int] = None
         self.input_size = (1024, 1024)
         self.is_warmed_up = False
+        self.warmup_enabled = os.getenv("MODEL_WARMUP", "true").lower() == "true"
         self.max_image_size = 4096  # Maximum dimension for preprocessing optimization
+        # Filter for resizing to the model input; "bilinear" is faster, "lanczos" is the reference
+        self.preprocess_resample = os.getenv("PREPROCESS_RESAMPLE", "lanczos").lower()
+        if self.preprocess_resample not in RESAMPLE_FILTERS:
+            raise ValueError(f"Unknown PREPROCESS_RESAMPLE: {self.preprocess_resample}")
+        self.low_confidence_threshold = 0.3  # Below this the AI result is replaced by the fallback
+        # Inputs that are already cut out (transparent background) use their alpha as the mask
+        self.alpha_fast_path = os.getenv("ALPHA_FAST_PATH", "true").lower() == "true"
+        # Product shots on a uniform backdrop are segmented by colour distance at
+        # solid_max_size; the model only runs when that is less confident than
+        # solid_min_confidence
+        self.solid_fast_path = os.getenv("SOLID_FAST_PATH", "true").lower() == "true"
+        self.solid_min_confidence = float(os.getenv("SOLID_MIN_CONFIDENCE", 0.85))
+        self.solid_max_size = 512
+        self.confidence_max_size = 1024  # Larger masks are downsampled before confidence scoring
+        # Upscaling to the original size: "bilinear" resizes the whole mask; "band" (opt-in)
+        # refines only the uncertain band around the mask boundary in edge_tile_size tiles.
+        # band sharpens the upscaled mask itself and does not look at the image
+        self.edge_refinement = os.getenv("EDGE_REFINEMENT", "bilinear").lower()
+        if self.edge_refinement not in ("band", "bilinear"):
+            raise ValueError(f"Unknown EDGE_REFINEMENT: {self.edge_refinement}")
+        self.edge_tile_size = int(os.getenv("EDGE_TILE_SIZE", 128))
+        # Optional matting after upscaling: "guided" fits the mask edges to the
+        # full-resolution image with a fast guided filter, in matting_tile_size
+        # tiles (0 processes the whole frame at once)
+        self.alpha_matting = os.getenv("ALPHA_MATTING", "none").lower()
+        if self.alpha_matting not in ("none", "guided"):
+            raise ValueError(f"Unknown ALPHA_MATTING: {self.alpha_matting}")
+        self.matting_radius = int(os.getenv("MATTING_RADIUS", 16))
+        self.matting_eps = float(os.getenv("MATTING_EPS", 1e-4))
+        self.matting_tile_size = int(os.getenv("MATTING_TILE_SIZE", 512))
+        # Fallback works at this maximum dimension and is skipped once the request
+        # has already spent fallback_deadline seconds on the AI attempt
+        self.fallback_max_size = int(os.getenv("FALLBACK_MAX_SIZE", 1024))
+        self.fallback_deadline = float(os.getenv("FALLBACK_DEADLINE", 5.0))
+        # Dynamic micro-batching across concurrent requests (1 disables it)
+        self.batch_max_size = int(os.getenv("BATCH_MAX_SIZE", 1))
+        self.batch_max_wait_ms = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+        self.batch_scheduler: Optional[BatchScheduler] = None
+        # Input and output tensors are reused per worker thread, and unbatched
+        # inference writes into the pooled output through ORT IO binding
+        self.tensor_pool_enabled = os.getenv("TENSOR_POOL_ENABLED", "true").lower() == "true"
+        self.tensor_pool = TensorPool()
+        self._output_shapes: Dict[Tuple[str, Tuple[int, ...]], Tuple[int, ...]] = {}
+        self.model_load_time: Optional[float] = None  # Seconds spent in load_model, including warmup
+        # Optimized graphs are cached here (default: .ort-cache next to the model) and
+        # reused on later starts; keyed on model hash, ORT version and CPU
+        self.ort_cache_enabled = os.getenv("ORT_CACHE_ENABLED", "true").lower() == "true"
+        self.ort_cache_dir = os.getenv("ORT_CACHE_DIR")
+        # Model loading progress: current phase and seconds spent per phase
+        self.load_phase = "pending"
+        self.load_timings: Dict[str, float] = {}
         
     def is_model_loaded(self) -> bool:
         """Check if model is loaded"""
         return self.session is not None
     
+    def profile_model_paths(self) -> Dict[str, str]:
+        """Model file for each precision profile"""
+        return {
+            "quality": self.model_path,
+            "fast": self.quantized_model_path or quantized_model_path(self.model_path),
+        }
+    
+    def available_profiles(self) -> List[str]:
+        """Profiles with a loaded session"""
+        return [profile for profile in PRECISION_PROFILES if profile in self.sessions]
+    
+    def resolve_profile(self, profile: Optional[str] = None) -> str:
+        """Map a requested profile (None for the default) to a loaded one"""
+        if profile is None:
+            return self.active_profile
+        if profile not in PRECISION_PROFILES:
+            raise ValueError(f"Unknown profile: {profile}")
+        if profile not in self.sessions:
+            raise ValueError(f"Profile {profile} is not available")
+        return profile
+    
+    def model_id(self, profile: Optional[str] = None) -> str:
+        """Identify the model that serves a profile, used to key cached results"""
+        if not self.is_model_loaded():
+            return "fallback"
+        return self.model_ids[self.resolve_profile(profile)]
+    
+    def cache_dir(self, model_path: str) -> str:
+        """Directory for optimized graphs and autotune results"""
+        return self.ort_cache_dir or os.path.join(os.path.dirname(os.path.abspath(model_path)), ".ort-cache")
+    
+    def model_fingerprint(self, model_path: str) -> str:
+        """Short hash of the model content, ORT version and CPU"""
+        key = f"{_file_sha256(model_path)}:{ort.__version__}:{_hardware_id()}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    
+    def optimized_model_path(self, model_path: str, fingerprint: Optional[str] = None) -> Optional[str]:
+        """Cache location of the optimized graph for model_path, or None when caching is off"""
+        if not self.ort_cache_enabled:
+            return None
+        stem = os.path.splitext(os.path.basename(model_path))[0]
+        fingerprint = fingerprint or self.model_fingerprint(model_path)
+        return os.path.join(self.cache_dir(model_path), f"{stem}.{fingerprint}.optimized.onnx")
+    
+    def _session_options(self, optimization_level, intra_op_threads: Optional[int] = None) -> ort.SessionOptions:
+        """Session options with the service's thread budget (or intra_op_threads)"""
+        # Configure session options for performance
+        sess_options = ort.SessionOptions()
+        sess_options.graph_optimization_level = optimization_level
+        sess_options.intra_op_num_threads = intra_op_threads or self.intra_op_threads or available_cpus()
+        sess_options.inter_op_num_threads = 1
+        
+        # Enable memory pattern optimization
+        sess_options.enable_mem_pattern = True
+        sess_options.enable_cpu_mem_arena = True
+        return sess_options
+    
+    def _create_session(
+        self,
+        model_path: str,
+        cache_path: Optional[str] = None,
+        intra_op_threads: Optional[int] = None
+    ) -> ort.InferenceSession:
+        """Create an ONNX Runtime session, reusing or writing the optimized graph at cache_path"""
+        providers = ['CPUExecutionProvider']
+        if cache_path and os.path.exists(cache_path):
+            try:
+                # Already optimized: skip graph optimization entirely
+                session = ort.InferenceSession(
+                    cache_path,
+                    sess_options=self._session_options(ort.GraphOptimizationLevel.ORT_DISABLE_ALL, intra_op_threads),
+                    providers=providers
+                )
+                print(f"Loaded optimized model from cache {cache_path}")
+                return session
+            except Exception as e:
+                print(f"Warning: optimized model cache unusable, rebuilding: {e}")
+        
+        sess_options = self._session_options(ort.GraphOptimizationLevel.ORT_ENABLE_ALL, intra_op_threads)
+        tmp_path = None
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                # Per-process temp file so concurrent workers never read a partial cache
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                sess_options.optimized_model_filepath = tmp_path
+            except OSError as e:
+                print(f"Warning: cannot create ORT cache directory: {e}")
+        
+        # Create ONNX Runtime session with optimizations
+        session = ort.InferenceSession(model_path, sess_options=sess_options, providers=providers)
+        if tmp_path and os.path.exists(tmp_path):
+            os.replace(tmp_path, cache_path)
+        return session
+    
+    def default_model_path(self) -> Optional[str]:
+        """Model file of the configured default profile, falling back to the FP32 model"""
+        paths = self.profile_model_paths()
+        for path in (paths[self.model_profile], paths["quality"]):
+            if os.path.exists(path):
+                return path
+        return None
+    
+    def create_session(self, intra_op_threads: int) -> ort.InferenceSession:
+        """Standalone session of the default model with a given thread count (used by autotuning)"""
+        model_path = self.default_model_path()
+        if model_path is None:
+            raise FileNotFoundError(f"Model not found at {self.model_path}")
+        return self._create_session(model_path, self.optimized_model_path(model_path), intra_op_threads)
+    
+    def load_status(self) -> Dict:
+        """Current loading phase and per-phase seconds"""
+        return {"phase": self.load_phase, "timings": dict(self.load_timings)}
+    
     def load_model(self):
-        """Load ONNX model with optimizations"""
+        """Load the FP32 model and, when present, its INT8 variant"""
+        load_start = time.perf_counter()
+        timer = StageTimer()
+        self.load_timings = timer.timings
         try:
-            if not os.path.exists(self.model_path):
+            paths = self.profile_model_paths()
+            present = [profile for profile in PRECISION_PROFILES if os.path.exists(paths[profile])]
+            # Only the default profile's session is micro-batched; the others share cores with the pool workers
+            batched_profile = self.model_profile if self.model_profile in present else (present or [None])[0]
+            for profile, path in paths.items():
+                if not os.path.exists(path):
+                    continue
+                self.load_phase = f"hash_{profile}"
+                with timer.stage(self.load_phase):
+                    # Hashed once: keys both the optimized graph and cached results
+                    fingerprint = self.model_fingerprint(path)
+                    self.model_ids[profile] = f"{os.path.basename(path)}:{fingerprint}"
+                    cache_path = self.optimized_model_path(path, fingerprint)
+                self.load_phase = f"session_{profile}"
+                with timer.stage(self.load_phase):
+                    threads = None if profile == batched_profile else self.unbatched_intra_op_threads
+                    session = self._create_session(path, cache_path, threads)
+                    if threads is None and self.unbatched_intra_op_threads and not self.can_batch(session):
+                        session = self._create_session(path, cache_path, self.unbatched_intra_op_threads)
+                    self.sessions[profile] = session
+                print(f"Model loaded successfully from {path} (profile: {profile})")
+            
+            if not self.sessions:
+                self.load_phase = "missing"
                 print(f"Warning: Model not found at {self.model_path}")
                 print("Please download RMBG-1.4 model and place it in the models directory")
                 return
             
-            # Configure session options for performance
-            sess_options = ort.SessionOptions()
-            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-            sess_options.intra_op_num_threads = os.cpu_count() or 4
-            sess_options.inter_op_num_threads = 1
-            
-            # Enable memory pattern optimization
-            sess_options.enable_mem_pattern = True
-            sess_options.enable_cpu_mem_arena = True
-            
-            # Create ONNX Runtime session with optimizations
-            self.session = ort.InferenceSession(
-                self.model_path,
-                sess_options=sess_options,
-                providers=['CPUExecutionProvider']
-            )
-            print(f"Model loaded successfully from {self.model_path}")
+            self.active_profile = self.model_profile
+            if self.active_profile not in self.sessions:
+                self.active_profile = self.available_profiles()[0]
+                print(f"Warning: profile {self.model_profile} unavailable, using {self.active_profile}")
+            self.session = self.sessions[self.active_profile]
             
             # Warm up the model
-            self.warmup_model()
+            self.load_phase = "warmup"
+            with timer.stage("warmup"):
+                self.warmup_model()
+            self.enable_batching()
+            self.model_load_time = time.perf_counter() - load_start
+            self.load_phase = "ready"
         except Exception as e:
+            self.load_phase = "failed"
             print(f"Error loading model: {e}")
             raise
     
+    def can_batch(self, session: ort.InferenceSession) -> bool:
+        """Whether enable_batching would micro-batch this session"""
+        return self.batch_max_size > 1 and supports_dynamic_batch(session) and not accepts_raw_pixels(session)
+    
+    def enable_batching(self):
+        """Start the micro-batch scheduler when configured and supported by the model"""
+        if not self.is_model_loaded() or self.batch_scheduler is not None or self.batch_max_size <= 1:
+            return
+        
+        if not supports_dynamic_batch(self.session):
+            print("Model has a fixed batch dimension, micro-batching disabled")
+            return
+        if accepts_raw_pixels(self.session):
+            print("Model takes raw pixels of varying size, micro-batching disabled")
+            return
+        
+        self.batch_scheduler = BatchScheduler(
+            self.session,
+            max_batch_size=self.batch_max_size,
+            max_wait_ms=self.batch_max_wait_ms
+        )
+        print(f"Micro-batching enabled (max {self.batch_max_size}, wait {self.batch_max_wait_ms}ms)")
+    
+    def batch_stats(self) -> Optional[Dict]:
+        """Per-batch metrics, or None when batching is disabled"""
+        return self.batch_scheduler.stats() if self.batch_scheduler is not None else None
+    
+    def cache_params(self) -> Dict:
+        """Processing parameters that affect the mask, used to key cached results"""
+        return {
+            "input_size": list(self.input_size),
+            "max_image_size": self.max_image_size,
+            "preprocess_resample": self.preprocess_resample,
+            "alpha_fast_path": self.alpha_fast_path,
+            "solid_fast_path": self.solid_fast_path,
+            "solid_min_confidence": self.solid_min_confidence,
+            "confidence_max_size": self.confidence_max_size,
+            "fallback_max_size": self.fallback_max_size,
+            "edge_refinement": self.edge_refinement,
+            "edge_tile_size": self.edge_tile_size,
+            "alpha_matting": self.alpha_matting,
+            "matting_radius": self.matting_radius,
+            "matting_eps": self.matting_eps,
+        }
+    
+    def run_inference(self, input_array: np.ndarray, profile: Optional[str] = None) -> np.ndarray:
+        """Run the model on a (1, 3, H, W) tensor.
+        
+        The default profile is batched with other callers when batching is enabled;
+        requests that override the profile run unbatched on that profile's session.
+        """
+        profile = self.resolve_profile(profile)
+        if self.batch_scheduler is not None and profile == self.active_profile:
+            return self.batch_scheduler.submit(input_array)
+        
+        session = self.sessions.get(profile, self.session)
+        if self.tensor_pool_enabled and not accepts_raw_pixels(session):
+            return self._run_bound(session, profile, input_array)
+        input_name = session.get_inputs()[0].name
+        output_name = session.get_outputs()[0].name
+        return session.run([output_name], {input_name: input_array})[0]
+    
+    def _run_bound(self, session: ort.InferenceSession, profile: str, input_array: np.ndarray) -> np.ndarray:
+        """Run through IO binding into this thread's pooled output buffer.
+        
+        The output shape is learned from the first run for each profile and input
+        shape; that run lets ORT allocate. The returned array is overwritten by the
+        thread's next inference.
+        """
+        output = session.get_outputs()[0]
+        binding = session.io_binding()
+        binding.bind_cpu_input(session.get_inputs()[0].name, np.ascontiguousarray(input_array))
+        
+        dtype = ORT_OUTPUT_DTYPES.get(output.type)
+        shape_key = (profile, input_array.shape)
+        shape = self._output_shapes.get(shape_key)
+        if dtype is None or shape is None:
+            binding.bind_output(output.name, "cpu")
+            session.run_with_iobinding(binding)
+            result = binding.copy_outputs_to_cpu()[0]
+            self._output_shapes[shape_key] = result.shape
+            return result
+        
+        out = self.tensor_pool.get(("output", profile), shape, dtype)
+        binding.bind_output(output.name, "cpu", 0, dtype, shape, out.ctypes.data)
+        session.run_with_iobinding(binding)
+        return out
+    
     def warmup_model(self):
         """Warm up model with dummy inference to optimize first-run performance"""
-        if not self.is_model_loaded() or self.is_warmed_up:
+        if not self.is_model_loaded() or self.is_warmed_up or not self.warmup_enabled:
             return
         
         try:
             print("Warming up model...")
-            # Create dummy input
-            dummy_input = np.random.rand(1, 3, *self.input_size).astype(np.float32)
-            input_name = self.session.get_inputs()[0].name
-            output_name = self.session.get_outputs()[0].name
-            
-            # Run dummy inference
-            _ = self.session.run([output_name], {input_name: dummy_input})
+            # Run dummy inference on every loaded profile
+            for session in self.sessions.values() or [self.session]:
+                input_name = session.get_inputs()[0].name
+                output_name = session.get_outputs()[0].name
+                _ = session.run([output_name], {input_name: self.dummy_input(session)})
             
             self.is_warmed_up = True
             print("Model warmup complete")
         except Exception as e:
             print(f"Warning: Model warmup failed: {e}")
     
-    def preprocess_image(self, image: Image.Image) -> Tuple[np.ndarray, Tuple[int, int], bool]:
-        """Preprocess image for model input with optimization"""
-        # Store original size
-        original_size = image.size
+    def input_shape(self) -> Tuple[int, int, int, int]:
+        """NCHW shape of one model input"""
+        return (1, 3, self.input_size[1], self.input_size[0])
+    
+    def dummy_input(self, session: ort.InferenceSession) -> np.ndarray:
+        """Random input of the kind the session expects, for warmup"""
+        if accepts_raw_pixels(session):
+            return np.random.randint(0, 256, (1, self.input_size[1], self.input_size[0], 3), dtype=np.uint8)
+        return np.random.rand(*self.input_shape()).astype(np.float32)
+    
+    def raw_pixels(self, image: Image.Image) -> Tuple[np.ndarray, bool]:
+        """Decoded RGB pixels as a (1, H, W, 3) uint8 tensor for models with fused preprocessing.
+        
+        The image is shrunk the same way as in preprocess_image, so the in-graph
+        resize sees what the Python one would and never a full-resolution frame.
+        """
+        image, was_downsampled = self.shrink_for_model(image)
+        return np.asarray(image)[np.newaxis], was_downsampled
+    
+    def shrink_for_model(self, image: Image.Image) -> Tuple[Image.Image, bool]:
+        """RGB image reduced to at most twice the model input, and whether the max_image_size cap applied"""
         was_downsampled = False
         
         # Optimize: Downsample very large images before processing
-        if max(original_size) > self.max_image_size:
-            scale = self.max_image_size / max(original_size)
-            new_size = (int(original_size[0] * scale), int(original_size[1] * scale))
-            image = image.resize(new_size, Image.LANCZOS)
+        if max(image.size) > self.max_image_size:
+            scale = self.max_image_size / max(image.size)
+            new_size = (int(image.size[0] * scale), int(image.size[1] * scale))
+            image = image.resize(new_size, RESAMPLE_FILTERS[self.preprocess_resample])
             was_downsampled = True
         
         # Convert to RGB if needed
         if image.mode != "RGB":
             image = image.convert("RGB")
         
-        # Resize to model input size using faster method for large images
+        # Two-step resize for better performance on large images
         if max(image.size) > self.input_size[0] * 2:
-            # Two-step resize for better performance on large images
             intermediate_size = (self.input_size[0] * 2, self.input_size[1] * 2)
             image = image.resize(intermediate_size, Image.BILINEAR)
-            image_resized = image.resize(self.input_size, Image.LANCZOS)
-        else:
-            image_resized = image.resize(self.input_size, Image.LANCZOS)
         
-        # Convert to numpy array and normalize (optimized)
-        img_array = np.array(image_resized, dtype=np.float32)
-        
-        # Normalize to [0, 1] in-place
-        img_array *= (1.0 / 255.0)
+        return image, was_downsampled
+    
+    def preprocess_image(
+        self,
+        image: Image.Image,
+        out: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, Tuple[int, int], bool]:
+        """Preprocess image for model input with optimization.
         
-        # Transpose to CHW format (channels first)
-        img_array = np.transpose(img_array, (2, 0, 1))
+        The normalized CHW tensor is written into out (shape input_shape(), float32)
+        when given, otherwise into a new array; either way it is C-contiguous.
+        """
+        # Store original size
+        original_size = image.size
+        image, was_downsampled = self.shrink_for_model(image)
+        image_resized = image.resize(self.input_size, RESAMPLE_FILTERS[self.preprocess_resample])
         
-        # Add batch dimension
-        img_array = np.expand_dims(img_array, axis=0)
+        # Normalize to [0, 1] and transpose HWC -> CHW in one pass into the (1, 3, H, W) tensor
+        if out is None:
+            out = np.empty(self.input_shape(), dtype=np.float32)
+        pixels = np.asarray(image_resized).transpose(2, 0, 1)
+        np.multiply(pixels, np.float32(1.0 / 255.0), out=out[0], dtype=np.float32)
         
-        return img_array, original_size, was_downsampled
+        return out, original_size, was_downsampled
     
     def postprocess_mask(self, mask: np.ndarray, original_size: Tuple[int, int]) -> np.ndarray:
         """Postprocess model output mask"""
+        return self.upscale_mask(self.prepare_model_mask(mask), original_size)
+    
+    def prepare_model_mask(self, mask: np.ndarray) -> np.ndarray:
+        """Convert raw model output to a refined uint8 mask at model resolution"""
         # Remove batch dimension
         mask = mask.squeeze()
         
@@ -123,12 +491,33 @@ class BackgroundRemovalService:
         mask = (mask * 255).astype(np.uint8)
         
         # Apply morphological operations to refine mask
-        mask = self.refine_mask(mask)
-        
-        # Resize to original size
-        mask_resized = cv2.resize(mask, original_size, interpolation=cv2.INTER_LINEAR)
-        
-        return mask_resized
+        return self.refine_mask(mask)
+    
+    def upscale_mask(self, mask: np.ndarray, original_size: Tuple[int, int]) -> np.ndarray:
+        """Resize a model-resolution mask back to the original image size"""
+        if self.edge_refinement == "band":
+            return refine_edges(mask, original_size, tile_size=self.edge_tile_size)
+        return cv2.resize(mask, original_size, interpolation=cv2.INTER_LINEAR)
+    
+    def apply_matting(
+        self,
+        mask: np.ndarray,
+        load_full_image: Callable[[], Image.Image],
+        timer: StageTimer
+    ) -> np.ndarray:
+        """Fit a full-resolution mask to the image's edges when ALPHA_MATTING is enabled"""
+        if self.alpha_matting == "none":
+            return mask
+        full_image = load_full_image()
+        with timer.stage("matting"):
+            image = np.asarray(full_image if full_image.mode == "RGB" else full_image.convert("RGB"))
+            return apply_alpha_matting(
+                image,
+                mask,
+                radius=self.matting_radius,
+                eps=self.matting_eps,
+                tile_size=self.matting_tile_size or None,
+            )
     
     def refine_mask(self, mask: np.ndarray) -> np.ndarray:
         """Refine mask using morphological operations"""
@@ -163,8 +552,19 @@ class BackgroundRemovalService:
         return result
     
     def calculate_confidence(self, mask: np.ndarray) -> float:
-        """Calculate confidence score based on mask quality"""
+        """Calculate confidence score based on mask quality.
+        
+        All metrics are area ratios or intensity statistics, so scoring the
+        model-resolution mask (or one downsampled to confidence_max_size) gives
+        the same score as the full-resolution mask to within about 0.05.
+        """
         try:
+            # Score on a bounded-size pyramid level for large masks
+            if max(mask.shape[:2]) > self.confidence_max_size:
+                scale = self.confidence_max_size / max(mask.shape[:2])
+                small_size = (max(1, int(mask.shape[1] * scale)), max(1, int(mask.shape[0] * scale)))
+                mask = cv2.resize(mask, small_size, interpolation=cv2.INTER_AREA)
+            
             # Normalize mask to [0, 1]
             mask_normalized = mask.astype(np.float32) / 255.0
             
@@ -208,40 +608,162 @@ class BackgroundRemovalService:
             print(f"Error calculating confidence: {e}")
             return 0.5  # Return neutral confidence on error
     
-    def remove_background(self, image: Image.Image) -> Dict:
-        """Remove background from image with error handling and fallback"""
+    def remove_background(
+        self,
+        image: Image.Image,
+        include_image: bool = True,
+        profile: Optional[str] = None
+    ) -> Dict:
+        """Remove background from image with error handling and fallback.
+        
+        With include_image=False only the mask is produced and result["image"] is None,
+        skipping the full-resolution RGBA cutout. profile selects "quality" or "fast"
+        (None uses the default profile).
+        """
         start_time = time.time()
+        return self._remove_background(
+            image, image.size, lambda: image, start_time, include_image, StageTimer(), profile
+        )
+    
+    def remove_background_from_bytes(
+        self,
+        image_bytes: bytes,
+        include_image: bool = True,
+        profile: Optional[str] = None
+    ) -> Dict:
+        """Remove background from encoded image bytes.
+        
+        JPEGs are decoded at a reduced DCT scale close to the model input size;
+        the full-resolution image is only decoded if the cutout or fallback needs it.
+        """
+        start_time = time.time()
+        timer = StageTimer()
+        with timer.stage("decode"):
+            model_image, original_size = decode_image_reduced(image_bytes, self.input_size)
+        if model_image.size == original_size:
+            return self._remove_background(
+                model_image, original_size, lambda: model_image, start_time, include_image, timer, profile
+            )
+        
+        full_image = []
+        
+        def load_full_image() -> Image.Image:
+            if not full_image:
+                with timer.stage("decode_full"):
+                    full_image.append(decode_image(image_bytes))
+            return full_image[0]
+        
+        return self._remove_background(
+            model_image, original_size, load_full_image, start_time, include_image, timer, profile
+        )
+    
+    def remove_background_from_file(
+        self,
+        path: str,
+        include_image: bool = True,
+        profile: Optional[str] = None
+    ) -> Dict:
+        """Remove background from an image file on a shared volume.
+        
+        The file is memory-mapped and decoded in place, so it is never copied into
+        an intermediate buffer.
+        """
+        with map_image_file(path) as data:
+            return self.remove_background_from_bytes(data, include_image, profile)
+    
+    def _remove_background(
+        self,
+        model_image: Image.Image,
+        original_size: Tuple[int, int],
+        load_full_image: Callable[[], Image.Image],
+        start_time: float,
+        include_image: bool = True,
+        timer: Optional[StageTimer] = None,
+        profile: Optional[str] = None
+    ) -> Dict:
+        """Run the AI pipeline on model_image and produce a mask at original_size"""
+        timer = timer or StageTimer()
+        if profile is not None and profile not in PRECISION_PROFILES:
+            raise ValueError(f"Unknown profile: {profile}")
+        
+        # Inputs with a usable alpha channel need no model at all
+        if self.alpha_fast_path and has_alpha(model_image):
+            with timer.stage("analysis"):
+                full_image = model_image if model_image.size == original_size else load_full_image()
+                cutout = alpha_cutout(full_image)
+            if cutout is not None:
+                mask, confidence = cutout
+                return self._fast_path_result(
+                    lambda: full_image, mask, confidence, "alpha", start_time, include_image, timer
+                )
+        
+        # Uniform studio backdrops are segmented without the model when the result is clear-cut
+        if self.solid_fast_path:
+            with timer.stage("analysis"):
+                solid = solid_background_mask(model_image, self.solid_max_size)
+            if solid is not None and solid[1] >= self.solid_min_confidence:
+                with timer.stage("postprocess"):
+                    mask = self.upscale_mask(solid[0], original_size)
+                mask = self.apply_matting(mask, load_full_image, timer)
+                return self._fast_path_result(
+                    load_full_image, mask, solid[1], "solid_background", start_time, include_image, timer
+                )
         
         if not self.is_model_loaded():
             # Try fallback method if model not loaded
             print("Model not loaded, using fallback method")
-            return self.fallback_background_removal(image, start_time)
+            return self.fallback_background_removal(
+                model_image, start_time, include_image, original_size, load_full_image, timer
+            )
+        
+        # Unknown or unloaded profiles are caller errors, not a reason to fall back
+        profile = self.resolve_profile(profile)
         
         try:
             # Preprocess with optimization
-            input_array, original_size, was_downsampled = self.preprocess_image(image)
+            with timer.stage("preprocess"):
+                if accepts_raw_pixels(self.sessions.get(profile, self.session)):
+                    # Resize and normalization run inside the model (fuse_preprocess.py)
+                    input_array, was_downsampled = self.raw_pixels(model_image)
+                else:
+                    buffer = self.tensor_pool.get("input", self.input_shape()) if self.tensor_pool_enabled else None
+                    input_array, _, was_downsampled = self.preprocess_image(model_image, buffer)
+            was_downsampled = was_downsampled or model_image.size != original_size
             
             # Run inference
-            input_name = self.session.get_inputs()[0].name
-            output_name = self.session.get_outputs()[0].name
-            
-            mask_output = self.session.run([output_name], {input_name: input_array})[0]
-            
-            # Postprocess
-            mask = self.postprocess_mask(mask_output, original_size)
+            with timer.stage("inference"):
+                mask_output = self.run_inference(input_array, profile)
             
-            # Apply mask to original image
-            result_image = self.apply_mask_to_image(image, mask)
+            # Postprocess at model resolution
+            with timer.stage("postprocess"):
+                model_mask = self.prepare_model_mask(mask_output)
             
-            # Calculate confidence
-            confidence = self.calculate_confidence(mask)
+            # Calculate confidence before paying for full-resolution upscaling
+            with timer.stage("confidence"):
+                confidence = self.calculate_confidence(model_mask)
             
+            # If confidence is too low, try fallback on the already decoded image,
+            # unless the AI attempt has used up the latency budget
+            low_confidence = confidence < self.low_confidence_threshold
+            if low_confidence and time.time() - start_time < self.fallback_deadline:
+                print(f"Low confidence ({confidence:.2f}), trying fallback method")
+                return self.fallback_background_removal(
+                    model_image, start_time, include_image, original_size, load_full_image, timer
+                )
+            if low_confidence:
+                print(f"Low confidence ({confidence:.2f}), fallback skipped: deadline exceeded")
+            
+            with timer.stage("postprocess"):
+                mask = self.upscale_mask(model_mask, original_size)
+            mask = self.apply_matting(mask, load_full_image, timer)
             processing_time = time.time() - start_time
             
-            # If confidence is too low, try fallback
-            if confidence < 0.3:
-                print(f"Low confidence ({confidence:.2f}), trying fallback method")
-                return self.fallback_background_removal(image, start_time)
+            # Apply mask to original image only when the caller wants the cutout
+            result_image = None
+            if include_image:
+                full_image = load_full_image()
+                with timer.stage("cutout"):
+                    result_image = self.apply_mask_to_image(full_image, mask)
             
             return {
                 "image": result_image,
@@ -249,27 +771,77 @@ class BackgroundRemovalService:
                 "confidence": confidence,
                 "processing_time": processing_time,
                 "method": "ai_model",
-                "was_downsampled": was_downsampled
+                "profile": profile,
+                "was_downsampled": was_downsampled,
+                "low_confidence": low_confidence,
+                "timings": timer.timings
             }
         except Exception as e:
             print(f"AI model inference failed: {e}")
             # Fall back to simple edge detection
-            return self.fallback_background_removal(image, start_time)
-        finally:
-            # Explicit garbage collection for large images
-            if hasattr(image, 'size') and max(image.size) > 2048:
-                import gc
-                gc.collect()
-    
-    def fallback_background_removal(self, image: Image.Image, start_time: float) -> Dict:
-        """Fallback background removal using traditional computer vision"""
+            return self.fallback_background_removal(
+                model_image, start_time, include_image, original_size, load_full_image, timer
+            )
+    
+    def _fast_path_result(
+        self,
+        load_full_image: Callable[[], Image.Image],
+        mask: np.ndarray,
+        confidence: float,
+        method: str,
+        start_time: float,
+        include_image: bool,
+        timer: StageTimer
+    ) -> Dict:
+        """Result dict for masks produced without the model"""
+        result_image = None
+        if include_image:
+            full_image = load_full_image()
+            with timer.stage("cutout"):
+                result_image = self.apply_mask_to_image(full_image, mask)
+        return {
+            "image": result_image,
+            "mask": mask,
+            "confidence": confidence,
+            "processing_time": time.time() - start_time,
+            "method": method,
+            "profile": None,
+            "timings": timer.timings
+        }
+    
+    def fallback_background_removal(
+        self,
+        image: Image.Image,
+        start_time: float,
+        include_image: bool = True,
+        original_size: Optional[Tuple[int, int]] = None,
+        load_full_image: Optional[Callable[[], Image.Image]] = None,
+        timer: Optional[StageTimer] = None
+    ) -> Dict:
+        """Fallback background removal using traditional computer vision.
+        
+        Runs at a working resolution of at most fallback_max_size and upscales the
+        mask to original_size (defaults to image.size). load_full_image supplies the
+        full-resolution image for the cutout when image is a reduced decode.
+        """
+        timer = timer or StageTimer()
+        fallback_start = time.perf_counter()
         try:
+            original_size = original_size or image.size
+            
+            # Work at a reduced resolution; the mask is upscaled afterwards
+            work_image = image
+            if max(work_image.size) > self.fallback_max_size:
+                scale = self.fallback_max_size / max(work_image.size)
+                work_size = (max(1, int(work_image.size[0] * scale)), max(1, int(work_image.size[1] * scale)))
+                work_image = work_image.resize(work_size, Image.BILINEAR, reducing_gap=2.0)
+            
             # Convert to RGB if needed
-            if image.mode != "RGB":
-                image = image.convert("RGB")
+            if work_image.mode != "RGB":
+                work_image = work_image.convert("RGB")
             
             # Convert to numpy array
-            img_array = np.array(image)
+            img_array = np.array(work_image)
             
             # Convert to grayscale
             gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
@@ -295,12 +867,22 @@ class BackgroundRemovalService:
             # Refine mask
             mask = self.refine_mask(mask)
             
-            # Apply mask to image
-            result_image = self.apply_mask_to_image(image, mask)
-            
             # Calculate confidence (will be lower for fallback)
             confidence = self.calculate_confidence(mask) * 0.6  # Reduce confidence for fallback
             
+            # Resize to original size
+            if mask.shape[:2] != (original_size[1], original_size[0]):
+                mask = self.upscale_mask(mask, original_size)
+            
+            timer.add("fallback", time.perf_counter() - fallback_start)
+            
+            # Apply mask to image
+            result_image = None
+            if include_image:
+                full_image = load_full_image() if load_full_image is not None else image
+                with timer.stage("cutout"):
+                    result_image = self.apply_mask_to_image(full_image, mask)
+            
             processing_time = time.time() - start_time
             
             return {
@@ -308,7 +890,8 @@ class BackgroundRemovalService:
                 "mask": mask,
                 "confidence": confidence,
                 "processing_time": processing_time,
-                "method": "fallback"
+                "method": "fallback",
+                "timings": timer.timings
             }
         except Exception as e:
             raise RuntimeError(f"Fallback background removal failed: {str(e)}")
@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import onnxruntime as ort
+
+
+def supports_dynamic_batch(session: ort.InferenceSession) -> bool:
+    """Check whether the model's first input accepts a variable batch dimension"""
+    batch_dim = session.get_inputs()[0].shape[0]
+    return not isinstance(batch_dim, int) or batch_dim <= 0
+
+
+def accepts_raw_pixels(session: ort.InferenceSession) -> bool:
+    """Check whether the model takes uint8 NHWC pixels (preprocessing fused into the graph).
+
+    Such inputs vary in height and width per image, so they cannot be batched.
+    """
+    return session.get_inputs()[0].type == "tensor(uint8)"
+
+
+class BatchScheduler:
+    """Collect concurrent inference requests into batched session.run calls"""
+
+    def __init__(self, session: ort.InferenceSession, max_batch_size: int = 4, max_wait_ms: float = 10.0):
+        self.session = session
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.input_name = session.get_inputs()[0].name
+        self.output_name = session.get_outputs()[0].name
+
+        self._queue: "queue.Queue[Optional[Tuple[np.ndarray, Future]]]" = queue.Queue()
+        # Set by shutdown(); submit checks it under the same lock, so nothing is queued after the stop marker
+        self._closed = False
+        self._closed_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._inference_time = 0.0
+        self._last_batch_size = 0
+        self._last_batch_ms = 0.0
+        self._size_histogram: Dict[int, int] = {}
+
+        self._thread = threading.Thread(target=self._run_loop, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, input_array: np.ndarray) -> np.ndarray:
+        """Queue a (1, C, H, W) tensor and block until its output slice is ready"""
+        future: Future = Future()
+        with self._closed_lock:
+            if self._closed:
+                raise RuntimeError("Batch scheduler is shut down")
+            self._queue.put((input_array, future))
+        return future.result()
+
+    def _collect_batch(self, first: Tuple[np.ndarray, Future]) -> Tuple[List[Tuple[np.ndarray, Future]], bool]:
+        """Gather up to max_batch_size items or until max_wait elapses"""
+        items = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _run_loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            items, stop = self._collect_batch(first)
+            self._run_batch(items)
+            if stop:
+                break
+
+        # Defensive: submit refuses work once closed, but fail any leftovers rather than leave callers waiting
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("Batch scheduler is shut down"))
+
+    def _run_batch(self, items: List[Tuple[np.ndarray, Future]]):
+        """Run one batched inference and scatter outputs back to callers"""
+        start = time.perf_counter()
+        try:
+            if len(items) == 1:
+                batch = items[0][0]
+            else:
+                batch = np.concatenate([array for array, _ in items], axis=0)
+            outputs = self.session.run([self.output_name], {self.input_name: batch})[0]
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+
+        elapsed = time.perf_counter() - start
+        for index, (_, future) in enumerate(items):
+            future.set_result(outputs[index:index + 1])
+
+        with self._stats_lock:
+            size = len(items)
+            self._batches += 1
+            self._items += size
+            self._inference_time += elapsed
+            self._last_batch_size = size
+            self._last_batch_ms = elapsed * 1000
+            self._size_histogram[size] = self._size_histogram.get(size, 0) + 1
+
+    def stats(self) -> Dict:
+        """Per-batch metrics snapshot"""
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+                "avg_batch_ms": self._inference_time * 1000 / self._batches if self._batches else 0.0,
+                "last_batch_size": self._last_batch_size,
+                "last_batch_ms": self._last_batch_ms,
+                "batch_size_histogram": dict(self._size_histogram),
+                "pending": self._queue.qsize(),
+            }
+
+    def shutdown(self):
+        """Stop the scheduler thread after draining queued requests"""
+        with self._closed_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout=5)
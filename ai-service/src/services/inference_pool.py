@@ -0,0 +1,484 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+
+from models.exceptions import ServiceOverloadedError
+from .autotune import autotune, available_cpus, candidate_configs
+from .background_removal import BackgroundRemovalService
+from .batch_scheduler import accepts_raw_pixels, supports_dynamic_batch
+
+# Per-process service used when the pool runs in "process" mode
+_process_service: Optional[BackgroundRemovalService] = None
+
+
+def _init_process_worker(intra_op_threads: int):
+    """Create and load a dedicated service inside a pool process"""
+    global _process_service
+    _process_service = BackgroundRemovalService(intra_op_threads=intra_op_threads)
+    _process_service.load_model()
+
+
+def _process_model_status() -> Dict:
+    """Report whether the pool process has a loaded model, its profiles and how long loading took"""
+    loaded = _process_service is not None and _process_service.is_model_loaded()
+    return {
+        "loaded": loaded,
+        "load_time": _process_service.model_load_time if loaded else None,
+        "load_timings": _process_service.load_timings if _process_service is not None else {},
+        "profiles": _process_service.available_profiles() if loaded else [],
+        "active_profile": _process_service.active_profile if loaded else None,
+        "model_ids": _process_service.model_ids if loaded else {},
+    }
+
+
+async def _notify_all(condition: asyncio.Condition):
+    async with condition:
+        condition.notify_all()
+
+
+def _run_timed(
+    service: BackgroundRemovalService,
+    image: Union[bytes, str],
+    submitted_at: float,
+    profile: Optional[str] = None,
+) -> Dict:
+    """Run mask-only background removal and record how long the job waited for a worker.
+
+    image is either encoded bytes or the path of an image file on a shared volume.
+    """
+    queue_wait = time.time() - submitted_at
+    if isinstance(image, str):
+        result = service.remove_background_from_file(image, include_image=False, profile=profile)
+    else:
+        result = service.remove_background_from_bytes(image, include_image=False, profile=profile)
+    result.setdefault("timings", {})["queue_wait"] = queue_wait
+    return result
+
+
+def _remove_with_service(
+    service: BackgroundRemovalService,
+    image: Union[bytes, str],
+    submitted_at: float,
+    profile: Optional[str] = None,
+) -> Dict:
+    """Decode and run background removal on a shared service (thread mode)"""
+    return _run_timed(service, image, submitted_at, profile)
+
+
+def _remove_in_process(image: Union[bytes, str], submitted_at: float, profile: Optional[str] = None) -> Dict:
+    """Decode and run background removal on the per-process service"""
+    return _run_timed(_process_service, image, submitted_at, profile)
+
+
+class InferencePool:
+    """Bounded executor that keeps blocking inference off the event loop"""
+
+    def __init__(
+        self,
+        service: BackgroundRemovalService,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        mode: Optional[str] = None,
+        retry_after: Optional[int] = None,
+    ):
+        cpu_count = available_cpus()
+        self.service = service
+        self.mode = (mode or os.getenv("INFERENCE_EXECUTOR", "thread")).lower()
+        if self.mode not in ("thread", "process", "remote"):
+            raise ValueError(f"Unknown inference executor mode: {self.mode}")
+
+        # With micro-batching, enough workers must be in flight to fill a batch
+        default_workers = max(1, cpu_count // 4, service.batch_max_size)
+        # Values set explicitly are held fixed by autotuning
+        self._explicit = {
+            "workers": max_workers or (int(os.environ["INFERENCE_WORKERS"]) if os.getenv("INFERENCE_WORKERS") else None),
+            "threads": service.intra_op_threads,
+            "batch_size": int(os.environ["BATCH_MAX_SIZE"]) if os.getenv("BATCH_MAX_SIZE") else None,
+            "queue": max_queue is not None or bool(os.getenv("INFERENCE_MAX_QUEUE")),
+        }
+        self.max_workers = self._explicit["workers"] or default_workers
+        if max_queue is None:
+            max_queue = int(os.getenv("INFERENCE_MAX_QUEUE", self.max_workers * 4))
+        self.max_queue = max_queue
+        self.retry_after = retry_after or int(os.getenv("INFERENCE_RETRY_AFTER", 2))
+
+        # Split the CPU budget so workers x ORT threads does not oversubscribe cores.
+        # Batched inference runs on a single scheduler thread, so it keeps every core;
+        # sessions that are not batched (other profiles, unbatchable models) get a worker's share.
+        batching = self.mode == "thread" and service.batch_max_size > 1
+        self.threads_per_worker = cpu_count if batching else max(1, cpu_count // self.max_workers)
+        if self.mode == "thread" and not service.is_model_loaded() and service.intra_op_threads is None:
+            service.intra_op_threads = self.threads_per_worker
+            if batching:
+                service.unbatched_intra_op_threads = max(1, cpu_count // self.max_workers)
+
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        # Waiters in _acquire_wait sleep on this condition; _release wakes them from any thread
+        self._slot_freed: Optional[asyncio.Condition] = None
+        self._slot_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers_model_loaded = False
+        self._workers_model_load_time: Optional[float] = None
+        self._workers_profiles: List[str] = []
+        self._workers_active_profile: Optional[str] = None
+        self._workers_model_ids: Dict[str, str] = {}
+        self._workers_load_timings: Dict[str, float] = {}
+        # "remote" forwards to a shared inference server process (see services.inference_server)
+        self._remote = None
+        self._remote_status: Dict = {}
+        self.connect_timeout = float(os.getenv("INFERENCE_CONNECT_TIMEOUT", 120))
+        if self.mode == "remote":
+            from .inference_server import RemoteInferenceClient
+            self._remote = RemoteInferenceClient()
+        # idle -> loading -> ready/failed; requests are refused while loading
+        self.state = "idle"
+        # Benchmark thread/worker/batch configurations at startup and persist the choice
+        self.autotune_enabled = os.getenv("AUTOTUNE", "false").lower() == "true"
+        self.autotune_seconds = float(os.getenv("AUTOTUNE_SECONDS", 1.0))
+        self.autotune_latency_ms = float(os.getenv("AUTOTUNE_LATENCY_MS", 2000))
+        self.autotune_cache = os.getenv("AUTOTUNE_CACHE")
+        self.autotune_result: Optional[Dict] = None
+        self._autotune_time: Optional[float] = None
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of running plus queued requests"""
+        return self.max_workers + self.max_queue
+
+    def _get_executor(self) -> Executor:
+        """Create the executor lazily so importing the app stays cheap"""
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_process_worker,
+                    initargs=(self.threads_per_worker,),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="inference",
+                )
+        return self._executor
+
+    def _acquire(self):
+        """Admit a request or reject it when the queue is full"""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise ServiceOverloadedError(
+                    f"推理队列已满（{self.capacity}），请稍后重试",
+                    retry_after=self.retry_after,
+                )
+            self._in_flight += 1
+
+    def _try_acquire(self) -> bool:
+        with self._lock:
+            if self._in_flight < self.capacity:
+                self._in_flight += 1
+                return True
+            return False
+
+    def _release(self):
+        """Free a slot; may run on a worker thread (executor done-callback)"""
+        with self._lock:
+            self._in_flight -= 1
+            condition, loop = self._slot_freed, self._slot_loop
+        if condition is not None and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(_notify_all(condition), loop)
+
+    async def _acquire_wait(self):
+        """Wait for a free slot instead of rejecting (used by batch jobs)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._slot_loop is not loop:
+                self._slot_freed, self._slot_loop = asyncio.Condition(), loop
+            condition = self._slot_freed
+        async with condition:
+            await condition.wait_for(self._try_acquire)
+
+    async def start(self):
+        """Load the model and start workers without blocking the event loop.
+        
+        In thread mode the shared service loads on a helper thread; in process mode
+        each worker loads its own copy.
+        """
+        self.state = "loading"
+        try:
+            if self.mode == "remote":
+                await self._wait_for_server()
+                return
+            loop = asyncio.get_running_loop()
+            if self.autotune_enabled:
+                # Must run before workers and the serving session are created
+                await loop.run_in_executor(None, self.run_autotune)
+            executor = self._get_executor()
+            if self.mode == "process":
+                status = await loop.run_in_executor(executor, _process_model_status)
+                self._workers_model_loaded = status["loaded"]
+                self._workers_model_load_time = status["load_time"]
+                self._workers_load_timings = status["load_timings"]
+                self._workers_profiles = status["profiles"]
+                self._workers_active_profile = status["active_profile"]
+                self._workers_model_ids = status["model_ids"]
+            elif not self.service.is_model_loaded():
+                await loop.run_in_executor(None, self.service.load_model)
+        except Exception:
+            self.state = "failed"
+            raise
+        self.state = "ready"
+
+    def run_autotune(self) -> Optional[Dict]:
+        """Pick threads per session, concurrent workers and batch size for this host.
+
+        Candidates are benchmarked on synthetic input with the default model, the
+        best throughput within AUTOTUNE_LATENCY_MS wins, and the choice is stored
+        in AUTOTUNE_CACHE (default: autotune.json in the ORT cache directory) keyed
+        on model, ORT version, CPU, available cores and pool mode.
+        """
+        model_path = self.service.default_model_path()
+        if model_path is None:
+            print("Autotune skipped: model not found")
+            return None
+
+        start = time.perf_counter()
+        cpus = available_cpus()
+        if self.mode == "thread":
+            session = self.service.create_session(1)
+            allow_batching = supports_dynamic_batch(session) and not accepts_raw_pixels(session)
+        else:
+            allow_batching = False
+        candidates = candidate_configs(
+            cpus,
+            allow_batching,
+            threads=self._explicit["threads"],
+            workers=self._explicit["workers"],
+            batch_size=self._explicit["batch_size"],
+        )
+        key = ":".join([
+            self.service.model_fingerprint(model_path),
+            f"cpus={cpus}",
+            f"mode={self.mode}",
+            f"input={self.service.input_size[0]}x{self.service.input_size[1]}",
+            f"latency={self.autotune_latency_ms:g}",
+            f"candidates={json.dumps(candidates, sort_keys=True)}",
+        ])
+        cache_path = self.autotune_cache or os.path.join(self.service.cache_dir(model_path), "autotune.json")
+        result = autotune(
+            self.service.create_session,
+            candidates,
+            self.service.input_size,
+            cache_path,
+            key,
+            seconds=self.autotune_seconds,
+            latency_target_ms=self.autotune_latency_ms,
+            separate_sessions=self.mode == "process",
+        )
+        self.apply_config(result["config"])
+        self.autotune_result = result
+        self._autotune_time = time.perf_counter() - start
+        source = "cached" if result["cached"] else "benchmarked"
+        print(f"Autotune ({source}): {result['config']}")
+        return result
+
+    def apply_config(self, config: Dict):
+        """Apply a threads/workers/batch_size choice before workers start"""
+        self.max_workers = config["workers"]
+        if not self._explicit["queue"]:
+            self.max_queue = self.max_workers * 4
+        self.threads_per_worker = config["threads"]
+        self.service.batch_max_size = config["batch_size"]
+        if self.mode == "thread":
+            self.service.intra_op_threads = config["threads"]
+            self.service.unbatched_intra_op_threads = (
+                max(1, available_cpus() // self.max_workers) if config["batch_size"] > 1 else None
+            )
+
+    async def _wait_for_server(self, poll_interval: float = 0.2):
+        """Wait until the inference server is reachable and has finished loading"""
+        deadline = time.time() + self.connect_timeout
+        while True:
+            try:
+                self._remote_status = await self._remote.status()
+                if self._remote_status["state"] not in ("idle", "loading"):
+                    # Capacity and thread budget are the server's, not this HTTP worker's
+                    server_stats = self._remote_status["stats"]
+                    self.max_workers = server_stats["workers"]
+                    self.max_queue = server_stats["capacity"] - server_stats["workers"]
+                    self.threads_per_worker = server_stats["threads_per_worker"]
+                    self.state = "failed" if self._remote_status["state"] == "failed" else "ready"
+                    return
+            except (ConnectionError, FileNotFoundError) as e:
+                if time.time() > deadline:
+                    raise ConnectionError(f"Inference server not reachable at {self._remote.socket_path}: {e}")
+            await asyncio.sleep(poll_interval)
+
+    async def refresh_status(self):
+        """Fetch the inference server's current status (remote mode only)"""
+        if self.mode != "remote" or self.state == "loading":
+            return
+        try:
+            self._remote_status = await self._remote.status()
+        except (ConnectionError, FileNotFoundError) as e:
+            print(f"Inference server status unavailable: {e}")
+
+    def batch_stats(self) -> Optional[Dict]:
+        """Micro-batching metrics of the serving model, or None when disabled"""
+        if self.mode == "remote":
+            return self._remote_status.get("batching")
+        return self.service.batch_stats()
+
+    def load_status(self) -> Dict:
+        """Pool state plus the model's loading phase and per-phase seconds"""
+        if self.mode == "remote":
+            remote = self._remote_status.get("load_status", {})
+            return {
+                "state": self.state,
+                "phase": remote.get("phase", self.state),
+                "timings": remote.get("timings", {}),
+                "autotune": remote.get("autotune"),
+            }
+        autotune_info = None
+        timings = {}
+        if self.autotune_result is not None:
+            autotune_info = {"config": self.autotune_result["config"], "cached": self.autotune_result["cached"]}
+            timings["autotune"] = self._autotune_time
+        if self.mode == "process":
+            phase = "ready" if self._workers_model_loaded else self.state
+            timings.update(self._workers_load_timings)
+            return {"state": self.state, "phase": phase, "timings": timings, "autotune": autotune_info}
+        status = self.service.load_status()
+        timings.update(status["timings"])
+        return {"state": self.state, "phase": status["phase"], "timings": timings, "autotune": autotune_info}
+
+    def is_model_loaded(self) -> bool:
+        """Check if the model serving requests is loaded"""
+        if self.mode == "remote":
+            return bool(self._remote_status.get("loaded"))
+        if self.mode == "process":
+            return self._workers_model_loaded
+        return self.service.is_model_loaded()
+
+    def model_load_time(self) -> Optional[float]:
+        """Seconds the serving model took to load and warm up"""
+        if self.mode == "remote":
+            return self._remote_status.get("load_time")
+        if self.mode == "process":
+            return self._workers_model_load_time
+        return self.service.model_load_time
+
+    def available_profiles(self) -> List[str]:
+        """Precision profiles the workers can serve"""
+        if self.mode == "remote":
+            return list(self._remote_status.get("profiles", []))
+        if self.mode == "process":
+            return list(self._workers_profiles)
+        return self.service.available_profiles()
+
+    def active_profile(self) -> Optional[str]:
+        """Profile used for requests that do not pick one"""
+        if self.mode == "remote":
+            return self._remote_status.get("active_profile")
+        if self.mode == "process":
+            return self._workers_active_profile
+        return self.service.active_profile
+
+    def model_ids(self) -> Dict[str, str]:
+        """File name and content fingerprint of the model behind each profile"""
+        if self.mode == "remote":
+            return dict(self._remote_status.get("model_ids", {}))
+        if self.mode == "process":
+            return dict(self._workers_model_ids)
+        return dict(self.service.model_ids)
+
+    def model_id(self, profile: Optional[str] = None) -> str:
+        """Identify the model producing results, used to key the result cache.
+
+        Includes the model's content hash, so replacing or re-quantizing a model
+        file in place does not serve results cached from the old one.
+        """
+        if not self.is_model_loaded():
+            return "fallback"
+        return self.model_ids()[profile or self.active_profile()]
+
+    async def remove_background(self, image_bytes: bytes, wait: bool = False, profile: Optional[str] = None) -> Dict:
+        """Decode and remove background on a worker.
+        
+        Raises ServiceOverloadedError when the queue is full, unless wait=True.
+        profile picks a precision profile; None uses the workers' default.
+        While the model is still loading, waits (wait=True) or raises
+        ServiceOverloadedError so clients retry.
+        """
+        return await self._submit(image_bytes, wait, profile)
+
+    async def remove_background_from_file(self, path: str, wait: bool = False, profile: Optional[str] = None) -> Dict:
+        """Like remove_background, for an image file on a volume shared with the caller.
+
+        Only the path crosses process boundaries; the worker memory-maps the file.
+        """
+        return await self._submit(path, wait, profile)
+
+    async def _submit(self, image: Union[bytes, str], wait: bool, profile: Optional[str]) -> Dict:
+        while wait and self.state == "loading":
+            await asyncio.sleep(0.05)
+        if self.state == "loading":
+            raise ServiceOverloadedError("模型加载中，请稍后重试", retry_after=self.retry_after)
+        if self.mode == "remote":
+            # The inference server owns admission control for all HTTP workers
+            return await self._remove_remote(image, wait, profile)
+        if wait:
+            await self._acquire_wait()
+        else:
+            self._acquire()
+        try:
+            executor = self._get_executor()
+            submitted_at = time.time()
+            if self.mode == "process":
+                job = executor.submit(_remove_in_process, image, submitted_at, profile)
+            else:
+                job = executor.submit(_remove_with_service, self.service, image, submitted_at, profile)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the job finishes, not when the caller stops waiting:
+        # a cancelled request (client disconnect, deadline) keeps it while a worker is still busy
+        job.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(job)
+
+    async def _remove_remote(self, image: Union[bytes, str], wait: bool, profile: Optional[str]) -> Dict:
+        with self._lock:
+            self._in_flight += 1
+        try:
+            if isinstance(image, str):
+                return await self._remote.remove_background_from_file(image, wait=wait, profile=profile)
+            return await self._remote.remove_background(image, wait=wait, profile=profile)
+        except ServiceOverloadedError:
+            with self._lock:
+                self._rejected += 1
+            raise
+        finally:
+            self._release()
+
+    def stats(self) -> Dict:
+        """Snapshot of pool occupancy"""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "workers": self.max_workers,
+                "threads_per_worker": self.threads_per_worker,
+                "in_flight": self._in_flight,
+                "capacity": self.capacity,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        """Stop accepting work and release workers"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import pickle
+import struct
+from typing import Any, Dict, Optional
+
+from models.exceptions import ServiceOverloadedError
+from .inference_pool import InferencePool
+
+DEFAULT_SOCKET_PATH = "/tmp/rmbg-inference.sock"
+
+# Frames are an 8-byte big-endian length followed by a pickled dict. The socket is
+# created with 0600 permissions and only carries traffic between local processes
+# of the same deployment.
+_HEADER = struct.Struct(">Q")
+
+
+async def send_message(writer: asyncio.StreamWriter, message: Dict[str, Any]):
+    payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    writer.write(_HEADER.pack(len(payload)))
+    writer.write(payload)
+    await writer.drain()
+
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """Read one frame, or None when the peer closed the connection"""
+    try:
+        header = await reader.readexactly(_HEADER.size)
+        (length,) = _HEADER.unpack(header)
+        return pickle.loads(await reader.readexactly(length))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+class InferenceServer:
+    """Serve one InferencePool to local HTTP workers over a Unix socket.
+
+    The model (and its micro-batcher) lives only in this process, so N HTTP
+    workers share one copy of the weights and one ORT thread budget.
+    """
+
+    def __init__(self, pool: InferencePool, socket_path: Optional[str] = None):
+        self.pool = pool
+        self.socket_path = socket_path or os.getenv("INFERENCE_SOCKET", DEFAULT_SOCKET_PATH)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loader: Optional[asyncio.Task] = None
+
+    def status(self) -> Dict[str, Any]:
+        """Model and pool state reported to clients"""
+        return {
+            "state": self.pool.state,
+            "loaded": self.pool.is_model_loaded(),
+            "load_time": self.pool.model_load_time(),
+            "load_status": self.pool.load_status(),
+            "profiles": self.pool.available_profiles(),
+            "active_profile": self.pool.active_profile(),
+            "model_ids": self.pool.model_ids(),
+            "stats": self.pool.stats(),
+            "batching": self.pool.service.batch_stats(),
+        }
+
+    async def _dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        if op == "status":
+            return {"ok": True, "status": self.status()}
+        if op != "remove":
+            return {"ok": False, "error": "invalid", "message": f"Unknown op: {op}"}
+        wait = request.get("wait", False)
+        profile = request.get("profile")
+        try:
+            if "path" in request:
+                result = await self.pool.remove_background_from_file(request["path"], wait=wait, profile=profile)
+            else:
+                result = await self.pool.remove_background(request["image_bytes"], wait=wait, profile=profile)
+            return {"ok": True, "result": result}
+        except ServiceOverloadedError as e:
+            return {"ok": False, "error": "overloaded", "message": str(e), "retry_after": e.retry_after}
+        except ValueError as e:
+            return {"ok": False, "error": "invalid", "message": str(e)}
+        except Exception as e:
+            return {"ok": False, "error": "failed", "message": str(e)}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await read_message(reader)
+                if request is None:
+                    break
+                await send_message(writer, await self._dispatch(request))
+        except (ConnectionError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        """Listen immediately and load the model in the background"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._loader = asyncio.ensure_future(self.pool.start())
+        print(f"Inference server listening on {self.socket_path}")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._loader is not None:
+            await asyncio.gather(self._loader, return_exceptions=True)
+        self.pool.shutdown()
+        if self.pool.service.batch_scheduler is not None:
+            self.pool.service.batch_scheduler.shutdown()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class RemoteInferenceClient:
+    """Client side of InferenceServer; one short-lived connection per call"""
+
+    def __init__(self, socket_path: Optional[str] = None):
+        self.socket_path = socket_path or os.getenv("INFERENCE_SOCKET", DEFAULT_SOCKET_PATH)
+
+    async def _call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        try:
+            await send_message(writer, request)
+            response = await read_message(reader)
+        finally:
+            writer.close()
+        if response is None:
+            raise ConnectionError("Inference server closed the connection")
+        return response
+
+    async def status(self) -> Dict[str, Any]:
+        return (await self._call({"op": "status"}))["status"]
+
+    async def remove_background(self, image_bytes: bytes, wait: bool = False, profile: Optional[str] = None) -> Dict:
+        """Run background removal on the server, re-raising its errors locally"""
+        return await self._remove({"op": "remove", "image_bytes": image_bytes, "wait": wait, "profile": profile})
+
+    async def remove_background_from_file(self, path: str, wait: bool = False, profile: Optional[str] = None) -> Dict:
+        """Send only the path of a shared-volume image; the server maps the file itself"""
+        return await self._remove({"op": "remove", "path": path, "wait": wait, "profile": profile})
+
+    async def _remove(self, request: Dict[str, Any]) -> Dict:
+        response = await self._call(request)
+        if response["ok"]:
+            return response["result"]
+        if response["error"] == "overloaded":
+            raise ServiceOverloadedError(response["message"], retry_after=response["retry_after"])
+        if response["error"] == "invalid":
+            raise ValueError(response["message"])
+        raise RuntimeError(response["message"])
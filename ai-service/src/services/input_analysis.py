@@ -0,0 +1,129 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Alpha values at or below this are treated as transparent, at or above
+# ALPHA_OPAQUE as opaque; anything between is a soft edge
+ALPHA_TRANSPARENT = 16
+ALPHA_OPAQUE = 240
+# Statistics are computed on a strided view of at most this many pixels per side
+ANALYSIS_MAX_SIZE = 1024
+
+
+def has_alpha(image: Image.Image) -> bool:
+    """Whether the image carries transparency at all"""
+    return image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+
+
+def alpha_channel(image: Image.Image) -> np.ndarray:
+    """The image's alpha channel as a uint8 HxW array"""
+    if image.mode not in ("RGBA", "LA"):
+        image = image.convert("RGBA")
+    return np.array(image.getchannel("A"))
+
+
+def alpha_cutout(
+    image: Image.Image,
+    min_transparent: float = 0.05,
+    min_opaque: float = 0.01,
+    min_border_transparent: float = 0.5,
+) -> Optional[Tuple[np.ndarray, float]]:
+    """Mask and confidence from an existing alpha channel, or None when it is not a cutout.
+
+    The alpha counts as a cutout when at least min_transparent of the image is
+    transparent, at least min_opaque is opaque (there is a subject), and at least
+    min_border_transparent of the border is transparent (the background was
+    removed, rather than a few holes punched into an opaque image). Confidence
+    drops with the share of semi-transparent pixels.
+    """
+    if not has_alpha(image):
+        return None
+    alpha = alpha_channel(image)
+    step = max(1, -(-max(alpha.shape) // ANALYSIS_MAX_SIZE))
+    sample = alpha[::step, ::step]
+
+    transparent = np.mean(sample <= ALPHA_TRANSPARENT)
+    opaque = np.mean(sample >= ALPHA_OPAQUE)
+    if transparent < min_transparent or opaque < min_opaque:
+        return None
+    border = np.concatenate((sample[0], sample[-1], sample[1:-1, 0], sample[1:-1, -1]))
+    if np.mean(border <= ALPHA_TRANSPARENT) < min_border_transparent:
+        return None
+
+    semi_transparent = 1.0 - transparent - opaque
+    confidence = float(max(0.5, 1.0 - semi_transparent))
+    return alpha, confidence
+
+
+def solid_background_mask(
+    image: Image.Image,
+    max_size: int = 512,
+    border_fraction: float = 0.02,
+    uniform_tolerance: float = 12.0,
+) -> Optional[Tuple[np.ndarray, float]]:
+    """Mask and confidence for images shot on a near-uniform backdrop, or None.
+
+    Works at max_size: border pixels give the background colour (median in Lab)
+    and its spread. If the border is uniform, pixels close to that colour and
+    connected to the border are background; the band between the two distance
+    thresholds becomes a soft edge. Background-coloured regions enclosed by the
+    subject stay foreground. The mask is returned at the working resolution.
+
+    Confidence combines how uniform the border is, how few pixels sit in the
+    ambiguous colour band relative to the subject, and how much of the subject is
+    one connected piece.
+    """
+    work = image
+    if max(work.size) > max_size:
+        scale = max_size / max(work.size)
+        work = work.resize(
+            (max(1, round(work.size[0] * scale)), max(1, round(work.size[1] * scale))),
+            Image.BILINEAR,
+            reducing_gap=2.0,
+        )
+    if work.mode != "RGB":
+        work = work.convert("RGB")
+    lab = cv2.cvtColor(np.asarray(work), cv2.COLOR_RGB2LAB).astype(np.float32)
+    height, width = lab.shape[:2]
+    band = max(1, int(round(min(height, width) * border_fraction)))
+    if min(height, width) <= 4 * band:
+        return None
+
+    border = np.concatenate((
+        lab[:band].reshape(-1, 3),
+        lab[-band:].reshape(-1, 3),
+        lab[band:-band, :band].reshape(-1, 3),
+        lab[band:-band, -band:].reshape(-1, 3),
+    ))
+    background = np.median(border, axis=0)
+    border_distance = np.linalg.norm(border - background, axis=1)
+    spread = float(np.percentile(border_distance, 90))
+    if spread > uniform_tolerance:
+        return None
+
+    # Below low: background; above high: foreground; between: soft edge
+    low = max(8.0, 2.0 * spread)
+    high = 2.0 * low
+    distance = np.linalg.norm(lab - background, axis=2)
+    candidate = (distance < high).astype(np.uint8)
+    _, labels = cv2.connectedComponents(candidate, connectivity=4)
+    edge_labels = np.unique(np.concatenate((labels[0], labels[-1], labels[:, 0], labels[:, -1])))
+    edge_labels = edge_labels[edge_labels != 0]
+    background_region = np.isin(labels, edge_labels)
+
+    ramp = np.clip((distance - low) / (high - low), 0.0, 1.0)
+    mask = np.where(background_region, ramp * 255.0, 255.0).astype(np.uint8)
+
+    foreground = mask >= 128
+    foreground_ratio = float(np.mean(foreground))
+    if foreground_ratio < 0.01 or foreground_ratio > 0.95:
+        return None
+    uniform = float(np.mean(border_distance < low))
+    ambiguous = float(np.mean(background_region & (distance >= low))) / foreground_ratio
+    count, _, stats, _ = cv2.connectedComponentsWithStats(foreground.astype(np.uint8), connectivity=8)
+    continuity = float(stats[1:, cv2.CC_STAT_AREA].max() / foreground.sum()) if count > 1 else 0.0
+
+    confidence = uniform * max(0.0, 1.0 - 2.0 * ambiguous) * (0.5 + 0.5 * continuity)
+    return mask, float(confidence)
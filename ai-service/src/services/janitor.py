@@ -0,0 +1,175 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+
+class ProcessedJanitor:
+    """Keep the service's files under PROCESSED_DIR within an age and size budget.
+
+    Only directories the service owns (sharded masks and the result cache) and
+    legacy top-level mask files are touched; anything else under the root, such
+    as the backend's final images, is left alone.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_age_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        interval: float = 300.0,
+        min_age_seconds: float = 300.0,
+        max_deletes: int = 10000,
+        subdirs: Sequence[str] = ("masks", "cache"),
+        legacy_prefix: str = "mask-",
+    ):
+        self.root = root
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.interval = interval
+        # Files younger than this are never deleted for quota, so a mask path that
+        # was just returned stays readable by the caller
+        self.min_age_seconds = min_age_seconds
+        # Bound the I/O of one sweep; a large backlog is worked off over several sweeps
+        self.max_deletes = max_deletes
+        self.subdirs = tuple(subdirs)
+        self.legacy_prefix = legacy_prefix
+
+        self._lock = threading.Lock()
+        self._reclaimed = {"age": [0, 0], "quota": [0, 0]}  # reason -> [files, bytes]
+        self._sweeps = 0
+        self._errors = 0
+        self._last_sweep: Optional[Dict] = None
+
+    def _scan(self) -> Iterator[Tuple[float, int, str]]:
+        """Yield (mtime, size, path) of every managed file"""
+        try:
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False) and entry.name.startswith(self.legacy_prefix):
+                        yield from self._stat(entry)
+        except FileNotFoundError:
+            return
+        for subdir in self.subdirs:
+            yield from self._walk(os.path.join(self.root, subdir))
+
+    def _walk(self, directory: str) -> Iterator[Tuple[float, int, str]]:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        yield from self._walk(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield from self._stat(entry)
+        except FileNotFoundError:
+            return
+
+    @staticmethod
+    def _stat(entry: os.DirEntry) -> Iterator[Tuple[float, int, str]]:
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            return
+        yield stat.st_mtime, stat.st_size, entry.path
+
+    def _delete(self, path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            # Removed concurrently (another worker's janitor or a cache rewrite)
+            return False
+        except OSError as e:
+            with self._lock:
+                self._errors += 1
+            print(f"Warning: could not delete {path}: {e}")
+            return False
+
+    def sweep(self) -> Dict:
+        """Delete expired files, then the oldest files until under max_bytes"""
+        start = time.perf_counter()
+        now = time.time()
+        reclaimed = {"age": [0, 0], "quota": [0, 0]}
+        deletes = 0
+        kept = []
+        total_bytes = 0
+
+        for mtime, size, path in self._scan():
+            age = now - mtime
+            # Orphaned temp files from interrupted atomic writes also expire
+            expired = (self.max_age_seconds is not None and age > self.max_age_seconds) or (
+                path.endswith(".tmp") and age > self.min_age_seconds
+            )
+            if expired and deletes < self.max_deletes:
+                deletes += 1
+                if self._delete(path):
+                    reclaimed["age"][0] += 1
+                    reclaimed["age"][1] += size
+                    continue
+            kept.append((mtime, size, path))
+            total_bytes += size
+
+        if self.max_bytes is not None and total_bytes > self.max_bytes:
+            kept.sort()
+            remaining = []
+            for index, (mtime, size, path) in enumerate(kept):
+                if total_bytes <= self.max_bytes or deletes >= self.max_deletes or now - mtime < self.min_age_seconds:
+                    remaining.extend(kept[index:])
+                    break
+                deletes += 1
+                if self._delete(path):
+                    reclaimed["quota"][0] += 1
+                    reclaimed["quota"][1] += size
+                    total_bytes -= size
+                else:
+                    remaining.append((mtime, size, path))
+            kept = remaining
+
+        result = {
+            "reclaimed_files": reclaimed["age"][0] + reclaimed["quota"][0],
+            "reclaimed_bytes": reclaimed["age"][1] + reclaimed["quota"][1],
+            "files": len(kept),
+            "bytes": total_bytes,
+            "over_quota": self.max_bytes is not None and total_bytes > self.max_bytes,
+            "duration": time.perf_counter() - start,
+            "finished_at": time.time(),
+        }
+        with self._lock:
+            for reason, (files, size) in reclaimed.items():
+                self._reclaimed[reason][0] += files
+                self._reclaimed[reason][1] += size
+            self._sweeps += 1
+            self._last_sweep = result
+        return result
+
+    async def run(self):
+        """Sweep every interval seconds in a worker thread until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                result = await loop.run_in_executor(None, self.sweep)
+                if result["reclaimed_files"]:
+                    print(
+                        f"Janitor reclaimed {result['reclaimed_files']} files "
+                        f"({result['reclaimed_bytes'] / 1e6:.1f}MB) in {result['duration']:.2f}s"
+                    )
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                print(f"Warning: janitor sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict:
+        """Lifetime reclaim counters and the result of the last sweep"""
+        with self._lock:
+            return {
+                "max_age_seconds": self.max_age_seconds,
+                "max_bytes": self.max_bytes,
+                "sweeps": self._sweeps,
+                "errors": self._errors,
+                "reclaimed": {
+                    reason: {"files": files, "bytes": size} for reason, (files, size) in self._reclaimed.items()
+                },
+                "last_sweep": dict(self._last_sweep) if self._last_sweep is not None else None,
+            }
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class ResultCache:
+    """Content-addressed cache of mask results with a memory LRU and a disk tier"""
+
+    def __init__(self, cache_dir: str, max_memory_bytes: int = 64 * 1024 * 1024, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.enabled = enabled
+
+        # key -> (encoded mask bytes, metadata)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(image_bytes: bytes, model_id: str, params: Dict) -> str:
+        """Hash the uploaded bytes together with the model and processing parameters"""
+        digest = hashlib.sha256()
+        digest.update(image_bytes)
+        digest.update(model_id.encode("utf-8"))
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _paths(self, key: str, extension: str):
+        """Shard entries by key prefix to keep directories small"""
+        directory = os.path.join(self.cache_dir, key[:2])
+        return directory, os.path.join(directory, f"{key}{extension}"), os.path.join(directory, f"{key}.json")
+
+    def _remember(self, key: str, data: bytes, metadata: Dict):
+        """Insert into the memory tier, evicting least recently used entries"""
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= len(self._memory.pop(key)[0])
+            self._memory[key] = (data, metadata)
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, (evicted, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self._evictions += 1
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return cached metadata (including mask_path) or None on a miss"""
+        entry = self.get_entry(key)
+        return entry[1] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, Dict]]:
+        """Return (encoded mask, metadata) or None on a miss.
+
+        mask_path is None for entries stored with persist=False.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+
+        if entry is not None:
+            data, metadata = entry
+            # The file may have been cleaned up; restore it from memory
+            if metadata["mask_path"] is not None and not os.path.exists(metadata["mask_path"]):
+                self._write_file(metadata["mask_path"], data)
+            with self._lock:
+                self._memory_hits += 1
+            return data, dict(metadata)
+
+        try:
+            with open(self._paths(key, "")[2], "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            with open(metadata["mask_path"], "rb") as f:
+                data = f.read()
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self._misses += 1
+            return None
+
+        self._remember(key, data, metadata)
+        with self._lock:
+            self._disk_hits += 1
+        return data, dict(metadata)
+
+    def put(self, key: str, data: bytes, metadata: Dict, extension: str = ".png", persist: bool = True) -> Optional[str]:
+        """Store an encoded mask and its metadata, returning the mask path.
+
+        With persist=False (masks delivered inline) only the memory tier is
+        filled, nothing is written to disk and None is returned.
+        """
+        if not persist:
+            self._remember(key, data, dict(metadata, mask_path=None))
+            return None
+        directory, mask_path, meta_path = self._paths(key, extension)
+        os.makedirs(directory, exist_ok=True)
+        self._write_file(mask_path, data)
+
+        metadata = dict(metadata, mask_path=mask_path)
+        self._write_file(meta_path, json.dumps(metadata).encode("utf-8"))
+        self._remember(key, data, metadata)
+        return mask_path
+
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        """Write atomically so concurrent readers never see partial files"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self._memory_hits + self._disk_hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": (self._memory_hits + self._disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+            }
@@ -0,0 +1,48 @@
+import threading
+from typing import Dict, Hashable, Sequence
+
+import numpy as np
+
+
+class TensorPool:
+    """Reusable per-thread arrays for model inputs and outputs.
+
+    Each thread (one per inference worker) owns its buffers, so concurrent
+    requests never share one. An array returned by get() stays valid until the
+    same thread asks for the same key again; callers must copy anything they
+    keep beyond that.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._allocations = 0
+        self._reuses = 0
+        self._bytes = 0
+
+    def get(self, key: Hashable, shape: Sequence[int], dtype=np.float32) -> np.ndarray:
+        """A C-contiguous array of shape and dtype, reused across calls with the same key"""
+        buffers: Dict[Hashable, np.ndarray] = self._local.__dict__.setdefault("buffers", {})
+        shape = tuple(shape)
+        array = buffers.get(key)
+        if array is not None and array.shape == shape and array.dtype == dtype:
+            with self._lock:
+                self._reuses += 1
+            return array
+
+        previous = array.nbytes if array is not None else 0
+        array = np.empty(shape, dtype=dtype)
+        buffers[key] = array
+        with self._lock:
+            self._allocations += 1
+            self._bytes += array.nbytes - previous
+        return array
+
+    def stats(self) -> Dict:
+        """Allocation and reuse counters, and bytes held across all threads"""
+        with self._lock:
+            return {
+                "allocations": self._allocations,
+                "reuses": self._reuses,
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,85 @@
+"""
+Tests for guided-filter alpha matting
+"""
+import numpy as np
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.image_processing import apply_alpha_matting, guided_filter
+
+
+def _scene(width=600, height=400, radius=120, offset=0):
+    """Red disc on a blue backdrop, and a hard mask of a disc shifted by offset pixels"""
+    yy, xx = np.mgrid[0:height, 0:width]
+    truth = (xx - width / 2) ** 2 + (yy - height / 2) ** 2 < radius ** 2
+    image = np.where(truth[..., None], np.array([200, 60, 40], np.uint8), np.array([30, 140, 220], np.uint8))
+    mask = ((xx - width / 2 - offset) ** 2 + (yy - height / 2) ** 2 < radius ** 2).astype(np.uint8) * 255
+    return image.astype(np.uint8), mask, truth.astype(np.uint8) * 255
+
+
+class TestGuidedFilter:
+    """Test the vectorized colour guided filter"""
+
+    def test_constant_source_is_preserved(self):
+        rng = np.random.default_rng(0)
+        guide = rng.random((64, 80, 3), dtype=np.float32)
+        src = np.full((64, 80), 0.7, dtype=np.float32)
+        out = guided_filter(guide, src, radius=4, eps=1e-4, subsample=2)
+        np.testing.assert_allclose(out, 0.7, atol=1e-4)
+
+    def test_source_equal_to_guide_channel_is_preserved(self):
+        rng = np.random.default_rng(1)
+        guide = rng.random((64, 80, 3), dtype=np.float32)
+        out = guided_filter(guide, guide[..., 1].copy(), radius=4, eps=1e-6)
+        np.testing.assert_allclose(out, guide[..., 1], atol=1e-2)
+
+    def test_subsampled_matches_full(self):
+        image, mask, _ = _scene()
+        guide = image.astype(np.float32) / 255.0
+        src = mask.astype(np.float32) / 255.0
+        full = guided_filter(guide, src, radius=8, eps=1e-4)
+        fast = guided_filter(guide, src, radius=8, eps=1e-4, subsample=4)
+        assert fast.shape == full.shape
+        assert np.abs(fast - full).mean() < 0.02
+
+
+class TestAlphaMatting:
+    """Test trimap handling, edge quality and the tiled mode"""
+
+    def test_edges_snap_to_image(self):
+        image, mask, truth = _scene(offset=3)
+        matte = apply_alpha_matting(image, mask)
+        error = lambda m: np.abs(m.astype(np.int32) - truth).mean()
+        assert error(matte) < 0.7 * error(mask)
+
+    def test_known_regions_untouched(self):
+        image, mask, _ = _scene(offset=3)
+        matte = apply_alpha_matting(image, mask, trimap_erosion=10)
+        assert matte[200, 300] == 255
+        assert matte[5, 5] == 0
+        yy, xx = np.nonzero(matte != mask)
+        distance = np.hypot(xx - 303, yy - 200)
+        assert np.all(np.abs(distance - 120) <= 11)
+
+    @pytest.mark.parametrize("tile_size", [64, 128, 200])
+    def test_tiled_matches_whole_frame(self, tile_size):
+        image, mask, _ = _scene(offset=3)
+        whole = apply_alpha_matting(image, mask).astype(np.int32)
+        tiled = apply_alpha_matting(image, mask, tile_size=tile_size).astype(np.int32)
+        assert np.abs(whole - tiled).max() <= 8
+        assert np.abs(whole - tiled).mean() < 0.1
+
+    def test_rgba_and_gray_images(self):
+        image, mask, _ = _scene(offset=3)
+        rgba = np.dstack([image, np.full(mask.shape, 255, np.uint8)])
+        np.testing.assert_array_equal(apply_alpha_matting(rgba, mask), apply_alpha_matting(image, mask))
+        gray = image.mean(axis=2).astype(np.uint8)
+        assert apply_alpha_matting(gray, mask).shape == mask.shape
+
+    def test_mask_without_edges(self):
+        image, _, _ = _scene()
+        full = np.full(image.shape[:2], 255, np.uint8)
+        np.testing.assert_array_equal(apply_alpha_matting(image, full), full)
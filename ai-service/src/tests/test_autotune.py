@@ -0,0 +1,186 @@
+"""
+Tests for startup autotuning of ORT threads, workers and batch size
+"""
+import asyncio
+import builtins
+import io
+import json
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import services.autotune as autotune_module
+from services.autotune import (
+    autotune,
+    available_cpus,
+    candidate_configs,
+    select_config,
+)
+
+
+def _fake_cgroup(monkeypatch, files):
+    """Serve the given cgroup files and fail every other cgroup read"""
+    original_open = builtins.open
+
+    def fake_open(path, *args, **kwargs):
+        if isinstance(path, str) and path.startswith("/sys/fs/cgroup"):
+            if path not in files:
+                raise FileNotFoundError(path)
+            return io.StringIO(files[path])
+        return original_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", fake_open)
+
+
+class TestAvailableCpus:
+    """Test cgroup-aware core counting"""
+
+    def test_cgroup_v2_quota_caps_cpus(self, monkeypatch):
+        monkeypatch.setattr(autotune_module.os, "sched_getaffinity", lambda pid: set(range(16)), raising=False)
+        _fake_cgroup(monkeypatch, {"/sys/fs/cgroup/cpu.max": "250000 100000\n"})
+        assert available_cpus() == 3
+
+    def test_cgroup_v2_unlimited(self, monkeypatch):
+        monkeypatch.setattr(autotune_module.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+        _fake_cgroup(monkeypatch, {"/sys/fs/cgroup/cpu.max": "max 100000\n"})
+        assert available_cpus() == 8
+
+    def test_cgroup_v1_quota(self, monkeypatch):
+        monkeypatch.setattr(autotune_module.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+        _fake_cgroup(monkeypatch, {
+            "/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "50000\n",
+            "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000\n",
+        })
+        assert available_cpus() == 1
+
+    def test_affinity_without_cgroup(self, monkeypatch):
+        monkeypatch.setattr(autotune_module.os, "sched_getaffinity", lambda pid: {0, 1}, raising=False)
+        _fake_cgroup(monkeypatch, {})
+        assert available_cpus() == 2
+
+
+class TestCandidateConfigs:
+    """Test the configurations considered by autotuning"""
+
+    def test_splits_cores_without_batching(self):
+        configs = candidate_configs(8, allow_batching=False)
+        assert configs == [
+            {"threads": 1, "workers": 8, "batch_size": 1},
+            {"threads": 2, "workers": 4, "batch_size": 1},
+            {"threads": 4, "workers": 2, "batch_size": 1},
+            {"threads": 8, "workers": 1, "batch_size": 1},
+        ]
+
+    def test_non_power_of_two_cores(self):
+        threads = [c["threads"] for c in candidate_configs(6, allow_batching=False)]
+        assert threads == [1, 2, 4, 6]
+
+    def test_batched_configs_use_all_cores(self):
+        batched = [c for c in candidate_configs(4, allow_batching=True) if c["batch_size"] > 1]
+        assert batched == [
+            {"threads": 4, "workers": 2, "batch_size": 2},
+            {"threads": 4, "workers": 4, "batch_size": 4},
+        ]
+
+    def test_explicit_values_are_fixed(self):
+        configs = candidate_configs(8, allow_batching=True, threads=2, batch_size=1)
+        assert configs == [{"threads": 2, "workers": 4, "batch_size": 1}]
+
+        configs = candidate_configs(8, allow_batching=True, workers=3, batch_size=4)
+        assert configs == [{"threads": 8, "workers": 3, "batch_size": 4}]
+
+
+class TestSelectConfig:
+    """Test choosing a configuration from benchmark results"""
+
+    RESULTS = [
+        {"threads": 1, "workers": 4, "batch_size": 1, "images_per_sec": 10.0, "p95_latency_ms": 900.0},
+        {"threads": 4, "workers": 1, "batch_size": 1, "images_per_sec": 6.0, "p95_latency_ms": 200.0},
+        {"threads": 4, "workers": 4, "batch_size": 4, "images_per_sec": 12.0, "p95_latency_ms": 1500.0},
+    ]
+
+    def test_best_throughput_within_target(self):
+        assert select_config(self.RESULTS, 1000)["threads"] == 1
+        assert select_config(self.RESULTS, 2000)["batch_size"] == 4
+
+    def test_lowest_latency_when_nothing_fits(self):
+        assert select_config(self.RESULTS, 100)["p95_latency_ms"] == 200.0
+
+
+class TestAutotune:
+    """Test benchmarking and persisting the choice with a tiny ONNX model"""
+
+    @pytest.fixture
+    def model_path(self, tmp_path):
+        pytest.importorskip("onnx")
+        from tests.test_model_loading import _write_model
+        return _write_model(tmp_path / "model.onnx", size=32)
+
+    def _factory(self, model_path, created):
+        import onnxruntime as ort
+
+        def factory(threads):
+            created.append(threads)
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = threads
+            return ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        return factory
+
+    def test_choice_persisted_and_reused(self, model_path, tmp_path):
+        cache_path = str(tmp_path / "cache" / "autotune.json")
+        candidates = candidate_configs(2, allow_batching=True)
+        created = []
+
+        first = autotune(self._factory(model_path, created), candidates, (32, 32), cache_path, "key", seconds=0.05)
+        assert first["cached"] is False
+        assert first["config"] in candidates
+        assert len(first["results"]) == len(candidates)
+        assert all(r["images_per_sec"] > 0 for r in first["results"])
+        with open(cache_path) as f:
+            assert json.load(f)["key"]["config"] == first["config"]
+
+        created.clear()
+        second = autotune(self._factory(model_path, created), candidates, (32, 32), cache_path, "key", seconds=0.05)
+        assert second["cached"] is True
+        assert second["config"] == first["config"]
+        assert created == []
+
+    def test_separate_sessions_per_worker(self, model_path, tmp_path):
+        created = []
+        candidates = [{"threads": 1, "workers": 3, "batch_size": 1}]
+        autotune(
+            self._factory(model_path, created), candidates, (32, 32),
+            str(tmp_path / "autotune.json"), "key", seconds=0.05, separate_sessions=True,
+        )
+        assert created == [1, 1, 1]
+
+    def test_pool_applies_autotuned_config(self, model_path, tmp_path, monkeypatch):
+        from services.background_removal import BackgroundRemovalService
+        from services.inference_pool import InferencePool
+
+        monkeypatch.setenv("AUTOTUNE", "true")
+        monkeypatch.setenv("AUTOTUNE_SECONDS", "0.05")
+        monkeypatch.setenv("AUTOTUNE_CACHE", str(tmp_path / "autotune.json"))
+        monkeypatch.delenv("INFERENCE_WORKERS", raising=False)
+        monkeypatch.delenv("BATCH_MAX_SIZE", raising=False)
+        monkeypatch.setenv("ORT_CACHE_DIR", str(tmp_path / "ort-cache"))
+        monkeypatch.setenv("MODEL_WARMUP", "false")
+        service = BackgroundRemovalService()
+        service.model_path = model_path
+        service.input_size = (32, 32)
+        pool = InferencePool(service, mode="thread")
+        try:
+            asyncio.run(pool.start())
+            config = pool.autotune_result["config"]
+            assert pool.max_workers == config["workers"]
+            assert service.intra_op_threads == config["threads"]
+            assert service.batch_max_size == config["batch_size"]
+            status = pool.load_status()
+            assert status["autotune"] == {"config": config, "cached": False}
+            assert "autotune" in status["timings"]
+        finally:
+            pool.shutdown()
+            if service.batch_scheduler is not None:
+                service.batch_scheduler.shutdown()
@@ -117,6 +117,24 @@ class TestBackgroundRemovalService:
         # Should convert to RGB (3 channels)
         assert input_array.shape == (1, 3, 1024, 1024)
     
+    def test_preprocess_resample_option(self, service, simple_product_image):
+        """Bilinear preprocess stays close to the lanczos reference and changes the cache key params"""
+        reference, _, _ = service.preprocess_image(simple_product_image)
+        reference_params = service.cache_params()
+
+        service.preprocess_resample = "bilinear"
+        fast, _, _ = service.preprocess_image(simple_product_image)
+
+        assert fast.shape == reference.shape
+        assert np.abs(fast - reference).mean() < 0.01
+        assert service.cache_params() != reference_params
+
+    def test_preprocess_resample_invalid(self, monkeypatch):
+        """Unknown PREPROCESS_RESAMPLE values are rejected at construction"""
+        monkeypatch.setenv("PREPROCESS_RESAMPLE", "nearest-ish")
+        with pytest.raises(ValueError):
+            BackgroundRemovalService()
+
     def test_refine_mask(self, service):
         """Test mask refinement"""
         # Create simple mask
@@ -250,6 +268,8 @@ class TestBackgroundRemovalService:
     
     def test_remove_background_large_object(self, service, large_object_image):
         """Test background removal on large object (edge case)"""
+        # The plain backdrop would otherwise be cut out without the model
+        service.solid_fast_path = False
         result = service.remove_background(large_object_image)
         
         assert result['image'] is not None
@@ -266,6 +286,14 @@ class TestBackgroundRemovalService:
         assert result['image'].mode == 'RGBA'
         assert result['mask'] is not None
     
+    def test_remove_background_mask_only(self, service, simple_product_image):
+        """Mask-only mode skips the RGBA cutout"""
+        result = service.remove_background(simple_product_image, include_image=False)
+        
+        assert result['image'] is None
+        assert result['mask'].shape == (600, 800)
+        assert 0.0 <= result['confidence'] <= 1.0
+    
     def test_fallback_method(self, service, simple_product_image):
         """Test fallback background removal method"""
         import time
@@ -287,6 +315,31 @@ class TestBackgroundRemovalService:
         # Fallback should have reduced confidence
         assert 0.0 <= result['confidence'] <= 1.0
     
+    def test_fallback_reduced_working_resolution(self, service):
+        """Fallback on large images works at reduced size but returns a full-size mask"""
+        import time
+        img = Image.new('RGB', (3000, 2000), color='white')
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([750, 500, 2250, 1500], fill='blue')
+        
+        result = service.fallback_background_removal(img, time.time(), include_image=False)
+        
+        assert result['mask'].shape == (2000, 3000)
+        assert result['image'] is None
+        assert result['method'] == 'fallback'
+    
+    def test_fallback_uses_original_size(self, service, simple_product_image):
+        """Fallback on a reduced decode upscales the mask to the original size"""
+        import time
+        reduced = simple_product_image.resize((400, 300))
+        
+        result = service.fallback_background_removal(
+            reduced, time.time(), True, (800, 600), lambda: simple_product_image
+        )
+        
+        assert result['mask'].shape == (600, 800)
+        assert result['image'].size == (800, 600)
+    
     def test_confidence_consistency(self, service):
         """Test that confidence calculation is consistent"""
         # Create identical masks
@@ -319,6 +372,134 @@ class TestBackgroundRemovalService:
             assert result['image'].size == size
             assert result['mask'].shape == (size[1], size[0])
     
+    def test_remove_background_from_bytes_reduced_decode(self, service):
+        """Large JPEGs decode near model size but masks keep the original size"""
+        import io
+        from utils.image_processing import decode_image_reduced
+        
+        img = Image.new('RGB', (4000, 3000), color='white')
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([1000, 750, 3000, 2250], fill='blue')
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG')
+        data = buf.getvalue()
+        
+        reduced, original_size = decode_image_reduced(data, service.input_size)
+        assert original_size == (4000, 3000)
+        assert reduced.size == (2000, 1500)
+        
+        result = service.remove_background_from_bytes(data)
+        assert result['mask'].shape == (3000, 4000)
+        assert result['image'].size == (4000, 3000)
+    
+    def test_remove_background_from_bytes_png(self, service, simple_product_image):
+        """Non-JPEG input decodes at full size"""
+        import io
+        buf = io.BytesIO()
+        simple_product_image.save(buf, format='PNG')
+        
+        result = service.remove_background_from_bytes(buf.getvalue())
+        assert result['mask'].shape == (600, 800)
+    
+    def test_remove_background_from_file(self, service, simple_product_image, tmp_path):
+        """Files on a shared volume are memory-mapped and match the bytes path"""
+        path = tmp_path / "product.jpg"
+        simple_product_image.save(path, format='JPEG')
+        
+        from_file = service.remove_background_from_file(str(path), include_image=False)
+        from_bytes = service.remove_background_from_bytes(path.read_bytes(), include_image=False)
+        assert from_file['mask'].shape == (600, 800)
+        np.testing.assert_array_equal(from_file['mask'], from_bytes['mask'])
+    
+    def test_remove_background_from_empty_file(self, service, tmp_path):
+        """Empty files are rejected instead of failing inside mmap"""
+        path = tmp_path / "empty.jpg"
+        path.write_bytes(b"")
+        with pytest.raises(ValueError):
+            service.remove_background_from_file(str(path))
+    
+    def test_alpha_fast_path(self, service):
+        """Inputs that are already cut out use their alpha channel as the mask"""
+        import io
+        img = Image.new('RGBA', (400, 300), color=(0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        draw.ellipse([100, 50, 300, 250], fill=(200, 30, 30, 255))
+        buf = io.BytesIO()
+        img.save(buf, format='PNG')
+        
+        result = service.remove_background_from_bytes(buf.getvalue())
+        assert result['method'] == 'alpha'
+        assert result['profile'] is None
+        np.testing.assert_array_equal(result['mask'], np.array(img.getchannel('A')))
+        assert result['confidence'] > 0.9
+        assert result['image'].size == (400, 300)
+        assert 'analysis' in result['timings']
+    
+    def test_alpha_fast_path_palette_transparency(self, service):
+        """Palette images with a transparent index are recognised too"""
+        img = Image.new('RGBA', (200, 200), color=(0, 0, 0, 0))
+        ImageDraw.Draw(img).rectangle([50, 50, 150, 150], fill=(0, 128, 0, 255))
+        palette = img.convert('P', palette=Image.ADAPTIVE)
+        palette.info['transparency'] = palette.getpixel((0, 0))
+        
+        result = service.remove_background(palette, include_image=False)
+        assert result['method'] == 'alpha'
+        assert result['mask'][100, 100] == 255
+        assert result['mask'][10, 10] == 0
+    
+    def test_opaque_alpha_not_used(self, service, transparent_product_image):
+        """An alpha channel with an opaque background is not a cutout"""
+        result = service.remove_background(transparent_product_image)
+        assert result['method'] != 'alpha'
+    
+    def test_alpha_fast_path_disabled(self, service):
+        """ALPHA_FAST_PATH=false always runs the normal pipeline"""
+        service.alpha_fast_path = False
+        img = Image.new('RGBA', (200, 200), color=(0, 0, 0, 0))
+        ImageDraw.Draw(img).rectangle([50, 50, 150, 150], fill=(0, 128, 0, 255))
+        assert service.remove_background(img)['method'] != 'alpha'
+    
+    def test_solid_background_fast_path(self, service, simple_product_image):
+        """Products on a plain backdrop are cut out without the model"""
+        result = service.remove_background(simple_product_image)
+        assert result['method'] == 'solid_background'
+        assert result['profile'] is None
+        assert result['confidence'] >= service.solid_min_confidence
+        assert result['mask'].shape == (600, 800)
+        assert result['mask'][300, 400] == 255
+        assert result['mask'][20, 20] == 0
+        assert result['image'].size == (800, 600)
+        assert 'analysis' in result['timings']
+    
+    def test_busy_background_not_solid(self, service):
+        """Textured or graded backdrops go through the normal pipeline"""
+        rng = np.random.default_rng(0)
+        noise = Image.fromarray(rng.integers(0, 256, (300, 400, 3), dtype=np.uint8))
+        assert service.remove_background(noise)['method'] != 'solid_background'
+        
+        gradient = np.tile(np.linspace(0, 255, 400, dtype=np.uint8)[None, :, None], (300, 1, 3))
+        assert service.remove_background(Image.fromarray(gradient))['method'] != 'solid_background'
+    
+    def test_solid_background_below_min_confidence(self, service, simple_product_image):
+        """Results less confident than SOLID_MIN_CONFIDENCE fall back to the pipeline"""
+        service.solid_min_confidence = 1.01
+        assert service.remove_background(simple_product_image)['method'] != 'solid_background'
+    
+    def test_solid_fast_path_disabled(self, service, simple_product_image):
+        """SOLID_FAST_PATH=false always runs the normal pipeline"""
+        service.solid_fast_path = False
+        assert service.remove_background(simple_product_image)['method'] != 'solid_background'
+    
+    def test_guided_matting(self, service, simple_product_image):
+        """ALPHA_MATTING=guided refines the upscaled mask against the image"""
+        plain = service.remove_background(simple_product_image, include_image=False)
+        service.alpha_matting = "guided"
+        matted = service.remove_background(simple_product_image, include_image=False)
+        assert matted['mask'].shape == plain['mask'].shape
+        assert 'matting' in matted['timings']
+        assert 'matting' not in plain['timings']
+        assert service.cache_params()['alpha_matting'] == 'guided'
+    
     def test_postprocess_mask(self, service):
         """Test mask postprocessing"""
         # Create mock model output
@@ -415,6 +596,35 @@ class TestConfidenceCalculation:
         # Continuous should have higher confidence
         assert conf_continuous > conf_fragmented
     
+    def test_confidence_model_resolution_matches_full_resolution(self, service):
+        """Scoring the 1024x1024 mask matches scoring the upscaled mask within 0.05"""
+        import cv2
+        
+        model_masks = []
+        single = np.zeros((1024, 1024), dtype=np.uint8)
+        single[200:800, 300:700] = 255
+        model_masks.append(single)
+        
+        fragmented = np.zeros((1024, 1024), dtype=np.uint8)
+        fragmented[100:300, 100:300] = 255
+        fragmented[500:900, 500:700] = 255
+        model_masks.append(fragmented)
+        
+        soft = cv2.GaussianBlur(single, (51, 51), 0)
+        model_masks.append(soft)
+        
+        # Reference scores on the full-resolution mask, without the pyramid shortcut
+        reference = BackgroundRemovalService()
+        reference.confidence_max_size = 10 ** 6
+        
+        for model_mask in model_masks:
+            for original_size in [(4000, 3000), (3000, 4000), (800, 600)]:
+                full_mask = service.upscale_mask(model_mask, original_size)
+                full_score = reference.calculate_confidence(full_mask)
+                model_score = service.calculate_confidence(model_mask)
+                assert abs(service.calculate_confidence(full_mask) - full_score) < 0.05
+                assert abs(full_score - model_score) < 0.05, (original_size, full_score, model_score)
+    
     def test_confidence_error_handling(self, service):
         """Test confidence calculation handles errors gracefully"""
         # Very small mask (edge case)
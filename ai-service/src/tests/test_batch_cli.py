@@ -0,0 +1,114 @@
+"""
+Tests for the offline directory batch CLI
+"""
+import json
+import os
+import sys
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import batch_cli
+
+
+def _write_image(path, size=(320, 240)):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    img = Image.new('RGB', size, color='white')
+    ImageDraw.Draw(img).rectangle([80, 60, 240, 180], fill='blue')
+    img.save(path)
+
+
+class TestBatchCli:
+    """Test suite for batch_cli"""
+
+    @pytest.fixture
+    def input_dir(self, tmp_path):
+        root = tmp_path / "input"
+        _write_image(str(root / "a.jpg"))
+        _write_image(str(root / "nested" / "b.png"))
+        (root / "notes.txt").write_text("not an image")
+        return str(root)
+
+    def test_processes_directory_and_writes_manifest(self, input_dir, tmp_path):
+        output_dir = str(tmp_path / "output")
+
+        exit_code = batch_cli.main([input_dir, output_dir, "--workers", "1", "--output", "both"])
+
+        assert exit_code == 0
+        assert os.path.exists(os.path.join(output_dir, "a.jpg_mask.png"))
+        assert os.path.exists(os.path.join(output_dir, "nested", "b.png_cutout.png"))
+        with open(os.path.join(output_dir, batch_cli.MANIFEST_NAME)) as f:
+            records = [json.loads(line) for line in f]
+        assert sorted(r["path"] for r in records) == ["a.jpg", os.path.join("nested", "b.png")]
+        assert all(r["status"] == "ok" for r in records)
+
+    def test_resume_skips_finished_files(self, input_dir, tmp_path):
+        output_dir = str(tmp_path / "output")
+        batch_cli.run(input_dir, output_dir, workers=1, threads_per_worker=1)
+
+        # A new file and a modified file are processed, the untouched one is skipped
+        _write_image(os.path.join(input_dir, "c.jpg"))
+        _write_image(os.path.join(input_dir, "a.jpg"), size=(400, 300))
+        os.utime(os.path.join(input_dir, "a.jpg"), (1, 1))
+
+        summary = batch_cli.run(input_dir, output_dir, workers=1, threads_per_worker=1)
+
+        assert summary["processed"] == 2
+        assert summary["skipped"] == 1
+
+    def test_resume_produces_newly_requested_outputs(self, input_dir, tmp_path):
+        output_dir = str(tmp_path / "output")
+        batch_cli.run(input_dir, output_dir, workers=1, threads_per_worker=1, output="mask")
+
+        summary = batch_cli.run(input_dir, output_dir, workers=1, threads_per_worker=1, output="cutout")
+
+        assert summary["processed"] == 2
+        assert os.path.exists(os.path.join(output_dir, "a.jpg_cutout.png"))
+        # The cutout records keep the earlier masks, so nothing is redone for either output
+        summary = batch_cli.run(input_dir, output_dir, workers=1, threads_per_worker=1, output="both")
+        assert summary["processed"] == 0
+        assert summary["skipped"] == 2
+
+    def test_vanished_file_is_recorded_as_error(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(batch_cli, "_worker_service", object())
+        record = batch_cli._process_file(str(tmp_path), str(tmp_path / "out"), "gone.jpg", "mask")
+
+        assert record["path"] == "gone.jpg"
+        assert record["status"] == "error"
+
+    def test_load_manifest_ignores_partial_lines(self, tmp_path):
+        manifest = tmp_path / "manifest.jsonl"
+        manifest.write_text('{"path": "a.jpg", "status": "ok"}\n{"path": "b.j')
+
+        assert list(batch_cli.load_manifest(str(manifest))) == ["a.jpg"]
+
+    def test_load_manifest_ignores_records_without_path(self, tmp_path):
+        manifest = tmp_path / "manifest.jsonl"
+        manifest.write_text('12\n{"status": "ok"}\n{"path": "a.jpg", "status": "ok"}\n')
+
+        assert list(batch_cli.load_manifest(str(manifest))) == ["a.jpg"]
+
+    def test_same_stem_different_extension(self, tmp_path):
+        jpg_mask, _ = batch_cli.output_paths("out", "a.jpg")
+        png_mask, _ = batch_cli.output_paths("out", "a.png")
+        assert jpg_mask != png_mask
+
+    def test_resume_after_partial_line(self, input_dir, tmp_path):
+        output_dir = str(tmp_path / "output")
+        manifest = os.path.join(output_dir, batch_cli.MANIFEST_NAME)
+        os.makedirs(output_dir)
+        with open(manifest, "w") as f:
+            f.write('{"path": "a.j')
+
+        batch_cli.run(input_dir, output_dir, workers=1, threads_per_worker=1)
+
+        with open(manifest) as f:
+            lines = f.read().splitlines()
+        assert lines[0] == '{"path": "a.j'
+        assert len(lines) == 3
+        assert sorted(batch_cli.load_manifest(manifest)) == ["a.jpg", os.path.join("nested", "b.png")]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
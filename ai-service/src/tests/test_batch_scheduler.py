@@ -0,0 +1,93 @@
+"""
+Tests for dynamic micro-batching of ONNX inference
+"""
+import threading
+import numpy as np
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+onnx = pytest.importorskip("onnx")
+import onnxruntime as ort
+from onnx import helper, TensorProto
+
+from services.batch_scheduler import BatchScheduler, supports_dynamic_batch
+
+
+def _build_session(batch_dim="batch"):
+    """Tiny stand-in model: mean over channels, (N, 3, H, W) -> (N, 1, H, W)"""
+    node = helper.make_node("ReduceMean", ["input"], ["output"], axes=[1], keepdims=1)
+    graph = helper.make_graph(
+        [node],
+        "stand_in",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, [batch_dim, 3, 8, 8])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, [batch_dim, 1, 8, 8])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    return ort.InferenceSession(model.SerializeToString(), providers=['CPUExecutionProvider'])
+
+
+class TestBatchScheduler:
+    """Test suite for BatchScheduler"""
+
+    def test_supports_dynamic_batch(self):
+        assert supports_dynamic_batch(_build_session("batch"))
+        assert not supports_dynamic_batch(_build_session(1))
+
+    def test_concurrent_requests_are_batched(self):
+        """Concurrent submissions share one session.run and get their own outputs back"""
+        scheduler = BatchScheduler(_build_session(), max_batch_size=4, max_wait_ms=200)
+        inputs = [np.full((1, 3, 8, 8), i, dtype=np.float32) for i in range(4)]
+        outputs = [None] * 4
+
+        def worker(index):
+            outputs[index] = scheduler.submit(inputs[index])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        scheduler.shutdown()
+
+        for i, output in enumerate(outputs):
+            assert output.shape == (1, 1, 8, 8)
+            assert np.allclose(output, i)
+
+        stats = scheduler.stats()
+        assert stats['items'] == 4
+        assert stats['batches'] < 4
+        assert sum(size * count for size, count in stats['batch_size_histogram'].items()) == 4
+
+    def test_single_request_flushes_after_wait(self):
+        """A lone request is not held longer than max_wait"""
+        scheduler = BatchScheduler(_build_session(), max_batch_size=8, max_wait_ms=5)
+        output = scheduler.submit(np.ones((1, 3, 8, 8), dtype=np.float32))
+        scheduler.shutdown()
+
+        assert np.allclose(output, 1.0)
+        assert scheduler.stats()['last_batch_size'] == 1
+
+    def test_submit_after_shutdown_raises(self):
+        """Calls after shutdown fail at once instead of waiting on a queue nobody reads"""
+        scheduler = BatchScheduler(_build_session(), max_batch_size=4, max_wait_ms=5)
+        scheduler.shutdown()
+        assert not scheduler._thread.is_alive()
+
+        with pytest.raises(RuntimeError):
+            scheduler.submit(np.ones((1, 3, 8, 8), dtype=np.float32))
+        scheduler.shutdown()
+
+    def test_errors_propagate_to_callers(self):
+        """Inference errors are raised in every waiting caller"""
+        scheduler = BatchScheduler(_build_session(), max_batch_size=2, max_wait_ms=1)
+        with pytest.raises(Exception):
+            scheduler.submit(np.ones((1, 3, 4, 4), dtype=np.float32))
+        scheduler.shutdown()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,88 @@
+"""
+Tests for native-resolution refinement of the uncertain band around mask edges
+"""
+import numpy as np
+import cv2
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.edge_refinement import edge_bands, iter_tiles, refine_edges
+
+
+def _disc(width, height, radius):
+    """Hard-edged disc mask at native resolution"""
+    yy, xx = np.mgrid[0:height, 0:width]
+    inside = (xx - width / 2) ** 2 + (yy - height / 2) ** 2 < radius ** 2
+    return inside.astype(np.uint8) * 255
+
+
+def _model_mask(mask, size=256):
+    """Simulate the model: area-downsample, then the service's light blur"""
+    return cv2.GaussianBlur(cv2.resize(mask, (size, size), interpolation=cv2.INTER_AREA), (3, 3), 0)
+
+
+class TestEdgeRefinement:
+    """Test band detection, tiling and refinement quality"""
+
+    def test_edge_bands(self):
+        mask = np.zeros((20, 20), dtype=np.uint8)
+        mask[5:15, 5:15] = 255
+        mask[0, 0] = 100
+        band, edge = edge_bands(mask, radius=0)
+        assert edge[5, 10] and edge[4, 10]
+        assert not edge[10, 10] and not edge[0, 19]
+        assert band[0, 0] and not edge[0, 0]
+        assert np.all(band[edge])
+
+    def test_tiles_cover_frame(self):
+        covered = np.zeros((300, 500), dtype=np.uint8)
+        for top, bottom, left, right in iter_tiles(300, 500, 128):
+            covered[top:bottom, left:right] += 1
+        assert np.all(covered == 1)
+
+    def test_sharper_than_bilinear(self):
+        truth = _disc(1600, 1200, 450)
+        small = _model_mask(truth)
+        bilinear = cv2.resize(small, (1600, 1200), interpolation=cv2.INTER_LINEAR)
+        refined = refine_edges(small, (1600, 1200))
+
+        assert refined.shape == (1200, 1600)
+        assert refined.dtype == np.uint8
+        error = lambda m: np.abs(m.astype(np.int32) - truth).mean()
+        assert error(refined) < 0.5 * error(bilinear)
+        soft = lambda m: np.mean((m > 8) & (m < 247))
+        assert soft(refined) < 0.5 * soft(bilinear)
+
+    def test_only_band_changes(self):
+        small = _model_mask(_disc(1600, 1200, 450))
+        bilinear = cv2.resize(small, (1600, 1200), interpolation=cv2.INTER_LINEAR)
+        refined = refine_edges(small, (1600, 1200))
+        changed = refined != bilinear
+        # Interior and far background are untouched
+        assert not changed[600, 800] and not changed[10, 10]
+        # Changes are confined to a ring around the boundary
+        yy, xx = np.nonzero(changed)
+        distance = np.hypot(xx - 800, yy - 600)
+        assert np.all(np.abs(distance - 450) < 40)
+
+    @pytest.mark.parametrize("tile_size", [64, 100, 512])
+    def test_tile_size_does_not_change_result(self, tile_size):
+        small = _model_mask(_disc(900, 700, 250))
+        np.testing.assert_array_equal(
+            refine_edges(small, (900, 700), tile_size=tile_size),
+            refine_edges(small, (900, 700), tile_size=128),
+        )
+
+    def test_downscale_is_plain_resize(self):
+        small = _model_mask(_disc(1600, 1200, 450))
+        np.testing.assert_array_equal(
+            refine_edges(small, (200, 150)),
+            cv2.resize(small, (200, 150), interpolation=cv2.INTER_LINEAR),
+        )
+
+    def test_constant_mask(self):
+        full = np.full((64, 64), 255, dtype=np.uint8)
+        assert np.all(refine_edges(full, (640, 480)) == 255)
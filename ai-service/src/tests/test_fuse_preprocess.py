@@ -0,0 +1,181 @@
+"""
+Tests for fusing resize and normalization into the ONNX graph
+"""
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+onnx = pytest.importorskip("onnx")
+import onnxruntime as ort
+from onnx import helper, TensorProto
+
+from fuse_preprocess import DEFAULT_RESAMPLE, fuse_preprocess, fused_model_path
+from services.background_removal import BackgroundRemovalService
+from tests.test_model_loading import _write_model
+
+
+def _write_identity_model(path, size=64):
+    """Model that returns its input, so the fused graph outputs the preprocessed tensor"""
+    graph = helper.make_graph(
+        [helper.make_node("Identity", ["input"], ["output"])],
+        "identity",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["batch", 3, size, size])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, ["batch", 3, size, size])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def _run(path, feed):
+    session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+    return session.run(None, feed)[0]
+
+
+def _python_service(resample=DEFAULT_RESAMPLE):
+    service = BackgroundRemovalService()
+    service.input_size = (64, 64)
+    service.preprocess_resample = resample
+    return service
+
+
+def _photo(width, height):
+    """Smooth photo-like image"""
+    rng = np.random.default_rng(0)
+    noise = Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+    return noise.filter(ImageFilter.GaussianBlur(3))
+
+
+@pytest.fixture
+def photo():
+    """Photo-like image, larger than the model input"""
+    return _photo(400, 300)
+
+
+class TestFusePreprocess:
+    """Test suite for the wrapped model"""
+
+    def test_default_fused_path(self):
+        assert fused_model_path("models/rmbg-1.4.onnx") == "models/rmbg-1.4.fused.onnx"
+
+    def test_default_resample_matches_service(self):
+        assert DEFAULT_RESAMPLE == BackgroundRemovalService().preprocess_resample
+
+    @pytest.mark.parametrize("resample", ["bilinear", "bicubic"])
+    def test_preprocessing_parity(self, tmp_path, photo, resample):
+        """The in-graph tensor matches the Python preprocessing"""
+        fused = fuse_preprocess(_write_identity_model(tmp_path / "identity.onnx"), str(tmp_path / "fused.onnx"), resample)
+        in_graph = _run(fused, {"image": np.asarray(photo)[None]})
+        reference, _, _ = _python_service(resample).preprocess_image(photo)
+
+        assert in_graph.shape == reference.shape == (1, 3, 64, 64)
+        assert np.abs(in_graph - reference).mean() < 0.005
+        assert np.abs(in_graph - reference).max() < 0.05
+
+    def test_lanczos_parity(self, tmp_path, photo):
+        """lanczos is approximated by cubic in the graph.
+
+        Documented tolerance: mean absolute difference below 0.01 (about 2.5 of
+        255 levels) and no pixel off by more than 0.05. Measured on this image it
+        is about 0.002 mean and 2/255 max.
+        """
+        fused = fuse_preprocess(_write_identity_model(tmp_path / "identity.onnx"), str(tmp_path / "fused.onnx"), "lanczos")
+        in_graph = _run(fused, {"image": np.asarray(photo)[None]})
+        reference, _, _ = _python_service("lanczos").preprocess_image(photo)
+
+        assert np.abs(in_graph - reference).mean() < 0.01
+        assert np.abs(in_graph - reference).max() < 0.05
+
+    @pytest.mark.parametrize("resample", ["bilinear", "lanczos"])
+    def test_large_image_parity(self, tmp_path, resample):
+        """Images above max_image_size and twice the input are shrunk before the graph, as in Python"""
+        large = _photo(1500, 1000)
+        service = _python_service(resample)
+        service.max_image_size = 1200
+        fused = fuse_preprocess(_write_identity_model(tmp_path / "identity.onnx"), str(tmp_path / "fused.onnx"), resample)
+
+        pixels, was_downsampled = service.raw_pixels(large)
+        assert was_downsampled
+        assert pixels.shape == (1, 128, 128, 3)
+        in_graph = _run(fused, {"image": pixels})
+        reference, _, reference_downsampled = service.preprocess_image(large)
+
+        assert reference_downsampled
+        assert np.abs(in_graph - reference).mean() < 0.01
+        assert np.abs(in_graph - reference).max() < 0.05
+
+    def test_model_output_parity(self, tmp_path, photo):
+        model_path = _write_model(tmp_path / "model.onnx")
+        fused = fuse_preprocess(model_path, str(tmp_path / "fused.onnx"))
+        reference_input, _, _ = _python_service().preprocess_image(photo)
+
+        fused_mask = _run(fused, {"image": np.asarray(photo)[None]})
+        reference_mask = _run(model_path, {"input": reference_input})
+        assert fused_mask.shape == reference_mask.shape
+        assert np.abs(fused_mask - reference_mask).max() < 0.02
+
+    def test_threshold(self, tmp_path, photo):
+        model_path = _write_model(tmp_path / "model.onnx")
+        pixels = np.asarray(photo)[None]
+
+        soft = _run(fuse_preprocess(model_path, str(tmp_path / "soft.onnx")), {"image": pixels})
+        binary = _run(fuse_preprocess(model_path, str(tmp_path / "binary.onnx"), threshold=0.5), {"image": pixels})
+
+        assert binary.shape == soft.shape == (1, 1, 64, 64)
+        assert set(np.unique(binary)) <= {0.0, 1.0}
+        np.testing.assert_array_equal(binary, (soft > 0.5).astype(np.float32))
+
+    def test_resize_runs_before_float_cast(self, tmp_path):
+        """The raw frame is never expanded to float at full resolution"""
+        fused = onnx.load(fuse_preprocess(_write_identity_model(tmp_path / "identity.onnx"), str(tmp_path / "fused.onnx")))
+        ops = [node.op_type for node in fused.graph.node]
+        assert ops[:4] == ["Resize", "Transpose", "Cast", "Mul"]
+        assert fused.graph.node[0].input[0] == "image"
+
+    def test_refuses_already_fused_model(self, tmp_path):
+        fused = fuse_preprocess(_write_model(tmp_path / "model.onnx"), str(tmp_path / "fused.onnx"))
+        with pytest.raises(ValueError):
+            fuse_preprocess(fused, str(tmp_path / "twice.onnx"))
+
+
+class TestServiceWithFusedModel:
+    """The service feeds raw pixels to models with fused preprocessing"""
+
+    def _service(self, model_path, tmp_path, monkeypatch):
+        monkeypatch.setenv("ORT_CACHE_DIR", str(tmp_path / "ort-cache"))
+        monkeypatch.setenv("BATCH_MAX_SIZE", "4")
+        service = BackgroundRemovalService()
+        service.model_path = model_path
+        service.input_size = (64, 64)
+        service.solid_fast_path = False
+        service.load_model()
+        return service
+
+    def test_masks_match_python_preprocessing(self, tmp_path, photo, monkeypatch):
+        model_path = _write_model(tmp_path / "model.onnx")
+        fused_path = fuse_preprocess(model_path, str(tmp_path / "fused.onnx"))
+        plain = self._service(model_path, tmp_path, monkeypatch)
+        fused = self._service(fused_path, tmp_path, monkeypatch)
+        try:
+            assert fused.is_warmed_up
+            assert fused.batch_scheduler is None
+
+            expected = plain.remove_background(photo, include_image=False)
+            result = fused.remove_background(photo, include_image=False)
+            assert result['method'] == 'ai_model'
+            assert result['mask'].shape == (300, 400)
+            assert np.abs(result['mask'].astype(np.int32) - expected['mask']).max() <= 8
+        finally:
+            if plain.batch_scheduler is not None:
+                plain.batch_scheduler.shutdown()
+
+    def test_fused_threshold(self, tmp_path, photo, monkeypatch):
+        fused_path = fuse_preprocess(_write_model(tmp_path / "model.onnx"), str(tmp_path / "fused.onnx"), threshold=0.5)
+        result = self._service(fused_path, tmp_path, monkeypatch).remove_background(photo, include_image=False)
+        assert result['method'] == 'ai_model'
+        assert result['mask'].shape == (300, 400)
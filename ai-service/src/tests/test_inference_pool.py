@@ -0,0 +1,224 @@
+"""
+Tests for the bounded inference pool
+"""
+import asyncio
+import io
+import threading
+import pytest
+from PIL import Image
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.background_removal import BackgroundRemovalService
+from services.inference_pool import InferencePool
+from models.exceptions import ServiceOverloadedError
+
+
+def _jpeg_bytes(size=(200, 150)):
+    img = Image.new('RGB', size, color='white')
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+class TestInferencePool:
+    """Test suite for InferencePool"""
+
+    def test_thread_budget_split(self):
+        """Workers x ORT threads should not exceed the core count"""
+        service = BackgroundRemovalService()
+        pool = InferencePool(service, max_workers=2, max_queue=0, mode="thread")
+
+        assert pool.threads_per_worker == max(1, (os.cpu_count() or 4) // 2)
+        assert service.intra_op_threads == pool.threads_per_worker
+        assert pool.capacity == 2
+
+    def test_unbatched_sessions_get_worker_share(self, tmp_path, monkeypatch):
+        """With batching on, only the batched default session keeps every core"""
+        from quantize_model import quantize_model, quantized_model_path
+        from tests.test_model_loading import _write_model
+
+        monkeypatch.setenv("ORT_CACHE_DIR", str(tmp_path / "ort-cache"))
+        monkeypatch.setattr("services.inference_pool.available_cpus", lambda: 8)
+        model_path = _write_model(tmp_path / "model.onnx")
+        quantize_model(model_path, quantized_model_path(model_path), mode="dynamic")
+        service = BackgroundRemovalService()
+        service.model_path = model_path
+        service.input_size = (64, 64)
+        service.batch_max_size = 4
+        pool = InferencePool(service, max_workers=4, max_queue=0, mode="thread")
+        try:
+            service.load_model()
+            threads = {
+                profile: session.get_session_options().intra_op_num_threads
+                for profile, session in service.sessions.items()
+            }
+        finally:
+            service.batch_scheduler.shutdown()
+            pool.shutdown()
+
+        assert service.batch_scheduler is not None
+        assert threads == {"quality": 8, "fast": 2}
+
+    def test_remove_background_runs_off_loop(self):
+        """Pool returns the same result structure as the service"""
+        pool = InferencePool(BackgroundRemovalService(), max_workers=1, max_queue=1, mode="thread")
+        try:
+            result = asyncio.run(pool.remove_background(_jpeg_bytes()))
+        finally:
+            pool.shutdown()
+
+        assert result['mask'].shape == (150, 200)
+        # The API path only needs the mask
+        assert result['image'] is None
+        assert 'queue_wait' in result['timings']
+        assert 'decode' in result['timings']
+        assert 0.0 <= result['confidence'] <= 1.0
+        assert pool.stats()['in_flight'] == 0
+
+    def test_rejects_when_full(self):
+        """A full pool raises ServiceOverloadedError with retry_after"""
+        service = BackgroundRemovalService()
+        release = threading.Event()
+        started = threading.Event()
+        original = service.remove_background_from_bytes
+
+        def blocking_remove(image_bytes, include_image=True, profile=None):
+            started.set()
+            release.wait(5)
+            return original(image_bytes, include_image, profile)
+
+        service.remove_background_from_bytes = blocking_remove
+        pool = InferencePool(service, max_workers=1, max_queue=0, mode="thread", retry_after=7)
+
+        async def scenario():
+            first = asyncio.ensure_future(pool.remove_background(_jpeg_bytes()))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            with pytest.raises(ServiceOverloadedError) as exc_info:
+                await pool.remove_background(_jpeg_bytes())
+            release.set()
+            await first
+            return exc_info.value
+
+        try:
+            error = asyncio.run(scenario())
+        finally:
+            release.set()
+            pool.shutdown()
+
+        assert error.retry_after == 7
+        assert pool.stats()['rejected'] == 1
+
+    def _blocking_pool(self, max_queue=0):
+        """Single-worker pool whose jobs block until the returned event is set"""
+        service = BackgroundRemovalService()
+        release = threading.Event()
+        started = threading.Event()
+        original = service.remove_background_from_bytes
+
+        def blocking_remove(image_bytes, include_image=True, profile=None):
+            started.set()
+            release.wait(5)
+            return original(image_bytes, include_image, profile)
+
+        service.remove_background_from_bytes = blocking_remove
+        return InferencePool(service, max_workers=1, max_queue=max_queue, mode="thread"), started, release
+
+    def test_cancelled_request_keeps_slot_until_job_finishes(self):
+        """A caller that stops waiting does not free the slot while the worker is still busy"""
+        pool, started, release = self._blocking_pool()
+
+        async def scenario():
+            first = asyncio.ensure_future(pool.remove_background(_jpeg_bytes()))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            first.cancel()
+            await asyncio.sleep(0.05)
+            assert pool.stats()['in_flight'] == 1
+            with pytest.raises(ServiceOverloadedError):
+                await pool.remove_background(_jpeg_bytes())
+            release.set()
+            # The next waiting caller is admitted once the abandoned job completes
+            return await asyncio.wait_for(pool.remove_background(_jpeg_bytes(), wait=True), 5)
+
+        try:
+            result = asyncio.run(scenario())
+        finally:
+            release.set()
+            pool.shutdown()
+
+        assert result['mask'].shape == (150, 200)
+        assert pool.stats()['in_flight'] == 0
+
+    def test_waiting_caller_woken_by_release(self):
+        """wait=True callers sleep on a condition and proceed as soon as a slot frees"""
+        pool, started, release = self._blocking_pool()
+
+        async def scenario():
+            first = asyncio.ensure_future(pool.remove_background(_jpeg_bytes()))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            waiting = asyncio.ensure_future(pool.remove_background(_jpeg_bytes(), wait=True))
+            await asyncio.sleep(0.1)
+            assert not waiting.done()
+            release.set()
+            await first
+            return await asyncio.wait_for(waiting, 5)
+
+        try:
+            result = asyncio.run(scenario())
+        finally:
+            release.set()
+            pool.shutdown()
+
+        assert result['mask'].shape == (150, 200)
+
+    def test_start_loads_model_off_loop(self):
+        """start() loads the model in thread mode and marks the pool ready"""
+        service = BackgroundRemovalService()
+        calls = []
+        service.load_model = lambda: calls.append(threading.current_thread())
+        pool = InferencePool(service, max_workers=1, max_queue=0, mode="thread")
+
+        async def scenario():
+            await pool.start()
+            return threading.current_thread()
+
+        try:
+            loop_thread = asyncio.run(scenario())
+        finally:
+            pool.shutdown()
+
+        assert pool.state == "ready"
+        assert len(calls) == 1 and calls[0] is not loop_thread
+
+    def test_requests_refused_while_loading(self):
+        """Requests get ServiceOverloadedError until loading finishes; waiting callers proceed after"""
+        pool = InferencePool(BackgroundRemovalService(), max_workers=1, max_queue=1, mode="thread", retry_after=3)
+        pool.state = "loading"
+
+        async def scenario():
+            with pytest.raises(ServiceOverloadedError) as exc_info:
+                await pool.remove_background(_jpeg_bytes())
+            waiting = asyncio.ensure_future(pool.remove_background(_jpeg_bytes(), wait=True))
+            await asyncio.sleep(0.1)
+            assert not waiting.done()
+            pool.state = "ready"
+            return exc_info.value, await waiting
+
+        try:
+            error, result = asyncio.run(scenario())
+        finally:
+            pool.shutdown()
+
+        assert error.retry_after == 3
+        assert result['mask'].shape == (150, 200)
+
+    def test_invalid_mode(self):
+        """Unknown executor modes are rejected"""
+        with pytest.raises(ValueError):
+            InferencePool(BackgroundRemovalService(), mode="gpu")
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,142 @@
+"""
+Tests for the shared inference server and the remote pool mode
+"""
+import asyncio
+import io
+import shutil
+import tempfile
+import threading
+import pytest
+from PIL import Image
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.background_removal import BackgroundRemovalService
+from services.inference_pool import InferencePool
+from services.inference_server import InferenceServer
+from models.exceptions import ServiceOverloadedError
+
+
+def _jpeg_bytes(size=(200, 150)):
+    img = Image.new('RGB', size, color='white')
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+@pytest.fixture
+def socket_path(monkeypatch):
+    # Unix socket paths are limited to ~100 bytes, so avoid deep pytest tmp dirs
+    directory = tempfile.mkdtemp(prefix="rmbg-")
+    path = os.path.join(directory, "inference.sock")
+    monkeypatch.setenv("INFERENCE_SOCKET", path)
+    monkeypatch.setenv("INFERENCE_CONNECT_TIMEOUT", "5")
+    yield path
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def _run_with_server(server_pool, scenario):
+    """Start an InferenceServer for server_pool, run scenario(client_pool), then stop"""
+    async def main():
+        server = InferenceServer(server_pool)
+        await server.start()
+        client = InferencePool(BackgroundRemovalService(), mode="remote")
+        try:
+            await client.start()
+            return await scenario(client)
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+class TestInferenceServer:
+    """Test suite for InferenceServer and remote InferencePool"""
+
+    def test_remote_remove_background(self, socket_path):
+        """HTTP-side pool gets the server's result and status"""
+        server_pool = InferencePool(BackgroundRemovalService(), max_workers=2, max_queue=3, mode="thread")
+
+        async def scenario(client):
+            result = await client.remove_background(_jpeg_bytes())
+            return client, result
+
+        client, result = _run_with_server(server_pool, scenario)
+
+        assert result['mask'].shape == (150, 200)
+        assert 'queue_wait' in result['timings']
+        assert client.state == "ready"
+        # Capacity and thread budget come from the server
+        assert client.max_workers == 2
+        assert client.capacity == 5
+        assert client.stats()['in_flight'] == 0
+        assert not os.path.exists(socket_path)
+
+    def test_remote_remove_background_from_file(self, socket_path, tmp_path):
+        """Only the path is sent to the server, which reads the file itself"""
+        server_pool = InferencePool(BackgroundRemovalService(), max_workers=1, mode="thread")
+        image_path = tmp_path / "upload.jpg"
+        image_path.write_bytes(_jpeg_bytes((120, 90)))
+
+        async def scenario(client):
+            return await client.remove_background_from_file(str(image_path))
+
+        result = _run_with_server(server_pool, scenario)
+        assert result['mask'].shape == (90, 120)
+
+    def test_overload_is_forwarded(self, socket_path):
+        """A full server pool surfaces as ServiceOverloadedError in the HTTP worker"""
+        service = BackgroundRemovalService()
+        release = threading.Event()
+        started = threading.Event()
+        original = service.remove_background_from_bytes
+
+        def blocking_remove(image_bytes, include_image=True, profile=None):
+            started.set()
+            release.wait(5)
+            return original(image_bytes, include_image, profile)
+
+        service.remove_background_from_bytes = blocking_remove
+        server_pool = InferencePool(service, max_workers=1, max_queue=0, mode="thread", retry_after=4)
+
+        async def scenario(client):
+            first = asyncio.ensure_future(client.remove_background(_jpeg_bytes()))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            try:
+                with pytest.raises(ServiceOverloadedError) as exc_info:
+                    await client.remove_background(_jpeg_bytes())
+            finally:
+                release.set()
+            await first
+            return exc_info.value, client.stats()
+
+        try:
+            error, stats = _run_with_server(server_pool, scenario)
+        finally:
+            release.set()
+
+        assert error.retry_after == 4
+        assert stats['rejected'] == 1
+
+    def test_invalid_profile_is_forwarded(self, socket_path):
+        server_pool = InferencePool(BackgroundRemovalService(), max_workers=1, max_queue=1, mode="thread")
+
+        async def scenario(client):
+            with pytest.raises(ValueError):
+                await client.remove_background(_jpeg_bytes(), profile="turbo")
+
+        _run_with_server(server_pool, scenario)
+
+    def test_client_times_out_without_server(self, socket_path, monkeypatch):
+        monkeypatch.setenv("INFERENCE_CONNECT_TIMEOUT", "0.3")
+        client = InferencePool(BackgroundRemovalService(), mode="remote")
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(client.start())
+        assert client.state == "failed"
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
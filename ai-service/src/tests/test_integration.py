@@ -6,6 +6,8 @@ from fastapi.testclient import TestClient
 from PIL import Image
 import io
 import time
+import numpy as np
+import main
 from main import app
 
 client = TestClient(app)
@@ -21,6 +23,33 @@ class TestHealthCheck:
         data = response.json()
         assert data["status"] == "healthy"
         assert "model_loaded" in data
+    
+    def test_health_reports_startup(self):
+        """健康检查返回模型加载阶段和启动耗时"""
+        data = client.get("/health").json()
+        assert data["startup"]["state"] in ("idle", "loading", "ready", "failed")
+        assert "phase" in data["startup"]
+        assert "timings" in data["startup"]
+
+
+class TestPrecisionProfile:
+    """精度档位测试"""
+    
+    def test_health_reports_profiles(self):
+        """健康检查返回默认档位和已加载档位"""
+        data = client.get("/health").json()
+        assert "model_profile" in data
+        assert isinstance(data["profiles"], list)
+    
+    def test_unavailable_profile_rejected(self):
+        """请求未加载的精度档位返回 400"""
+        img_bytes = io.BytesIO()
+        Image.new('RGB', (100, 100), color='white').save(img_bytes, format='JPEG')
+        response = client.post(
+            "/api/remove-background?profile=turbo",
+            files={"file": ("test.jpg", img_bytes.getvalue(), "image/jpeg")}
+        )
+        assert response.status_code == 400
 
 
 class TestBackgroundRemovalIntegration:
@@ -336,3 +365,357 @@ class TestFallbackMechanism:
             assert data["success"] is True
             # 可能会在消息中提到使用了回退方法
             assert "message" in data
+
+
+class TestResultCache:
+    """结果缓存测试"""
+    
+    def test_repeated_upload_hits_cache(self):
+        """测试重复上传命中缓存并返回相同蒙版"""
+        # 纯色背景上的商品走 solid_background 快速路径，结果可缓存
+        img = Image.new('RGB', (320, 240), color=(10, 220, 130))
+        img.paste((200, 40, 40), (110, 70, 210, 170))
+        payload = io.BytesIO()
+        img.save(payload, format='PNG')
+        data = payload.getvalue()
+        
+        first = client.post(
+            "/api/remove-background",
+            files={"file": ("repeat.png", io.BytesIO(data), "image/png")}
+        )
+        second = client.post(
+            "/api/remove-background",
+            files={"file": ("repeat.png", io.BytesIO(data), "image/png")}
+        )
+        
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert second.json()["cached"] is True
+        assert second.json()["mask_path"] == first.json()["mask_path"]
+        assert second.json()["confidence"] == first.json()["confidence"]
+
+    
+    def test_fallback_result_not_cached(self):
+        """回退方法的结果不写入缓存，下次上传重新处理"""
+        rng = np.random.default_rng(3)
+        img = Image.fromarray(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8))
+        payload = io.BytesIO()
+        img.save(payload, format='PNG')
+        data = payload.getvalue()
+        
+        responses = [
+            client.post("/api/remove-background", files={"file": ("noise.png", io.BytesIO(data), "image/png")})
+            for _ in range(2)
+        ]
+        assert all(r.status_code == 200 for r in responses)
+        assert responses[0].json()["method"] == "fallback"
+        assert responses[1].json()["cached"] is False
+
+    def test_fallback_not_cacheable(self):
+        """只有模型和快速路径的结果可缓存"""
+        assert main.is_cacheable({"method": "ai_model"})
+        assert main.is_cacheable({"method": "solid_background"})
+        assert not main.is_cacheable({"method": "fallback"})
+        assert not main.is_cacheable({"method": "ai_model", "low_confidence": True})
+
+
+class TestZeroCopyInput:
+    """原始请求体和共享卷路径输入测试"""
+    
+    @staticmethod
+    def _png_bytes(color):
+        # 纯色背景上的商品，走可缓存的 solid_background 快速路径
+        img = Image.new('RGB', (200, 150), color=color)
+        img.paste((250, 250, 250), (70, 45, 130, 105))
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format='PNG')
+        return img_bytes.getvalue()
+    
+    def test_raw_body(self):
+        """请求体直接是图片内容"""
+        response = client.post(
+            "/api/remove-background/raw",
+            content=self._png_bytes((200, 40, 40)),
+            headers={"Content-Type": "application/octet-stream"}
+        )
+        assert response.status_code == 200
+        assert response.json()["success"] is True
+        assert "Server-Timing" in response.headers
+    
+    def test_raw_body_rejects_other_content_types(self):
+        """非图片类型的请求体返回 400"""
+        response = client.post(
+            "/api/remove-background/raw",
+            content=b"{}",
+            headers={"Content-Type": "application/json"}
+        )
+        assert response.status_code == 400
+    
+    def test_raw_body_chunked(self):
+        """未声明长度的分块请求体同样可以处理"""
+        data = self._png_bytes((200, 40, 40))
+        response = client.post(
+            "/api/remove-background/raw",
+            content=iter([data[:100], data[100:]]),
+            headers={"Content-Type": "application/octet-stream"}
+        )
+        assert response.status_code == 200
+        assert response.json()["success"] is True
+    
+    def test_raw_body_too_large(self, monkeypatch):
+        """超过 MAX_UPLOAD_MB 的请求体返回 413，无论是否声明长度"""
+        monkeypatch.setattr(main, "MAX_UPLOAD_MB", 0.01)
+        data = bytes(20 * 1024)
+        for content in (data, iter([data[:8192], data[8192:]])):
+            response = client.post(
+                "/api/remove-background/raw",
+                content=content,
+                headers={"Content-Type": "application/octet-stream"}
+            )
+            assert response.status_code == 413
+    
+    def test_shared_path(self, tmp_path, monkeypatch):
+        """共享卷路径输入，与上传相同内容时命中同一缓存项"""
+        import main
+        monkeypatch.setattr(main, "SHARED_INPUT_DIR", str(tmp_path))
+        data = self._png_bytes((40, 200, 40))
+        (tmp_path / "upload.png").write_bytes(data)
+        
+        by_path = client.post("/api/remove-background/path", json={"path": "upload.png"})
+        assert by_path.status_code == 200
+        assert by_path.json()["success"] is True
+        
+        uploaded = client.post(
+            "/api/remove-background",
+            files={"file": ("upload.png", io.BytesIO(data), "image/png")}
+        )
+        assert uploaded.json()["mask_path"] == by_path.json()["mask_path"]
+    
+    def test_shared_path_outside_root_rejected(self, tmp_path, monkeypatch):
+        """共享目录外的路径（包括符号链接）返回 403，不存在的文件返回 404"""
+        import main
+        shared = tmp_path / "shared"
+        shared.mkdir()
+        outside = tmp_path / "secret.png"
+        outside.write_bytes(self._png_bytes((0, 0, 0)))
+        (shared / "link.png").symlink_to(outside)
+        monkeypatch.setattr(main, "SHARED_INPUT_DIR", str(shared))
+        
+        assert client.post("/api/remove-background/path", json={"path": str(outside)}).status_code == 403
+        assert client.post("/api/remove-background/path", json={"path": "../secret.png"}).status_code == 403
+        assert client.post("/api/remove-background/path", json={"path": "link.png"}).status_code == 403
+        assert client.post("/api/remove-background/path", json={"path": "missing.png"}).status_code == 404
+
+
+class TestAlphaFastPath:
+    """已抠图输入和纯色背景的快速路径测试"""
+    
+    def test_cutout_png_uses_alpha(self):
+        """透明背景的 PNG 不经过模型，method 为 alpha"""
+        img = Image.new('RGBA', (300, 200), color=(0, 0, 0, 0))
+        img.paste((20, 120, 220, 255), (100, 50, 200, 150))
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format='PNG')
+        
+        response = client.post(
+            "/api/remove-background",
+            params={"delivery": "inline"},
+            files={"file": ("cutout.png", io.BytesIO(img_bytes.getvalue()), "image/png")}
+        )
+        assert response.status_code == 200
+        assert response.json()["method"] == "alpha"
+
+
+    def test_plain_backdrop_uses_solid_background(self):
+        """纯色背景的商品图不经过模型，method 为 solid_background"""
+        img = Image.new('RGB', (300, 200), color=(245, 245, 245))
+        img.paste((20, 120, 220), (100, 50, 200, 150))
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format='PNG')
+        
+        response = client.post(
+            "/api/remove-background",
+            params={"delivery": "inline"},
+            files={"file": ("studio.png", io.BytesIO(img_bytes.getvalue()), "image/png")}
+        )
+        assert response.status_code == 200
+        assert response.json()["method"] == "solid_background"
+
+
+class TestMaskOutput:
+    """蒙版编码格式和返回方式测试"""
+    
+    @staticmethod
+    def _upload(color, **params):
+        # 纯色背景上的商品，走可缓存的 solid_background 快速路径
+        img = Image.new('RGB', (240, 160), color=color)
+        img.paste((250, 250, 250), (80, 50, 160, 110))
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format='PNG')
+        return client.post(
+            "/api/remove-background",
+            params=params,
+            files={"file": ("mask.png", io.BytesIO(img_bytes.getvalue()), "image/png")}
+        )
+    
+    def test_inline_delivery_skips_disk(self):
+        """inline 返回 base64 蒙版，不返回路径"""
+        import base64
+        response = self._upload((12, 34, 56), mask_format="raw", delivery="inline")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["mask_path"] is None
+        assert data["mask_format"] == "raw"
+        assert data["mask_size"] == [240, 160]
+        assert len(base64.b64decode(data["mask"])) == 240 * 160
+    
+    def test_stream_delivery(self):
+        """stream 返回蒙版本身，结果放在响应头"""
+        response = self._upload((56, 34, 12), mask_format="webp", delivery="stream")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert response.headers["x-mask-format"] == "webp"
+        assert response.headers["x-mask-width"] == "240"
+        assert "x-confidence" in response.headers
+        assert "server-timing" in response.headers
+        assert Image.open(io.BytesIO(response.content)).size == (240, 160)
+    
+    def test_inline_result_persisted_on_path_request(self):
+        """先以 inline 返回（只缓存在内存），再按路径请求时补写磁盘"""
+        color = (77, 88, 99)
+        inline = self._upload(color, mask_format="png_fast", delivery="inline")
+        by_path = self._upload(color, mask_format="png_fast", delivery="path")
+        assert inline.status_code == 200
+        assert by_path.json()["cached"] is True
+        assert by_path.json()["mask_path"].endswith(".png")
+        with open(by_path.json()["mask_path"], "rb") as f:
+            assert Image.open(f).size == (240, 160)
+    
+    def test_formats_cached_separately(self):
+        """不同格式的同一图片不共用缓存项"""
+        color = (99, 88, 77)
+        png = self._upload(color, mask_format="png")
+        rle = self._upload(color, mask_format="rle")
+        assert png.json()["mask_path"].endswith(".png")
+        assert rle.json()["mask_path"].endswith(".rle")
+        assert png.json()["mask_path"] != rle.json()["mask_path"]
+    
+    def test_invalid_output_options(self):
+        """不支持的格式或返回方式返回 400"""
+        assert self._upload((1, 2, 3), mask_format="jpeg").status_code == 400
+        assert self._upload((1, 2, 3), delivery="email").status_code == 400
+
+
+class TestBatchEndpoint:
+    """批量处理端点测试"""
+    
+    @staticmethod
+    def _image_bytes(color, img_format='JPEG'):
+        img = Image.new('RGB', (300, 200), color=color)
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format=img_format)
+        return img_bytes.getvalue()
+    
+    @staticmethod
+    def _read_lines(response):
+        import json
+        return [json.loads(line) for line in response.text.splitlines() if line]
+    
+    def test_batch_multipart_files(self):
+        """测试多文件批量处理并以 NDJSON 返回"""
+        response = client.post(
+            "/api/remove-background/batch",
+            files=[
+                ("files", ("a.jpg", self._image_bytes((200, 30, 30)), "image/jpeg")),
+                ("files", ("b.png", self._image_bytes((30, 30, 200), 'PNG'), "image/png")),
+                ("files", ("bad.jpg", b"not an image", "image/jpeg")),
+            ]
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = self._read_lines(response)
+        items = sorted(lines[:-1], key=lambda item: item["index"])
+        assert [item["filename"] for item in items] == ["a.jpg", "b.png", "bad.jpg"]
+        assert items[0]["success"] is True and items[0]["mask_path"]
+        assert items[2]["success"] is False
+        assert lines[-1] == {"done": True, "total": 3, "succeeded": 2, "failed": 1}
+    
+    def test_batch_archive(self):
+        """测试 zip 与 tar 压缩包批量处理"""
+        import tarfile
+        import zipfile
+        
+        zip_bytes = io.BytesIO()
+        with zipfile.ZipFile(zip_bytes, 'w') as archive:
+            archive.writestr('products/1.jpg', self._image_bytes((10, 120, 10)))
+            archive.writestr('notes.txt', 'ignored')
+        
+        tar_bytes = io.BytesIO()
+        with tarfile.open(fileobj=tar_bytes, mode='w:gz') as archive:
+            data = self._image_bytes((120, 10, 10), 'PNG')
+            info = tarfile.TarInfo('2.png')
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+        
+        response = client.post(
+            "/api/remove-background/batch",
+            files=[
+                ("files", ("images.zip", zip_bytes.getvalue(), "application/zip")),
+                ("files", ("images.tar.gz", tar_bytes.getvalue(), "application/gzip")),
+            ]
+        )
+        
+        assert response.status_code == 200
+        lines = self._read_lines(response)
+        assert sorted(item["filename"] for item in lines[:-1]) == ["2.png", "products/1.jpg"]
+        assert lines[-1]["succeeded"] == 2
+    
+    def test_batch_rejects_non_image(self):
+        """测试批量端点拒绝非图片文件"""
+        response = client.post(
+            "/api/remove-background/batch",
+            files=[("files", ("a.txt", b"text", "text/plain"))]
+        )
+        assert response.status_code == 400
+
+
+class TestMetrics:
+    """阶段耗时与指标端点测试"""
+    
+    def test_server_timing_header(self):
+        """测试响应头包含各阶段耗时"""
+        import uuid
+        img = Image.new('RGB', (320, 240), color=(uuid.uuid4().int % 256, 40, 90))
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format='PNG')
+        # 每次内容不同，避免命中缓存
+        img_bytes.write(uuid.uuid4().bytes)
+        img_bytes.seek(0)
+        
+        response = client.post(
+            "/api/remove-background",
+            files={"file": ("timing.png", img_bytes, "image/png")}
+        )
+        
+        assert response.status_code == 200
+        server_timing = response.headers["server-timing"]
+        for stage in ("upload_read", "decode", "queue_wait", "mask_encode", "disk_write"):
+            assert f"{stage};dur=" in server_timing
+    
+    def test_metrics_endpoint(self):
+        """测试 Prometheus 指标端点"""
+        response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE ai_stage_duration_seconds histogram" in response.text
+        assert "ai_inflight_requests" in response.text
+        assert "ai_cache_misses_total" in response.text
+        assert "ai_janitor_reclaimed_bytes_total" in response.text
+    
+    def test_health_reports_storage(self):
+        """健康检查返回 PROCESSED_DIR 清理配额和回收统计"""
+        storage = client.get("/health").json()["storage"]
+        assert "reclaimed" in storage
+        assert "max_bytes" in storage
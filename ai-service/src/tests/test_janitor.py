@@ -0,0 +1,111 @@
+"""
+Tests for the PROCESSED_DIR janitor
+"""
+import asyncio
+import os
+import time
+import pytest
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.janitor import ProcessedJanitor
+
+
+def _write(path, size, age):
+    """Create a file of size bytes whose mtime is age seconds in the past"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+class TestProcessedJanitor:
+    """Test suite for ProcessedJanitor"""
+
+    def test_expired_files_removed(self, tmp_path):
+        old = _write(tmp_path / "masks" / "ab" / "mask-old.png", 10, age=7200)
+        new = _write(tmp_path / "masks" / "cd" / "mask-new.png", 10, age=60)
+        janitor = ProcessedJanitor(str(tmp_path), max_age_seconds=3600)
+
+        result = janitor.sweep()
+
+        assert not os.path.exists(old)
+        assert os.path.exists(new)
+        assert result["reclaimed_files"] == 1
+        assert result["reclaimed_bytes"] == 10
+        assert result["files"] == 1
+        assert janitor.stats()["reclaimed"]["age"] == {"files": 1, "bytes": 10}
+
+    def test_quota_removes_oldest_first(self, tmp_path):
+        paths = [_write(tmp_path / "cache" / "ab" / f"{i}.png", 100, age=1000 - i * 100) for i in range(5)]
+        janitor = ProcessedJanitor(str(tmp_path), max_bytes=250, min_age_seconds=0)
+
+        result = janitor.sweep()
+
+        assert [os.path.exists(p) for p in paths] == [False, False, False, True, True]
+        assert result["bytes"] == 200
+        assert result["over_quota"] is False
+        assert janitor.stats()["reclaimed"]["quota"] == {"files": 3, "bytes": 300}
+
+    def test_recent_files_protected_from_quota(self, tmp_path):
+        recent = _write(tmp_path / "masks" / "ab" / "mask-recent.png", 500, age=10)
+        janitor = ProcessedJanitor(str(tmp_path), max_bytes=100, min_age_seconds=300)
+
+        result = janitor.sweep()
+
+        assert os.path.exists(recent)
+        assert result["over_quota"] is True
+
+    def test_only_managed_files_touched(self, tmp_path):
+        legacy = _write(tmp_path / "mask-legacy.png", 10, age=7200)
+        backend_output = _write(tmp_path / "processed-final.jpg", 10, age=7200)
+        other_dir = _write(tmp_path / "exports" / "keep.png", 10, age=7200)
+        janitor = ProcessedJanitor(str(tmp_path), max_age_seconds=3600)
+
+        janitor.sweep()
+
+        assert not os.path.exists(legacy)
+        assert os.path.exists(backend_output)
+        assert os.path.exists(other_dir)
+
+    def test_orphaned_temp_files_removed(self, tmp_path):
+        orphan = _write(tmp_path / "cache" / "ab" / "key.png.123.tmp", 10, age=600)
+        in_progress = _write(tmp_path / "cache" / "ab" / "key.png.456.tmp", 10, age=1)
+        janitor = ProcessedJanitor(str(tmp_path), min_age_seconds=300)
+
+        janitor.sweep()
+
+        assert not os.path.exists(orphan)
+        assert os.path.exists(in_progress)
+
+    def test_deletes_per_sweep_bounded(self, tmp_path):
+        for i in range(5):
+            _write(tmp_path / "masks" / "ab" / f"mask-{i}.png", 10, age=7200)
+        janitor = ProcessedJanitor(str(tmp_path), max_age_seconds=3600, max_deletes=2)
+
+        assert janitor.sweep()["reclaimed_files"] == 2
+        assert janitor.sweep()["reclaimed_files"] == 2
+        assert janitor.sweep()["reclaimed_files"] == 1
+        assert janitor.stats()["sweeps"] == 3
+
+    def test_missing_root(self, tmp_path):
+        janitor = ProcessedJanitor(str(tmp_path / "missing"), max_age_seconds=1)
+        assert janitor.sweep()["files"] == 0
+
+    def test_background_task_sweeps_periodically(self, tmp_path):
+        old = _write(tmp_path / "masks" / "ab" / "mask-old.png", 10, age=7200)
+        janitor = ProcessedJanitor(str(tmp_path), max_age_seconds=3600, interval=0.01)
+
+        async def run_briefly():
+            task = asyncio.ensure_future(janitor.run())
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run_briefly())
+        assert not os.path.exists(old)
+        assert janitor.stats()["sweeps"] >= 2
@@ -0,0 +1,73 @@
+"""
+Tests for mask output encodings
+"""
+import io
+import numpy as np
+import pytest
+from PIL import Image
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.mask_encoding import MASK_FORMATS, decode_rle, encode_mask, encode_rle
+
+
+@pytest.fixture
+def soft_mask():
+    """Rectangle with a blurred edge so lossless formats have soft alpha to keep"""
+    mask = np.zeros((120, 160), dtype=np.uint8)
+    mask[30:90, 40:130] = 255
+    mask[29, 40:130] = 128
+    mask[90, 40:130] = 64
+    return mask
+
+
+class TestMaskEncoding:
+    """Test suite for encode_mask and the RLE codec"""
+
+    @pytest.mark.parametrize("mask_format", ["png", "png_fast", "webp"])
+    def test_image_formats_are_lossless(self, soft_mask, mask_format):
+        decoded = np.array(Image.open(io.BytesIO(encode_mask(soft_mask, mask_format))))
+        if decoded.ndim == 3:
+            decoded = decoded[..., 0]
+        np.testing.assert_array_equal(decoded, soft_mask)
+
+    def test_fast_png_trades_size_for_speed(self, soft_mask):
+        noisy = soft_mask.copy()
+        noisy[30:90, 40:130] = np.random.default_rng(0).integers(200, 256, (60, 90))
+        assert len(encode_mask(noisy, "png_fast")) >= len(encode_mask(noisy, "png"))
+
+    def test_raw_is_uint8_hw(self, soft_mask):
+        data = encode_mask(soft_mask, "raw")
+        assert len(data) == soft_mask.size
+        np.testing.assert_array_equal(np.frombuffer(data, dtype=np.uint8).reshape(120, 160), soft_mask)
+
+    def test_rle_round_trip_is_thresholded(self, soft_mask):
+        decoded = decode_rle(encode_mask(soft_mask, "rle"))
+        np.testing.assert_array_equal(decoded, np.where(soft_mask >= 128, 255, 0).astype(np.uint8))
+
+    def test_rle_is_cropped_to_bounding_box(self, soft_mask):
+        data = encode_rle(soft_mask)
+        # Header plus one background/foreground pair per row of the 61x90 box and a trailing run
+        assert len(data) < 61 * 2 * 4 + 64
+        assert len(data) < len(encode_mask(soft_mask, "png"))
+
+    def test_rle_edge_cases(self):
+        empty = np.zeros((10, 20), dtype=np.uint8)
+        np.testing.assert_array_equal(decode_rle(encode_rle(empty)), empty)
+
+        full = np.full((10, 20), 255, dtype=np.uint8)
+        np.testing.assert_array_equal(decode_rle(encode_rle(full)), full)
+
+        with pytest.raises(ValueError):
+            decode_rle(b"PNG!" + bytes(28))
+
+    def test_unknown_format(self, soft_mask):
+        with pytest.raises(ValueError):
+            encode_mask(soft_mask, "jpeg")
+
+    def test_every_format_has_media_type_and_extension(self):
+        for media_type, extension in MASK_FORMATS.values():
+            assert "/" in media_type
+            assert extension.startswith(".")
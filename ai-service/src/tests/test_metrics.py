@@ -0,0 +1,57 @@
+"""
+Tests for the Prometheus metrics helpers
+"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.metrics import MetricsRegistry, StageTimer, server_timing_header
+
+
+class TestMetrics:
+    """Test suite for metrics helpers"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("stage_seconds", "Stage time", ["stage"], buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="decode")
+        histogram.observe(0.5, stage="decode")
+        histogram.observe(5.0, stage="decode")
+
+        text = registry.render()
+
+        assert 'stage_seconds_bucket{le="0.1",stage="decode"} 1' in text
+        assert 'stage_seconds_bucket{le="1.0",stage="decode"} 2' in text
+        assert 'stage_seconds_bucket{le="+Inf",stage="decode"} 3' in text
+        assert 'stage_seconds_count{stage="decode"} 3' in text
+
+    def test_counter_and_collector(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests", ["outcome"])
+        counter.inc(outcome="success")
+        counter.inc(2, outcome="success")
+        registry.collector("inflight", "gauge", "In flight", lambda: [({}, 3)])
+
+        text = registry.render()
+
+        assert 'requests_total{outcome="success"} 3.0' in text
+        assert "# TYPE inflight gauge" in text
+        assert "inflight 3.0" in text
+
+    def test_stage_timer_and_server_timing(self):
+        timer = StageTimer()
+        with timer.stage("decode"):
+            pass
+        timer.add("inference", 0.25)
+        timer.add("inference", 0.25)
+
+        header = server_timing_header(timer.timings)
+
+        assert header.startswith("decode;dur=")
+        assert "inference;dur=500.0" in header
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
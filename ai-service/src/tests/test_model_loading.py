@@ -0,0 +1,148 @@
+"""
+Tests for the optimized-model cache and model loading progress
+"""
+import numpy as np
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+onnx = pytest.importorskip("onnx")
+import onnxruntime as ort
+from onnx import helper, numpy_helper, TensorProto
+
+import services.background_removal as background_removal
+from services.background_removal import BackgroundRemovalService
+
+
+def _write_model(path, bias=-0.5, size=64):
+    """Tiny segmentation stand-in: 3x3 conv over RGB followed by a sigmoid"""
+    rng = np.random.default_rng(0)
+    weight = numpy_helper.from_array(rng.normal(0, 0.5, (1, 3, 3, 3)).astype(np.float32), "weight")
+    bias = numpy_helper.from_array(np.array([bias], dtype=np.float32), "bias")
+    nodes = [
+        helper.make_node("Conv", ["input", "weight", "bias"], ["logits"], pads=[1, 1, 1, 1]),
+        helper.make_node("Sigmoid", ["logits"], ["output"]),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "stand_in",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["batch", 3, size, size])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, ["batch", 1, size, size])],
+        initializer=[weight, bias],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def _service(model_path):
+    service = BackgroundRemovalService()
+    service.model_path = model_path
+    service.input_size = (64, 64)
+    return service
+
+
+@pytest.fixture
+def session_paths(monkeypatch):
+    """Record which file each InferenceSession is created from"""
+    paths = []
+    original = ort.InferenceSession
+
+    def spy(path, *args, **kwargs):
+        paths.append(path)
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr(background_removal.ort, "InferenceSession", spy)
+    return paths
+
+
+class TestOptimizedModelCache:
+    """Test suite for persisting the ORT-optimized graph"""
+
+    def test_cache_written_then_reused(self, tmp_path, session_paths):
+        model_path = _write_model(tmp_path / "model.onnx")
+        first = _service(model_path)
+        first.load_model()
+        cache_path = first.optimized_model_path(model_path)
+
+        assert os.path.exists(cache_path)
+        assert os.path.dirname(cache_path) == str(tmp_path / ".ort-cache")
+        assert session_paths == [model_path]
+
+        second = _service(model_path)
+        second.load_model()
+        assert session_paths[-1] == cache_path
+
+        array = np.random.default_rng(1).random((1, 3, 64, 64), dtype=np.float32)
+        assert np.array_equal(first.run_inference(array), second.run_inference(array))
+
+    def test_cache_key_follows_model_content(self, tmp_path):
+        model_path = _write_model(tmp_path / "model.onnx")
+        service = _service(model_path)
+        before = service.optimized_model_path(model_path)
+
+        _write_model(tmp_path / "model.onnx", bias=0.5)
+
+        assert service.optimized_model_path(model_path) != before
+
+    def test_model_id_follows_model_content(self, tmp_path):
+        """Result cache keys change when the model file is replaced in place"""
+        model_path = _write_model(tmp_path / "model.onnx")
+        before = _service(model_path)
+        before.load_model()
+
+        _write_model(tmp_path / "model.onnx", bias=0.5)
+        after = _service(model_path)
+        after.load_model()
+
+        assert before.model_id().startswith("model.onnx:")
+        assert after.model_id() != before.model_id()
+
+    def test_corrupt_cache_is_rebuilt(self, tmp_path, session_paths):
+        model_path = _write_model(tmp_path / "model.onnx")
+        service = _service(model_path)
+        cache_path = service.optimized_model_path(model_path)
+        os.makedirs(os.path.dirname(cache_path))
+        with open(cache_path, "wb") as f:
+            f.write(b"not a model")
+
+        service.load_model()
+
+        assert service.is_model_loaded()
+        assert session_paths == [cache_path, model_path]
+        assert onnx.load(cache_path) is not None
+
+    def test_cache_disabled(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("ORT_CACHE_ENABLED", "false")
+        model_path = _write_model(tmp_path / "model.onnx")
+        service = _service(model_path)
+        service.load_model()
+
+        assert service.optimized_model_path(model_path) is None
+        assert not os.path.exists(tmp_path / ".ort-cache")
+
+
+class TestLoadProgress:
+    """Test suite for load phases and timings"""
+
+    def test_load_phases_recorded(self, tmp_path):
+        service = _service(_write_model(tmp_path / "model.onnx"))
+        assert service.load_status()["phase"] == "pending"
+
+        service.load_model()
+        status = service.load_status()
+
+        assert status["phase"] == "ready"
+        assert {"hash_quality", "session_quality", "warmup"} <= set(status["timings"])
+
+    def test_missing_model_phase(self, tmp_path):
+        service = _service(str(tmp_path / "absent.onnx"))
+        service.load_model()
+        assert service.load_status()["phase"] == "missing"
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,147 @@
+"""
+Tests for INT8 quantization and precision profiles
+"""
+import numpy as np
+import pytest
+from PIL import Image
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+onnx = pytest.importorskip("onnx")
+import onnxruntime as ort
+from onnx import helper, numpy_helper, TensorProto
+
+from services.background_removal import BackgroundRemovalService, quantized_model_path
+from quantize_model import quantize_model
+
+
+def _write_model(path, size=64):
+    """Tiny segmentation stand-in: 3x3 conv over RGB followed by a sigmoid"""
+    rng = np.random.default_rng(0)
+    weight = numpy_helper.from_array(rng.normal(0, 0.5, (1, 3, 3, 3)).astype(np.float32), "weight")
+    bias = numpy_helper.from_array(np.array([-0.5], dtype=np.float32), "bias")
+    nodes = [
+        helper.make_node("Conv", ["input", "weight", "bias"], ["logits"], pads=[1, 1, 1, 1]),
+        helper.make_node("Sigmoid", ["logits"], ["output"]),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "stand_in",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["batch", 3, size, size])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, ["batch", 1, size, size])],
+        initializer=[weight, bias],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def _run(path, array):
+    session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+    return session.run(None, {"input": array})[0]
+
+
+def _service(model_path, monkeypatch, profile="quality"):
+    monkeypatch.setenv("MODEL_PROFILE", profile)
+    service = BackgroundRemovalService()
+    service.model_path = model_path
+    service.input_size = (64, 64)
+    service.load_model()
+    return service
+
+
+class TestQuantizeModel:
+    """Test suite for producing the INT8 variant"""
+
+    def test_default_quantized_path(self):
+        assert quantized_model_path("models/rmbg-1.4.onnx") == "models/rmbg-1.4.int8.onnx"
+
+    def test_dynamic_quantization(self, tmp_path):
+        """Dynamic quantization needs no calibration and stays close to FP32"""
+        model_path = _write_model(tmp_path / "model.onnx")
+        output_path = quantize_model(model_path, str(tmp_path / "model.int8.onnx"), mode="dynamic")
+
+        array = np.random.default_rng(1).random((1, 3, 64, 64), dtype=np.float32)
+        assert np.abs(_run(output_path, array) - _run(model_path, array)).max() < 0.05
+
+    def test_static_quantization_with_calibration(self, tmp_path):
+        """Static quantization is calibrated from a directory of images"""
+        model_path = _write_model(tmp_path / "model.onnx")
+        calibration_dir = tmp_path / "calibration"
+        calibration_dir.mkdir()
+        rng = np.random.default_rng(2)
+        for i in range(3):
+            Image.fromarray(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)).save(calibration_dir / f"{i}.png")
+
+        output_path = quantize_model(
+            model_path, str(tmp_path / "model.int8.onnx"), mode="static", calibration_dir=str(calibration_dir)
+        )
+
+        quantized = onnx.load(output_path)
+        assert any(node.op_type == "QuantizeLinear" for node in quantized.graph.node)
+        array = rng.random((1, 3, 64, 64), dtype=np.float32)
+        assert np.abs(_run(output_path, array) - _run(model_path, array)).max() < 0.05
+
+    def test_static_requires_calibration_images(self, tmp_path):
+        model_path = _write_model(tmp_path / "model.onnx")
+        with pytest.raises(ValueError):
+            quantize_model(model_path, str(tmp_path / "out.onnx"), mode="static")
+
+
+class TestPrecisionProfiles:
+    """Test suite for selecting the FP32 or INT8 model"""
+
+    def test_loads_both_profiles(self, tmp_path, monkeypatch):
+        """The INT8 sibling is loaded as the fast profile next to the FP32 model"""
+        model_path = _write_model(tmp_path / "model.onnx")
+        quantize_model(model_path, quantized_model_path(model_path), mode="dynamic")
+
+        service = _service(model_path, monkeypatch)
+
+        assert service.available_profiles() == ["quality", "fast"]
+        assert service.active_profile == "quality"
+        assert service.model_id() == f"model.onnx:{service.model_fingerprint(model_path)}"
+        assert service.model_id("fast").startswith("model.int8.onnx:")
+
+    def test_per_request_profile(self, tmp_path, monkeypatch):
+        model_path = _write_model(tmp_path / "model.onnx")
+        quantize_model(model_path, quantized_model_path(model_path), mode="dynamic")
+        service = _service(model_path, monkeypatch)
+        image = Image.new('RGB', (80, 60), color=(200, 120, 40))
+
+        assert service.remove_background(image, include_image=False)["profile"] == "quality"
+        result = service.remove_background(image, include_image=False, profile="fast")
+        assert result["profile"] == "fast"
+        assert result["mask"].shape == (60, 80)
+
+    def test_deployment_profile(self, tmp_path, monkeypatch):
+        """MODEL_PROFILE=fast makes the INT8 model the default"""
+        model_path = _write_model(tmp_path / "model.onnx")
+        quantize_model(model_path, quantized_model_path(model_path), mode="dynamic")
+
+        service = _service(model_path, monkeypatch, profile="fast")
+
+        assert service.active_profile == "fast"
+        assert service.session is service.sessions["fast"]
+
+    def test_missing_variant_falls_back_to_quality(self, tmp_path, monkeypatch):
+        """Without an INT8 file the fast profile is unavailable"""
+        model_path = _write_model(tmp_path / "model.onnx")
+        service = _service(model_path, monkeypatch, profile="fast")
+
+        assert service.available_profiles() == ["quality"]
+        assert service.active_profile == "quality"
+        with pytest.raises(ValueError):
+            service.remove_background(Image.new('RGB', (32, 32)), profile="fast")
+
+    def test_unknown_profile_env(self, monkeypatch):
+        monkeypatch.setenv("MODEL_PROFILE", "turbo")
+        with pytest.raises(ValueError):
+            BackgroundRemovalService()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,85 @@
+"""
+Tests for the content-addressed result cache
+"""
+import os
+import pytest
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.result_cache import ResultCache
+
+
+class TestResultCache:
+    """Test suite for ResultCache"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return ResultCache(str(tmp_path / "cache"), max_memory_bytes=100)
+
+    def test_key_depends_on_content_model_and_params(self):
+        base = ResultCache.make_key(b"image", "rmbg-1.4.onnx", {"input_size": [1024, 1024]})
+
+        assert base == ResultCache.make_key(b"image", "rmbg-1.4.onnx", {"input_size": [1024, 1024]})
+        assert base != ResultCache.make_key(b"other", "rmbg-1.4.onnx", {"input_size": [1024, 1024]})
+        assert base != ResultCache.make_key(b"image", "fallback", {"input_size": [1024, 1024]})
+        assert base != ResultCache.make_key(b"image", "rmbg-1.4.onnx", {"input_size": [512, 512]})
+
+    def test_miss_then_memory_hit(self, cache):
+        assert cache.get("ab" * 32) is None
+
+        path = cache.put("ab" * 32, b"mask-bytes", {"confidence": 0.9, "method": "ai_model"})
+        hit = cache.get("ab" * 32)
+
+        assert os.path.exists(path)
+        assert hit["mask_path"] == path
+        assert hit["confidence"] == 0.9
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["memory_hits"] == 1
+
+    def test_disk_tier_survives_restart(self, cache, tmp_path):
+        cache.put("cd" * 32, b"mask-bytes", {"confidence": 0.7, "method": "fallback"})
+
+        restarted = ResultCache(str(tmp_path / "cache"), max_memory_bytes=100)
+        hit = restarted.get("cd" * 32)
+
+        assert hit["confidence"] == 0.7
+        assert restarted.stats()["disk_hits"] == 1
+        # Promoted into memory on the disk hit
+        restarted.get("cd" * 32)
+        assert restarted.stats()["memory_hits"] == 1
+
+    def test_memory_only_entries(self, cache, tmp_path):
+        assert cache.put("ef" * 32, b"mask", {"confidence": 0.8, "method": "ai_model"}, persist=False) is None
+
+        data, metadata = cache.get_entry("ef" * 32)
+        assert data == b"mask"
+        assert metadata["mask_path"] is None
+        assert not os.path.exists(tmp_path / "cache" / "ef")
+
+        # Persisting later writes the file and replaces the memory entry
+        path = cache.put("ef" * 32, data, metadata, extension=".webp")
+        assert path.endswith(".webp")
+        assert cache.get("ef" * 32)["mask_path"] == path
+
+    def test_memory_tier_is_bounded_by_bytes(self, cache):
+        for i in range(5):
+            cache.put(f"{i:02d}" * 32, b"x" * 40, {"confidence": 0.5, "method": "ai_model"})
+
+        stats = cache.stats()
+        assert stats["memory_bytes"] <= 100
+        assert stats["memory_entries"] == 2
+        assert stats["evictions"] == 3
+        # Evicted entries are still served from disk
+        assert cache.get("00" * 32) is not None
+        assert cache.stats()["disk_hits"] == 1
+
+    def test_disabled_cache_never_hits(self, tmp_path):
+        cache = ResultCache(str(tmp_path), enabled=False)
+        cache.put("ef" * 32, b"mask", {"confidence": 0.5, "method": "ai_model"})
+        assert cache.get("ef" * 32) is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,99 @@
+"""
+Tests for pooled input/output tensors and IO-bound inference
+"""
+import threading
+import numpy as np
+import pytest
+from PIL import Image
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.tensor_pool import TensorPool
+
+
+class TestTensorPool:
+    """Test per-thread buffer reuse"""
+
+    def test_same_key_reuses_buffer(self):
+        pool = TensorPool()
+        first = pool.get("input", (1, 3, 8, 8))
+        assert first.flags['C_CONTIGUOUS'] and first.dtype == np.float32
+        assert pool.get("input", (1, 3, 8, 8)) is first
+        assert pool.stats() == {"allocations": 1, "reuses": 1, "bytes": first.nbytes}
+
+    def test_shape_change_reallocates(self):
+        pool = TensorPool()
+        pool.get("input", (1, 3, 8, 8))
+        resized = pool.get("input", (1, 3, 4, 4))
+        assert resized.shape == (1, 3, 4, 4)
+        assert pool.stats()["bytes"] == resized.nbytes
+        assert pool.get("input", (1, 3, 4, 4), np.float16) is not resized
+
+    def test_threads_get_their_own_buffers(self):
+        pool = TensorPool()
+        arrays = []
+        threads = [threading.Thread(target=lambda: arrays.append(pool.get("input", (4,)))) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len({id(a) for a in arrays}) == 3
+        assert pool.stats()["allocations"] == 3
+
+
+class TestPooledInference:
+    """Test the service's pooled preprocessing and IO binding with a tiny ONNX model"""
+
+    @pytest.fixture
+    def service(self, tmp_path, monkeypatch):
+        pytest.importorskip("onnx")
+        from tests.test_model_loading import _write_model, _service
+        monkeypatch.setenv("ORT_CACHE_DIR", str(tmp_path / "ort-cache"))
+        service = _service(_write_model(tmp_path / "model.onnx"))
+        service.solid_fast_path = False
+        service.load_model()
+        return service
+
+    @pytest.fixture
+    def image(self):
+        rng = np.random.default_rng(0)
+        return Image.fromarray(rng.integers(0, 256, (90, 120, 3), dtype=np.uint8))
+
+    def test_preprocess_into_buffer_matches_reference(self, service, image):
+        buffer = np.full(service.input_shape(), np.nan, dtype=np.float32)
+        array, _, _ = service.preprocess_image(image, buffer)
+        assert array is buffer
+
+        resized = np.array(image.resize(service.input_size, Image.LANCZOS), dtype=np.float32)
+        reference = np.expand_dims(np.transpose(resized * (1.0 / 255.0), (2, 0, 1)), 0)
+        np.testing.assert_array_equal(array, reference)
+        assert service.preprocess_image(image)[0].flags['C_CONTIGUOUS']
+
+    def test_io_binding_matches_session_run(self, service):
+        array = np.random.default_rng(1).random(service.input_shape(), dtype=np.float32)
+        session = service.session
+        expected = session.run(None, {session.get_inputs()[0].name: array})[0]
+
+        first = service.run_inference(array)
+        np.testing.assert_array_equal(first, expected)
+        second = service.run_inference(array)
+        np.testing.assert_array_equal(second, expected)
+        # After the first run the output is written into the pooled buffer
+        assert service.run_inference(array) is second
+
+    def test_steady_state_allocates_nothing(self, service, image):
+        for _ in range(2):
+            service.remove_background(image, include_image=False)
+        allocations = service.tensor_pool.stats()["allocations"]
+        for _ in range(3):
+            result = service.remove_background(image, include_image=False)
+        assert result['method'] == 'ai_model'
+        assert service.tensor_pool.stats()["allocations"] == allocations
+
+    def test_disabled_pool_matches(self, service, image):
+        pooled = service.remove_background(image, include_image=False)['mask']
+        service.tensor_pool_enabled = False
+        plain = service.remove_background(image, include_image=False)['mask']
+        np.testing.assert_array_equal(pooled, plain)
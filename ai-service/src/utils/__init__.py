@@ -1,17 +1,29 @@
 from .image_processing import (
+    decode_image,
+    decode_image_reduced,
+    map_image_file,
     normalize_image,
     denormalize_image,
     resize_with_aspect_ratio,
     create_smooth_edges,
     extract_largest_component,
+    guided_filter,
     apply_alpha_matting
 )
+from .mask_encoding import MASK_FORMATS, encode_mask, decode_rle
 
 __all__ = [
+    "decode_image",
+    "decode_image_reduced",
+    "map_image_file",
     "normalize_image",
     "denormalize_image",
     "resize_with_aspect_ratio",
     "create_smooth_edges",
     "extract_largest_component",
-    "apply_alpha_matting"
+    "guided_filter",
+    "apply_alpha_matting",
+    "MASK_FORMATS",
+    "encode_mask",
+    "decode_rle"
 ]
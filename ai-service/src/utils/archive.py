@@ -0,0 +1,51 @@
+import os
+import tarfile
+import zipfile
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+ARCHIVE_CONTENT_TYPES = {
+    "application/zip",
+    "application/x-zip-compressed",
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+}
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz")
+
+
+def is_archive(filename: Optional[str], content_type: Optional[str]) -> bool:
+    """Check whether an upload is a zip/tar archive of images"""
+    if content_type in ARCHIVE_CONTENT_TYPES:
+        return True
+    return bool(filename) and filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def is_image_name(name: str) -> bool:
+    """Check whether an archive member looks like an image"""
+    base = os.path.basename(name)
+    return not base.startswith(".") and os.path.splitext(base)[1].lower() in IMAGE_EXTENSIONS
+
+
+def iter_archive_images(fileobj: BinaryIO, filename: Optional[str] = None) -> Iterator[Tuple[str, bytes]]:
+    """Yield (member name, bytes) for each image in a zip or tar archive, one at a time"""
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and is_image_name(info.filename):
+                    yield info.filename, archive.read(info)
+        return
+
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r:*")
+    except tarfile.TarError as e:
+        raise ValueError(f"Unsupported archive {filename or ''}: {e}")
+    with archive:
+        for member in archive:
+            if member.isfile() and is_image_name(member.name):
+                extracted = archive.extractfile(member)
+                if extracted is not None:
+                    yield member.name, extracted.read()
@@ -5,6 +5,7 @@ import { performanceMonitor } from './performanceMonitorService';
 import axios from 'axios';
 import path from 'path';
 import fs from 'fs/promises';
+import { createReadStream } from 'fs';
 
 /**
  * 处理管道服务 - 集成AI推理和图像处理的完整工作流
@@ -13,6 +14,7 @@ import fs from 'fs/promises';
 class ProcessingPipelineService {
   private imageProcessingService: ImageProcessingServiceImpl;
   private aiServiceUrl: string;
+  private aiSharedUploads: boolean; // AI服务是否挂载了同一个上传目录
   private processingQueue: string[] = [];
   private isProcessing: boolean = false;
   private readonly maxConcurrent: number = 3;
@@ -24,6 +26,7 @@ class ProcessingPipelineService {
   constructor() {
     this.imageProcessingService = new ImageProcessingServiceImpl('uploads/processed');
     this.aiServiceUrl = process.env.AI_SERVICE_URL || 'http://localhost:8000';
+    this.aiSharedUploads = process.env.AI_SERVICE_SHARED_UPLOADS === 'true';
   }
 
   /**
@@ -117,29 +120,34 @@ class ProcessingPipelineService {
 
   /**
    * 调用AI服务进行背景移除
+   * 共享上传目录时只发送文件路径，否则以原始请求体流式发送文件（不构造 multipart 表单）
    */
   private async callAIService(
     imagePath: string,
     taskId: string
   ): Promise<{ maskPath: string; confidence: number }> {
     try {
-      // 读取图像文件
-      const imageBuffer = await fs.readFile(imagePath);
-      const formData = new FormData();
-      const blob = new Blob([imageBuffer]);
-      formData.append('file', blob, path.basename(imagePath));
-
-      // 调用AI服务
-      const response = await axios.post(
-        `${this.aiServiceUrl}/api/remove-background`,
-        formData,
-        {
-          headers: {
-            'Content-Type': 'multipart/form-data',
-          },
-          timeout: 30000, // 30秒超时
-        }
-      );
+      let response;
+      if (this.aiSharedUploads) {
+        response = await axios.post(
+          `${this.aiServiceUrl}/api/remove-background/path`,
+          { path: path.resolve(imagePath) },
+          { timeout: 30000 } // 30秒超时
+        );
+      } else {
+        const stats = await fs.stat(imagePath);
+        response = await axios.post(
+          `${this.aiServiceUrl}/api/remove-background/raw`,
+          createReadStream(imagePath),
+          {
+            headers: {
+              'Content-Type': 'application/octet-stream',
+              'Content-Length': stats.size,
+            },
+            timeout: 30000, // 30秒超时
+          }
+        );
+      }
 
       if (!response.data || !response.data.mask_path) {
         throw new Error('AI服务返回无效响应');